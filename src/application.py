@@ -1,150 +1,442 @@
 from calculators.factories import *
+from calculators.spec import *
 from output import png_output
 from colours import normalise
 from colours.colourise import *
+from render.scheduler import TileScheduler
+from render.shared import SharedGrid
+from render.session import RenderSession
+from render.cache import RenderCache
+from render.distributed import DistributedScheduler
+from render.animation import ZoomPath, ZoomAnimator
+from render.adaptive import IterationBudget
+from render.symmetry import SymmetryPlan
+from render.supersample import Supersampler
+from render.statistics import RenderStatistics
 from multiprocessing import cpu_count
-from multiprocessing_on_dill.pool import Pool
-from typing import List
+from typing import List, Dict, Tuple, Iterator, Callable
+from threading import Thread
+from queue import Queue
+import os
+import numpy as np
 
 
-def proc_draw(drawer) -> List[float]:
-    drawer.create_range()
-    drawer.draw()
-    return drawer.get_output()
-
-
-def print_grey(points: List[List[float]], writer: png_output.PngWriter, cpus: int, greylevels: int):
+def print_grey(points: np.ndarray, writer: png_output.PngWriter, cpus: int, greylevels: int):
     norm = normalise.Normaliser(greylevels)
     normed = norm.normalise_nest_no_flatten(points, cpus)
     writer.add_greyscale(normed)
     writer.close()
 
 
-def print_colour(points: List[List[float]], writer: png_output.PngWriter, cpus: int, ranger: ColourRanger):
-    col = Colouriser(ranger, cpus)
+def print_colour(points: SharedGrid,
+                 writer: png_output.PngWriter,
+                 cpus: int,
+                 ranger: ColourRanger,
+                 session: RenderSession = None,
+                 scaling: ColourScaling = None):
+    col = Colouriser(ranger, cpus, session, scaling)
     print('Colourising and writing')
-    writer.add_colour(col.colourise(points))
+    colours = SharedGrid((points.shape[0], points.shape[1] * 3), np.uint8)
+    try:
+        col.colourise_shared(points, colours)
+        writer.add_colour(colours.array)
+    finally:
+        colours.release()
     writer.close()
     print('Done')
 
 
+def estimate_max(pool,
+                 factory: LineFactory,
+                 width: int,
+                 height: int,
+                 region: List[complex],
+                 scale: int,
+                 scaling: ColourScaling = None) -> float:
+    """
+    Find the largest raw value in a cheap, low resolution render of the region, to
+    colour the full resolution render with before all of it has been drawn. A scale
+    of 1 gives the exact max, at the cost of drawing everything twice. If given a
+    scaling that needs to see the data (e.g. a histogram), the preview is added to it
+    """
+    preview = TileScheduler(max(2, width // scale), max(2, height // scale))
+    highest = 0.0
+    for row in preview.stream(pool, factory, region):
+        highest = max(highest, row.max())
+        if scaling is not None:
+            scaling.add(row)
+    return highest
+
+
+def stream_raw(rows: Iterator[np.ndarray], raw: np.ndarray, col: Colouriser) -> Iterator[np.ndarray]:
+    """
+    Copy each streamed row of raw output into the raw array (usually a memory-mapped
+    file) as it passes, and colour it
+    """
+    for y, row in enumerate(rows):
+        raw[y] = row
+        yield col.colourise_worker(row)
+
+
+def preview_writer(filename: str,
+                   cpus: int,
+                   colouriser: ColourRanger,
+                   session: RenderSession,
+                   scaling: ColourScaling = None) -> Callable[[int, np.ndarray], None]:
+    """
+    Get a callback for progressive renders that colours each pass's preview and
+    writes it next to the final image, e.g. mandel-preview4.png for the 1 in 4 pass
+    """
+    root, extension = os.path.splitext(filename)
+
+    def write_preview(stride: int, preview: np.ndarray):
+        grid = SharedGrid(preview.shape, np.float64)
+        try:
+            grid.array[:] = preview
+            writer = png_output.PngWriter('{}-preview{}{}'.format(root, stride, extension), preview.shape[1],
+                                          preview.shape[0])
+            # A fresh scaling each time, so a histogram only sees this preview
+            print_colour(grid, writer, cpus, colouriser, session, scaling.empty() if scaling is not None else None)
+        finally:
+            grid.release()
+    return write_preview
+
+
 def draw_fractal(factory: LineFactory,
                  cpus: int,
                  width: int,
                  height: int,
                  region: List[complex],
                  colouriser: ColourRanger,
-                 filename: str):
+                 filename: str,
+                 scheduler: TileScheduler = None,
+                 subdivide: bool = False,
+                 stream: bool = False,
+                 preview_scale: int = 8,
+                 session: RenderSession = None,
+                 scaling: ColourScaling = None,
+                 cache: RenderCache = None,
+                 raw_filename: str = None,
+                 passes: List[int] = None,
+                 on_pass: Callable[[int, np.ndarray], None] = None,
+                 budget: IterationBudget = None,
+                 symmetry: bool = False,
+                 supersample: Supersampler = None,
+                 statistics: RenderStatistics = None) -> Dict[Tuple[int, int], float]:
 
     """
     Given a line-calculator factory with the fractal type and parameters pre-encoded in it
     create an image
 
     :param factory: The line-drawer-generator for the fractal
-    :param cpus: The number of processes to use
+    :param cpus: The number of processes to use, when there is no session
     :param width: The image width to produce
     :param height: The image height to produce
     :param region: The window onto the fractal we're interested in
     :param colouriser: The raw->colour pixel generator
     :param filename: The name of the image to write out
-    :return:
+    :param scheduler: The tile scheduler to split the work up with, defaults to 64x64 tiles
+    :param subdivide: Skip solid regions by only drawing rectangle borders, where the fractal allows it
+    :param stream: Colour and write rows as they are drawn rather than holding the whole image, using
+                   a preview render to find the colour range
+    :param preview_scale: How much smaller than the image the preview render for streaming is, 1 gives
+                          an exact colour range from a full first pass
+    :param session: The render session whose pool to use, by default a session is started and closed
+                     just for this image
+    :param scaling: How raw values are scaled before colouring - ColourScaling (linear, the default),
+                    LogScaling, RootScaling or HistogramScaling
+    :param cache: The cache to reuse the raw output of an earlier render of the same fractal and region
+                  from, or to keep this render's output in. Not used when streaming, as the raw output is
+                  never held in one place
+    :param raw_filename: If given, the raw output is also written to this .npy file, which recolour.py
+                         can colour again later without redrawing
+    :param passes: If given, draw progressively - first every n'th pixel across and down for each n in
+                   turn, e.g. [4, 2] for 1/16 of the pixels then 1/4, then the rest. Pixels already drawn
+                   aren't drawn again. Not used when streaming
+    :param on_pass: Called after each of the passes with its stride and a height x width raw preview of
+                    the image so far. By default each preview is coloured and written next to the image,
+                    e.g. mandel-preview4.png
+    :param budget: If given, tiles on a boundary the factory's iterations can't resolve are drawn with more
+                   iterations, found from a preview (see IterationBudget)
+    :param symmetry: Only draw the part of the image that isn't a reflection of another part, where the
+                     fractal is symmetric and the region lines up with its axes (see SymmetryPlan). Not
+                     used when streaming
+    :param supersample: If given, pixels on a sharp edge are drawn again as the average of a grid of samples
+                        within them, once the image is drawn (see Supersampler). Not used when streaming
+    :param statistics: If given, the workers measure each tile as they draw it - its time, the iterations of
+                       every pixel, how many escaped and the bytes sent between the processes - and the
+                       measurements are added to these (see RenderStatistics). Nothing is added when the raw
+                       output comes from the cache
+    :return: The time taken to draw each tile, keyed by the tile's top left pixel (empty if the raw
+             output came from the cache)
     """
 
-    # hold IM constant (a line from +imag to -imag)
-    vertical = LineDrawer(region[0], region[0].real + region[1].imag*1j, height)
-    vertical.create_range()
+    if scheduler is None:
+        scheduler = TileScheduler(width, height, subdivide=subdivide)
+
+    if session is None:
+        with RenderSession(cpus) as own_session:
+            return draw_fractal(factory, cpus, width, height, region, colouriser, filename,
+                                scheduler, subdivide, stream, preview_scale, own_session, scaling, cache, raw_filename,
+                                passes, on_pass, budget, symmetry, supersample, statistics)
+    pool = session.get_pool()
+
+    if passes and stream:
+        raise ValueError('Progressive renders hold the whole image, so can\'t be streamed')
+    if passes and isinstance(scheduler, DistributedScheduler):
+        raise ValueError('Progressive renders can only be drawn on a local pool')
+    if stream and isinstance(scheduler, DistributedScheduler):
+        raise ValueError('Distributed renders can\'t be streamed, draw them in full')
+
+    # A fresh scaling for this image, so a histogram reused across calls only sees this image's values
+    scaling = scaling.empty() if scaling is not None else None
+
+    def plan_iterations():
+        if budget is not None:
+            scheduler.tile_iterations = budget.plan(pool, factory, region, scheduler)
+            print(budget.report())
+
+    # Streamed rows are written as they're drawn, so there's nothing to copy the reflected rows from
+    use_symmetry = symmetry and not stream
+    scheduler.symmetry = SymmetryPlan.create(factory.get_symmetry(), region, width, height) if use_symmetry else None
+    scheduler.statistics = statistics
+
+    if stream:
+        plan_iterations()
+        col = Colouriser(colouriser, cpus, session, scaling)
+        col.set_max(estimate_max(pool, factory, width, height, region, preview_scale, col.scaling))
+        print('Drawing, colourising and writing....')
+        writer = png_output.PngWriter(filename, width, height)
+        if raw_filename is None:
+            writer.add_colour(scheduler.stream(pool, factory, region, col))
+        else:
+            # The raw rows have to come back to be written out, so they are coloured here
+            raw = np.lib.format.open_memmap(raw_filename, mode='w+', dtype=np.float64, shape=(height, width))
+            writer.add_colour(stream_raw(scheduler.stream(pool, factory, region), raw, col))
+            raw.flush()
+            del raw
+        writer.close()
+        print('Done - {}'.format(scheduler.report()))
+        if statistics is not None:
+            print('Statistics - {}'.format(statistics.report()))
+        return scheduler.timings
+
+    key = cached = None
+    if cache is not None:
+        key = cache.get_key(factory, region, width, height, scheduler.subdivide, budget, scheduler.symmetry is not None,
+                            supersample)
+        cached = cache.load(key)
+
+    # The workers write straight into shared memory, rather than pickling tiles back
+    final_grid = SharedGrid((height, width), np.float64)
+    try:
+        if cached is not None:
+            print('Using cached output')
+            final_grid.array[:] = cached
+            timings = {}
+        else:
+            plan_iterations()
+            if scheduler.symmetry is not None:
+                print(scheduler.symmetry.report())
+            print('Drawing Starting....')
+            if passes:
+                if on_pass is None:
+                    on_pass = preview_writer(filename, cpus, colouriser, session, scaling)
+                scheduler.draw_progressive(pool, factory, region, final_grid, passes, on_pass)
+            else:
+                scheduler.draw(pool, factory, region, final_grid)
+            print('Drawing complete - {}'.format(scheduler.report()))
+            if statistics is not None:
+                print('Statistics - {}'.format(statistics.report()))
+            timings = scheduler.timings
+            if supersample is not None:
+                supersample.refine(pool, factory, region, final_grid.array, scheduler)
+                print('Supersampling complete - {}'.format(supersample.report()))
+            if cache is not None:
+                cache.save(key, final_grid.array)
+        if raw_filename is not None:
+            np.save(raw_filename, final_grid.array)
+        print('Output Starting....')
+        writer = png_output.PngWriter(filename, width, height)
+        print_colour(final_grid, writer, cpus, colouriser, session, scaling)
+        # print_grey(final_grid.array, writer, cpus, 255)
+    finally:
+        final_grid.release()
+    return timings
+
+
+def draw_zoom(factory: LineFactory,
+              cpus: int,
+              width: int,
+              height: int,
+              path: ZoomPath,
+              colouriser: ColourRanger,
+              filename: str,
+              oversample: int = 2,
+              subdivide: bool = False,
+              session: RenderSession = None,
+              scaling: ColourScaling = None,
+              frames_in_flight: int = 2) -> int:
+    """
+    Draw every frame of a zoom animation (see ZoomAnimator), all on one pool. Each frame
+    is coloured and written out on a separate thread while the next is drawn
 
-    # Create a line-drawer for each horizontal line, holding RE constant
-    all_drawers = [factory.get_drawer(x, region[1].real + x.imag * 1j, width) for x in vertical.get_points()]
+    :param factory: The line-drawer-generator for the fractal
+    :param cpus: The number of processes to use, when there is no session
+    :param width: The frame width
+    :param height: The frame height
+    :param path: The region of each frame
+    :param colouriser: The raw->colour pixel generator
+    :param filename: The name of each frame's image, formatted with the frame number - e.g. 'zoom{:05d}.png'
+    :param oversample: How many times the frame resolution key images are drawn at, 1 draws every frame
+    :param subdivide: Skip solid regions by only drawing rectangle borders, where the fractal allows it
+    :param session: The render session whose pool to use, by default a session is started and closed
+                    just for this animation
+    :param scaling: How raw values are scaled before colouring, with a fresh scaling for each frame
+    :param frames_in_flight: The number of drawn frames that can be waiting to be written
+    :return: The number of frames written
+    """
+    if session is None:
+        with RenderSession(cpus) as own_session:
+            return draw_zoom(factory, cpus, width, height, path, colouriser, filename, oversample, subdivide,
+                             own_session, scaling, frames_in_flight)
+
+    animator = ZoomAnimator(factory, width, height, path, oversample, subdivide)
+    waiting = Queue(frames_in_flight)
+    errors = []
+
+    def write_frames():
+        while True:
+            item = waiting.get()
+            if item is None:
+                return
+            if errors:
+                # Keep taking frames, so the drawing side is never left blocked
+                continue
+            frame, raw = item
+            grid = SharedGrid(raw.shape, np.float64)
+            try:
+                grid.array[:] = raw
+                writer = png_output.PngWriter(filename.format(frame), width, height)
+                print_colour(grid, writer, cpus, colouriser, session, scaling.empty() if scaling is not None else None)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                grid.release()
+
+    writer_thread = Thread(target=write_frames, daemon=True)
+    writer_thread.start()
+    written = 0
+    try:
+        for frame, raw in animator.frames(session.get_pool()):
+            if errors:
+                break
+            waiting.put((frame, raw))
+            written += 1
+    finally:
+        waiting.put(None)
+        writer_thread.join()
+    if errors:
+        raise errors[0]
+    print('Zoom complete - {}'.format(animator.report()))
+    return written
+
+
+class Preset:
+
+    """
+    One of the demo images - a fractal, the window onto it, how it's coloured and the
+    name its image is written under
+    """
 
-    print('Drawing Starting....')
-    pool = Pool(cpus)
-    final_grid = pool.map(proc_draw, all_drawers)
-    pool.close()
-    print('Drawing complete')
-    print('Output Starting....')
-    writer = png_output.PngWriter(filename, width, height)
-    print_colour(final_grid, writer, cpus, colouriser)
-    # print_grey(final_grid, writer, cpus, 255)
+    def __init__(self, name: str, factory: LineFactory, region: List[complex], ranger: ColourRanger,
+                 portrait: bool = False):
+        """
+        :param portrait: Whether the image is drawn taller than it is wide, swapping the resolution given
+        """
+        self.name = name
+        self.factory = factory
+        self.region = region
+        self.ranger = ranger
+        self.portrait = portrait
 
+    def get_size(self, xres: int, yres: int) -> Tuple[int, int]:
+        return (yres, xres) if self.portrait else (xres, yres)
 
-def tech_demo(processes: int, xres: int, yres: int):
 
+def demo_presets() -> List[Preset]:
     # The regions/windows onto all the fractals below are 16:9, so the resolutions
     # probably should be too
+    return [
+        Preset('mandel', MandelLambdaFactory(8, 500, 2, 'z ** 2 + c'), [-2.5 + 1.125j, 1.5 - 1.125j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+        Preset('negative', MandelLambdaFactory(8, 500, -2, 'z ** -2 + c'), [-2.5 + 1.125j, 1.5 - 1.125j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+        Preset('mandelbar', MandelLambdaFactory(3, 500, 2, '(z.conjugate() ** 2) + c'), [-4.0 + 2.25j, 4.0 - 2.25j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+        Preset('julia3', MandelLambdaFactory(4, 5000, 3, '(z ** 3) + 0.4 + 0.002275j'), [-2.0 + 1.125j, 2.0 - 1.125j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+        Preset('julia4', MandelLambdaFactory(4, 5000, 4, '(z ** 4) + 0.559 - 0.0481j'), [-2.0 + 1.125j, 2.0 - 1.125j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+        Preset('julia6', MandelLambdaFactory(4, 5000, 6, '(z ** 6) + 0.736 - 0.417355j'),
+               [-2.0 + 1.125j, 2.0 - 1.125j], ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+        Preset('julia-negative', MandelLambdaFactory(4, 500, -2, '(z ** -2) + 0.653125 + 0.510337j'),
+               [-2.0 + 1.125j, 2.0 - 1.125j], ColourRangerWithExponentScaling(many_transitions_list, 1.0)),
+
+        #Preset('julia-negative-auto-big2', MandelLambdaFactory(4, 500, -4, '(z ** -4) + -0.791 - 0.07j'), # -0.1, -0.04
+        #       [-4.0 + 2.5j, 4.0 - 2.5j], ColourRangerWithExponentScaling(many_transitions_list, 1.0)),
+
+        Preset('glynn-tree', MandelLambdaFactory(4, 5000, 1.5, '(z ** 1.5) + -0.1948 + 0j'),
+               [-0.6947218749999999 + 0.28875000000000006j, -0.369878125 - 0.28875000000000006j],
+               ColourRangerWithExponentScaling(many_transitions_list, 1.0), portrait=True),
+
+        # Mandeldrops require a polar inversion of all points before running, so need a different factory
+        Preset('drop', MandelDropFactory(3, 500, 2), [-2.5 + 2.25j, 5.5 - 2.25j],
+               ColourRangerWithExponentScaling(simple_transition_list, 0.25)),
+        Preset('drop3', MandelDropFactory(3, 500, 3), [-4 + 2.25j, 4 - 2.25j],
+               ColourRangerWithExponentScaling(simple_transition_list, 0.25)),
+        Preset('drop4', MandelDropFactory(3, 500, 4), [-4 + 2.25j, 4 - 2.25j],
+               ColourRangerWithExponentScaling(simple_transition_list, 0.25)),
+
+        Preset('multipower', MandelLambdaFactory(8, 500, -4, '(1 - z**(5))/(z**2 - c)'),
+               [-0.925 + 0.06328125j, -0.675 - 0.06328125j], ColourRangerWithExponentScaling(many_transitions_list, 1.0)),
+
+        # Ships get a reflection in the x axis before drawing
+        Preset('burning-ship', ShipFactory(4, 5000, 2), [-1.68 + 0.07125j, -1.58 - 0.02875j],
+               ColourRangerWithExponentScaling(ship_list, 0.25)),
+
+        # Deep zooms take their centre as strings, to keep every digit, and their region as offsets from it
+        Preset('deep', DeepMandelFactory('0', '1', 8, 1000), [-1.6e-30 + 0.9e-30j, 1.6e-30 - 0.9e-30j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.25)),
+
+        # Newton fractals are a little different...
+        Preset('newt', NewtonFactory(500, 0.0001, 1.0 + 0.0j, '(z**3) - 1'), [-2.0 + 1.125j, 2.0 - 1.125j],
+               ColourRangerWithExponentScaling(bgr_list, 1.0)),
+
+        # Or by which root each point converges to, iterating whole tiles at once
+        Preset('newt-basins', NewtonBasinFactory(500, 0.0001, 1.0 + 0.0j, '(z**3) - 1'), [-2.0 + 1.125j, 2.0 - 1.125j],
+               BasinColourRanger(bgr_list)),
+
+        # For... reasons, this gives us interesting stalks, but cannot be run with its real derivative
+        Preset('stalk', NewtonStalkFactory(500, 0.0001, 1.0 + 0.0j, '(z**3) - 1', '2*(z**2)'),
+               [-2.0 + 1.125j, 2.0 - 1.125j], ColourRangerWithExponentScaling(ship_list2, 1.0)),
+
+        # A pickover drawer which uses a component as test instead of abs()
+        Preset('pickover', PickoverFactory(3, 500, 3, '(z**3) + -1 + 1j'), [-4 + 2.25j, 4 - 2.25j],
+               ColourRangerWithExponentScaling(bgr_list, 0.5)),
+        Preset('pickover2', PickoverFactory2(10, 500, 5, '(z**5) + 1 + 1j'), [-3.0 + 1.6875j, 3.0 - 1.6875j],
+               ColourRangerWithExponentScaling(many_transitions_list, 0.5)),
+    ]
 
-    draw_fractal(MandelLambdaFactory(8, 500, 2, lambda z, c: z ** 2 + c),
-                 processes, xres, yres, [-2.5 + 1.125j, 1.5 - 1.125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.25), './mandel.png')
-
-    draw_fractal(MandelLambdaFactory(8, 500, -2, lambda z, c: z ** -2 + c),
-                 processes, xres, yres, [-2.5 + 1.125j, 1.5 - 1.125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.25), './negative.png')
-
-    draw_fractal(MandelLambdaFactory(3, 500, 2, lambda z, c: (z.conjugate() ** 2) + c),
-                 processes, xres, yres, [-4.0 + 2.25j, 4.0 - 2.25j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.25), './mandelbar.png')
-
-    draw_fractal(MandelLambdaFactory(4, 5000, 3, lambda z, c: (z ** 3) + 0.4 + 0.002275j),
-                 processes, xres, yres, [-2.0 + 1.125j, 2.0 - 1.125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.25), './julia3.png')
-
-    draw_fractal(MandelLambdaFactory(4, 5000, 4, lambda z, c: (z ** 4) + 0.559 - 0.0481j),
-                 processes, xres, yres, [-2.0 + 1.125j, 2.0 - 1.125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.25), './julia4.png')
-
-    draw_fractal(MandelLambdaFactory(4, 5000, 6, lambda z, c: (z ** 6) + 0.736 - 0.417355j),
-                 processes, xres, yres, [-2.0 + 1.125j, 2.0 - 1.125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.25), './julia6.png')
-
-    draw_fractal(MandelLambdaFactory(4, 500, -2, lambda z, c: (z ** -2) + 0.653125 + 0.510337j),
-                 processes, xres, yres, [-2.0 + 1.125j, 2.0 - 1.125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 1.0), './julia-negative.png')
 
-    #draw_fractal(MandelLambdaFactory(4, 500, -4, lambda z, c: (z ** -4) + -0.791 - 0.07j), # -0.1, -0.04
-    #             processes, xres, yres, [-4.0 + 2.5j, 4.0 - 2.5j],
-    #             ColourRangerWithExponentScaling(many_transitions_list, 1.0), './julia-negative-auto-big2.png')
-
-    draw_fractal(MandelLambdaFactory(4, 5000, 1.5, lambda z, c: (z ** 1.5) + -0.1948 + 0j),
-                 processes, yres, xres, [-0.6947218749999999 + 0.28875000000000006j, -0.369878125 - 0.28875000000000006j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 1.0), './glynn-tree.png')
-
-    # Mandeldrops require a polar inversion of all points before running, so need a different factory
-    draw_fractal(MandelDropFactory(3, 500, 2), processes, xres, yres, [-2.5 + 2.25j, 5.5 - 2.25j],
-                 ColourRangerWithExponentScaling(simple_transition_list, 0.25), './drop.png')
-
-    draw_fractal(MandelDropFactory(3, 500, 3), processes, xres, yres, [-4 + 2.25j, 4 - 2.25j],
-                 ColourRangerWithExponentScaling(simple_transition_list, 0.25), './drop3.png')
-
-    draw_fractal(MandelDropFactory(3, 500, 4), processes, xres, yres, [-4 + 2.25j, 4 - 2.25j],
-                 ColourRangerWithExponentScaling(simple_transition_list, 0.25), './drop4.png')
-
-    draw_fractal(MandelLambdaFactory(8, 500, -4, lambda z, c: (1 - z**(5))/(z**2 - c)), processes, xres, yres,
-                 [-0.925 + 0.06328125j, -0.675 - 0.06328125j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 1.0), './multipower.png')
-
-    # Ships get a reflection in the x axis before drawing
-    draw_fractal(ShipFactory(4, 5000, 2), processes, xres, yres, [-1.68 + 0.07125j, -1.58 - 0.02875j],
-                 ColourRangerWithExponentScaling(ship_list, 0.25), './burning-ship.png')
-
-    # Newton fractals are a little different...
-    draw_fractal(NewtonFactory(500, 0.0001, 1.0 + 0.0j, lambda z: (z**3) - 1, lambda z: 3*(z**2)),
-                 processes, xres, yres, [-2.0 + 1.125j, 2.0 - 1.125j],
-                 ColourRangerWithExponentScaling(bgr_list, 1.0), './newt.png')
-
-    # For... reasons, this gives us interesting stalks, but cannot be run with its real derivative
-    draw_fractal(NewtonStalkFactory(500, 0.0001, 1.0 + 0.0j, lambda z: (z**3) - 1, lambda z: 2*(z**2)),
-                 processes, xres, yres, [-2.0 + 1.125j, 2.0 - 1.125j],
-                 ColourRangerWithExponentScaling(ship_list2, 1.0), './stalk.png')
-
-    # A pickover drawer which uses a component as test instead of abs()
-    draw_fractal(PickoverFactory(3, 500, 3, lambda z, c: (z**3) + -1 + 1j),
-                 processes, xres, yres, [-4 + 2.25j, 4 - 2.25j],
-                 ColourRangerWithExponentScaling(bgr_list, 0.5), './pickover.png')
+def tech_demo(processes: int, xres: int, yres: int):
 
-    draw_fractal(PickoverFactory2(10, 500, 5, lambda z, c: (z**5) + 1 + 1j),
-                 processes, xres, yres, [-3.0 + 1.6875j, 3.0 - 1.6875j],
-                 ColourRangerWithExponentScaling(many_transitions_list, 0.5), './pickover2.png')
+    # One pool is shared by every image in the demo
+    with RenderSession(processes) as session:
+        for preset in demo_presets():
+            width, height = preset.get_size(xres, yres)
+            draw_fractal(preset.factory, processes, width, height, preset.region, preset.ranger,
+                         './{}.png'.format(preset.name), session=session)
 
 
 def main():
@@ -0,0 +1,229 @@
+from argparse import ArgumentParser
+from typing import Dict, List, Tuple, Optional
+from time import perf_counter
+from tempfile import TemporaryDirectory
+import json
+import os
+import platform
+import sys
+
+from multiprocessing_on_dill import Process, Pipe
+from application import *
+
+try:
+    import resource
+except ImportError:
+    # Peak memory is only measured where the resource module exists (not on Windows)
+    resource = None
+
+# The stages of a render timed separately
+stages = ('compute', 'colour', 'encode')
+
+
+def peak_rss() -> Optional[float]:
+    """
+    The largest resident set this process has had over its life, in megabytes
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux gives kilobytes, macOS bytes
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+
+def worker_peak_rss(_) -> Optional[float]:
+    return peak_rss()
+
+
+def parse_resolution(text: str) -> Tuple[int, int]:
+    width, _, height = text.lower().partition('x')
+    return int(width), int(height)
+
+
+def run_preset(preset: Preset, xres: int, yres: int, processes: int, directory: str) -> Dict:
+    """
+    Draw, colour and write one preset, timing each stage on its own. Each run gets a
+    session of its own, so the workers' peak memory is for this run alone - run it with
+    run_isolated for the main process's to be too
+
+    :param preset: The demo image to draw
+    :param xres: The width to draw at, or the height for a portrait preset
+    :param yres: The height to draw at, or the width for a portrait preset
+    :param processes: The number of processes to draw with
+    :param directory: Where to write the image
+    :return: The timings and rates of the run
+    """
+    width, height = preset.get_size(xres, yres)
+    with RenderSession(processes) as session:
+        pool = session.get_pool()
+        scheduler = TileScheduler(width, height)
+        grid = SharedGrid((height, width), np.float64)
+        colours = SharedGrid((height, width * 3), np.uint8)
+        try:
+            start = perf_counter()
+            scheduler.draw(pool, preset.factory, preset.region, grid)
+            compute = perf_counter() - start
+
+            start = perf_counter()
+            Colouriser(preset.ranger, processes, session).colourise_shared(grid, colours)
+            colour = perf_counter() - start
+
+            start = perf_counter()
+            writer = png_output.PngWriter(os.path.join(directory, '{}.png'.format(preset.name)), width, height)
+            writer.add_colour(colours.array)
+            writer.close()
+            encode = perf_counter() - start
+        finally:
+            grid.release()
+            colours.release()
+        worker_peaks = [peak for peak in pool.map(worker_peak_rss, range(processes * 4), chunksize=1)
+                        if peak is not None]
+
+    pixels = width * height
+    return {'preset': preset.name,
+            'width': width,
+            'height': height,
+            'pixels': pixels,
+            'iterations': scheduler.iterated,
+            'compute_seconds': compute,
+            'colour_seconds': colour,
+            'encode_seconds': encode,
+            'pixels_per_second': pixels / compute,
+            'iterations_per_second': scheduler.iterated / compute,
+            'colour_pixels_per_second': pixels / colour,
+            'encode_pixels_per_second': pixels / encode,
+            'peak_rss_mb': peak_rss(),
+            'worker_peak_rss_mb': max(worker_peaks, default=None)}
+
+
+def send_run(connection, preset: Preset, xres: int, yres: int, processes: int, directory: str):
+    connection.send(run_preset(preset, xres, yres, processes, directory))
+    connection.close()
+
+
+def run_isolated(preset: Preset, xres: int, yres: int, processes: int, directory: str) -> Dict:
+    """
+    Run a preset in a process of its own, as run_preset, so the peak memory of the main
+    process is the preset's alone rather than the most of any run before it
+    """
+    receiver, sender = Pipe(duplex=False)
+    process = Process(target=send_run, args=(sender, preset, xres, yres, processes, directory))
+    process.start()
+    sender.close()
+    try:
+        run = receiver.recv()
+    except EOFError:
+        raise RuntimeError('Benchmarking {} at {}x{} failed'.format(preset.name, xres, yres))
+    finally:
+        process.join()
+    return run
+
+
+def best_of(runs: List[Dict]) -> Dict:
+    """
+    Combine repeated runs of a preset, keeping the fastest time of each stage, as the
+    one least disturbed by anything else running
+    """
+    best = dict(runs[0])
+    for stage in stages:
+        best[stage + '_seconds'] = min(run[stage + '_seconds'] for run in runs)
+    best['pixels_per_second'] = best['pixels'] / best['compute_seconds']
+    best['iterations_per_second'] = best['iterations'] / best['compute_seconds']
+    best['colour_pixels_per_second'] = best['pixels'] / best['colour_seconds']
+    best['encode_pixels_per_second'] = best['pixels'] / best['encode_seconds']
+    best['peak_rss_mb'] = max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None), default=None)
+    best['worker_peak_rss_mb'] = max((run['worker_peak_rss_mb'] for run in runs
+                                      if run['worker_peak_rss_mb'] is not None), default=None)
+    return best
+
+
+def compare(results: List[Dict], baseline: List[Dict], tolerance: float, memory_tolerance: float) -> List[str]:
+    """
+    Compare results against a baseline run, matching presets by name and size
+
+    :param tolerance: How much slower than the baseline, as a fraction, a stage can be before it's a regression
+    :param memory_tolerance: How much more memory than the baseline, as a fraction, the main process or a
+                             worker can use at its peak before it's a regression
+    :return: A line describing each regression
+    """
+    previous = {(run['preset'], run['width'], run['height']): run for run in baseline}
+    regressions = []
+    for run in results:
+        base = previous.get((run['preset'], run['width'], run['height']))
+        if base is None:
+            continue
+        for stage in stages:
+            ratio = run[stage + '_seconds'] / base[stage + '_seconds']
+            if ratio > 1.0 + tolerance:
+                regressions.append('{} {}x{} {}: {:.3f}s, was {:.3f}s ({:+.0%})'.format(
+                    run['preset'], run['width'], run['height'], stage, run[stage + '_seconds'],
+                    base[stage + '_seconds'], ratio - 1.0))
+        for memory, name in (('peak_rss_mb', 'main process memory'), ('worker_peak_rss_mb', 'worker memory')):
+            if run.get(memory) is None or base.get(memory) is None:
+                continue
+            ratio = run[memory] / base[memory]
+            if ratio > 1.0 + memory_tolerance:
+                regressions.append('{} {}x{} {}: {:.0f}MB, was {:.0f}MB ({:+.0%})'.format(
+                    run['preset'], run['width'], run['height'], name, run[memory], base[memory], ratio - 1.0))
+        if run['iterations'] != base['iterations']:
+            # Not a regression in itself, but the timings aren't of the same work
+            print('Note: {} {}x{} calculated {} iterations, was {}'.format(run['preset'], run['width'], run['height'],
+                                                                        run['iterations'], base['iterations']))
+    return regressions
+
+
+def report(run: Dict) -> str:
+    memory = '' if run['peak_rss_mb'] is None else ', peak RSS {:.0f}MB (workers {:.0f}MB)'.format(
+        run['peak_rss_mb'], run['worker_peak_rss_mb'] or 0.0)
+    return '{:<16} {:>5}x{:<5} compute {:7.3f}s ({:11,.0f} px/s, {:13,.0f} it/s), colour {:6.3f}s, ' \
+           'encode {:6.3f}s{}'.format(run['preset'], run['width'], run['height'], run['compute_seconds'],
+                                      run['pixels_per_second'], run['iterations_per_second'], run['colour_seconds'],
+                                      run['encode_seconds'], memory)
+
+
+def main():
+    presets = {preset.name: preset for preset in demo_presets()}
+    parser = ArgumentParser(description='Time the demo fractals\' compute, colouring and PNG encoding')
+    parser.add_argument('--resolutions', nargs='+', default=['384x216'], metavar='WIDTHxHEIGHT')
+    parser.add_argument('--presets', nargs='+', choices=sorted(presets), help='defaults to every demo preset')
+    parser.add_argument('--repeats', type=int, default=3, help='the runs of each preset, the fastest is kept')
+    parser.add_argument('--processes', type=int, help='defaults to the number of cpus')
+    parser.add_argument('--output', help='a JSON file to save the results to')
+    parser.add_argument('--baseline', help='a JSON file of earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='how much slower than the baseline a stage can be before it fails, default 10%%')
+    parser.add_argument('--memory-tolerance', type=float, default=0.1,
+                        help='how much more peak memory than the baseline a run can use before it fails, default 10%%')
+    parser.add_argument('--images', help='a directory to keep the images in, by default they are thrown away')
+    args = parser.parse_args()
+
+    processes = args.processes or cpu_count() or 4
+    chosen = [presets[name] for name in args.presets] if args.presets else list(presets.values())
+
+    results = []
+    with TemporaryDirectory() as directory:
+        for resolution in args.resolutions:
+            xres, yres = parse_resolution(resolution)
+            for preset in chosen:
+                runs = [run_isolated(preset, xres, yres, processes, args.images or directory)
+                        for _ in range(args.repeats)]
+                results.append(best_of(runs))
+                print(report(results[-1]))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'processes': processes, 'python': platform.python_version(), 'machine': platform.machine(),
+                       'results': results}, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if regressions:
+            sys.exit(1)
+        print('No regressions against {}'.format(args.baseline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,300 @@
+from typing import Callable, Optional, Tuple, List
+from functools import lru_cache, partial
+import ast
+import cmath
+import numpy as np
+
+from calculators.linedrawer import *
+from calculators.formula import Formula, formula_functions, formula_constants
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Whether to compile the generated loops to machine code with numba, when it's installed. Numba's
+# logarithms aren't always rounded the same way as python's, so the smooth values can differ slightly
+use_numba = True
+
+# Squared magnitudes this close to the escape (or cycle) tolerance squared are checked with abs()
+# instead, so that rounding in the square can never give a different answer to the drawer's own test
+square_margin = 1e-12
+
+
+def get_spec(drawer: LineDrawer,
+             function: Optional[Formula] = None,
+             derivative: Optional[Formula] = None) -> Optional[Tuple]:
+    """
+    Describe everything the drawer's calculate_point depends on, or None if there's
+    no generated version of it. Only the exact drawer classes below are handled, as
+    a subclass could have changed any part of the calculation
+    """
+    kind = type(drawer)
+    if kind in (SafeMandelbrotDrawer, ShipDrawer, MandelDropDrawer):
+        function = None
+    elif kind in (MandelLambdaDrawer, PickoverDrawer, PickoverDrawer2):
+        if not isinstance(function, Formula) or function.variables != ('z', 'c'):
+            return None
+    elif kind in (NewtonDrawer, NewtonStalkDrawer):
+        if not (isinstance(function, Formula) and isinstance(derivative, Formula)) \
+                or function.variables != ('z',) or derivative.variables != ('z',):
+            return None
+        return (kind.__name__, drawer.iterations, drawer.tolerance, drawer.constant,
+                function.source, derivative.source, getattr(drawer, 'power', None))
+    else:
+        return None
+    return (kind.__name__, drawer.iterations, drawer.escape, drawer.power,
+            function.source if function is not None else None,
+            drawer.cycle_detection, drawer.cycle_tolerance, getattr(drawer, 'bulb_check', False))
+
+
+def generate_source(spec: Tuple, vector: bool, record: bool = False) -> str:
+    """
+    Write out the calculation for a whole row of points as one function, with the
+    drawer's loop, condition, step and return value all inlined. The function takes
+    the points and the drawer's last value (only used by Newton drawers), and returns
+    the values, the last value and the number of iterations calculated - and when
+    recording, the iterations each point took as well
+    """
+    name = spec[0]
+    newton = name in ('NewtonDrawer', 'NewtonStalkDrawer')
+    safe = name in ('SafeMandelbrotDrawer', 'MandelLambdaDrawer', 'PickoverDrawer')
+    pickover = name in ('PickoverDrawer', 'PickoverDrawer2')
+    log_return = name != 'NewtonDrawer' and not pickover
+
+    lines = ['def calculate(points, last):',
+             '    count = 0']
+    if vector:
+        lines += ['    values = np.empty(points.shape[0])']
+        if record:
+            lines += ['    counts = np.zeros(points.shape[0], dtype=np.int64)']
+        lines += ['    for i in range(points.shape[0]):',
+                  '        c = points[i]']
+    else:
+        lines += ['    values = []',
+                  '    append = values.append']
+        if record:
+            lines += ['    counts = []',
+                      '    record = counts.append']
+        lines += ['    for c in points:']
+
+    def emit(indent: str, value: str) -> List[str]:
+        return [indent + ('values[i] = ' if vector else 'append(') + value + ('' if vector else ')')]
+
+    def skip(indent: str) -> List[str]:
+        # A point answered without iterating at all
+        return emit(indent, '0.0') + ([indent + 'record(0)'] if record and not vector else []) + \
+            [indent + 'continue']
+
+    if safe:
+        lines += ['        if c == 0j:'] + skip('            ')
+    if name in ('SafeMandelbrotDrawer', 'MandelLambdaDrawer') and spec[7] and spec[3] == 2:
+        # The same test as in_main_bulbs
+        lines += ['        x = c.real',
+                  '        y2 = c.imag * c.imag',
+                  '        q = (x - 0.25) * (x - 0.25) + y2',
+                  '        if q * (q + (x - 0.25)) < 0.25 * y2 or (x + 1.0) * (x + 1.0) + y2 < 0.0625:'] + \
+            skip('            ')
+
+    lines += ['        z = c',
+              '        n = 0',
+              '        interior = False']
+    cycles = not newton and spec[5]
+    if cycles:
+        lines += ['        saved = z',
+                  '        next_save = 1']
+
+    lines += ['        while n < ITERATIONS:']
+    if newton:
+        lines += ['            if not (abs(last.real - z.real) > TOLERANCE or abs(last.imag - z.imag) > TOLERANCE):',
+                  '                break']
+    elif pickover:
+        lines += ['            if not (abs(z.imag) <= ESCAPE and abs(z.real) <= ESCAPE):',
+                  '                break']
+    else:
+        drop = ' and n != 0' if name == 'MandelDropDrawer' else ''
+        # Numba gets the squared magnitude, checked with abs() only when it's close enough to the escape for
+        # the square's rounding to matter. Plain python keeps abs(): it's a single call into C there, and the
+        # squared test's extra attribute lookups and arithmetic make the whole loop about a third slower
+        if vector:
+            lines += ['            m = z.real * z.real + z.imag * z.imag',
+                      '            if not (m <= ESCAPE_LOW or (m <= ESCAPE_HIGH and abs(z) <= ESCAPE)){}:'.format(drop)]
+        else:
+            lines += ['            if not abs(z) <= ESCAPE{}:'.format(drop)]
+        lines += ['                break']
+
+    # Numba's own integer powers round differently to python's
+    power = exact_powers if vector else str
+    if newton:
+        lines += ['            last = z',
+                  '            den = ({})'.format(power(spec[5])),
+                  '            if den.real == 0.0 and den.imag == 0.0:',
+                  '                z = last',
+                  '            else:',
+                  '                z = z - (CONSTANT * (({}) / den))'.format(power(spec[4]))]
+    elif name == 'ShipDrawer':
+        lines += ['            z = ({}) + c'.format(power('(abs(z.real) + (1j * abs(z.imag))) ** POWER'))]
+    elif spec[4] is None:
+        lines += ['            z = ({}) + c'.format(power('z ** POWER'))]
+    else:
+        lines += ['            z = ({})'.format(power(spec[4]))]
+    lines += ['            n += 1']
+
+    if cycles:
+        lines += ['            d = z - saved']
+        if vector:
+            lines += ['            m = d.real * d.real + d.imag * d.imag',
+                      '            if m < CYCLE_LOW or (m < CYCLE_HIGH and abs(d) < CYCLE):']
+        else:
+            lines += ['            if abs(d) < CYCLE:']
+        lines += ['                interior = True',
+                  '                break',
+                  '            if n == next_save:',
+                  '                saved = z',
+                  '                next_save *= 2']
+
+    lines += ['        count += n']
+    if record:
+        lines += ['        counts[i] = n' if vector else '        record(n)']
+    if log_return:
+        lines += ['        if interior or n == ITERATIONS or n == 0:'] + emit('            ', '0.0') + ['        else:']
+        if vector:
+            # Numba's log10 only takes complex numbers, and gives -inf for 0 where python raises
+            lines += ['            if abs(z) == 1.0:',
+                      '                raise ValueError(\'math domain error\')']
+            lines += emit('            ', 'abs((n + 1) - (log10(log10(complex(abs(z)))) / LOG_POWER))')
+        else:
+            lines += emit('            ', 'abs((n + 1) - (log10(log10(abs(z))) / LOG_POWER))')
+    elif pickover:
+        lines += ['        if interior or n == ITERATIONS:'] + emit('            ', '0.0') + \
+                 ['        else:'] + emit('            ', 'abs(z.imag) + abs(z.real)')
+    else:
+        lines += ['        if n == ITERATIONS:'] + emit('            ', '0.0') + \
+                 ['        else:'] + emit('            ', '0.0 + n')
+    lines += ['    return values, last, count' + (', counts' if record else '')]
+    return '\n'.join(lines) + '\n'
+
+
+def python_power(z: complex, power: complex) -> complex:
+    """
+    Raise z to a power exactly as python's complex ** does - integer powers up to 100
+    by repeated squaring as in cpython's c_powi, anything else by the general formula.
+    Numba compiles this in place of its own **, whose integer powers (other than 2)
+    round differently, which over many iterations can change a point's escape count
+    """
+    z = complex(z)
+    power = complex(power)
+    if power.imag == 0.0 and power.real == int(power.real) and abs(power.real) <= 100.0:
+        n = abs(int(power.real))
+        result = 1.0 + 0.0j
+        square = z
+        mask = 1
+        while mask <= n:
+            if n & mask:
+                result = result * square
+            mask <<= 1
+            square = square * square
+        return result if power.real >= 0.0 else (1.0 + 0.0j) / result
+    return z ** power
+
+
+class PowerCalls(ast.NodeTransformer):
+    # Turns every a ** b into python_power(a, b)
+    def visit_BinOp(self, node: ast.BinOp) -> ast.expr:
+        node = self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.Call(ast.Name('python_power', ast.Load()), [node.left, node.right], [])
+        return node
+
+
+def exact_powers(source: str) -> str:
+    """
+    Rewrite an expression to raise to powers with python_power
+    """
+    return ast.unparse(PowerCalls().visit(ast.parse(source, mode='eval')))
+
+
+def square_band(tolerance: float) -> Tuple[float, float]:
+    # Squares of tolerances this far from 1 could under- or overflow, so those are always checked with abs()
+    if not 1e-100 < tolerance < 1e100:
+        return -1.0, float('inf')
+    return tolerance * tolerance * (1.0 - square_margin), tolerance * tolerance * (1.0 + square_margin)
+
+
+def get_namespace(spec: Tuple) -> dict:
+    namespace = {name: getattr(cmath, name) for name in formula_functions + formula_constants}
+    namespace.update({'np': np, 'log10': cmath.log10, 'python_power': python_power, 'ITERATIONS': spec[1]})
+    if spec[0] in ('NewtonDrawer', 'NewtonStalkDrawer'):
+        namespace.update({'TOLERANCE': spec[2], 'CONSTANT': spec[3]})
+        if spec[6] is not None:
+            namespace['LOG_POWER'] = cmath.log10(spec[6])
+        return namespace
+    escape, power, cycle = spec[2], spec[3], spec[6]
+    namespace.update({'ESCAPE': escape, 'POWER': power, 'LOG_POWER': cmath.log10(power), 'CYCLE': cycle})
+    namespace['ESCAPE_LOW'], namespace['ESCAPE_HIGH'] = square_band(escape)
+    namespace['CYCLE_LOW'], namespace['CYCLE_HIGH'] = square_band(cycle)
+    return namespace
+
+
+@lru_cache(maxsize=64)
+def build_row_function(spec: Tuple, record: bool = False) -> Optional[Callable]:
+    """
+    Generate and compile the row function for a spec, with numba if it's installed
+    and can compile it, otherwise as plain python. Built once per spec in each process,
+    and once more for the version that records each point's iterations
+    """
+    if numba is not None and use_numba:
+        try:
+            namespace = get_namespace(spec)
+            namespace['python_power'] = numba.njit(python_power)
+            exec(generate_source(spec, True, record), namespace)
+            compiled = numba.njit(namespace['calculate'])
+            compiled(np.zeros(1, dtype=complex), 100000.0 + 0.0j)
+
+            def calculate(points, last):
+                values, *rest = compiled(np.asarray(points, dtype=complex), complex(last))
+                return (values.tolist(), *rest)
+            return calculate
+        except Exception:
+            pass
+    try:
+        namespace = get_namespace(spec)
+        exec(generate_source(spec, False, record), namespace)
+        return namespace['calculate']
+    except Exception:
+        return None
+
+
+def compile_drawer(drawer: LineDrawer,
+                   function: Optional[Formula] = None,
+                   derivative: Optional[Formula] = None) -> LineDrawer:
+    """
+    Give the drawer a generated row function if one can be made for it, otherwise
+    leave it to calculate point by point as usual
+
+    :param drawer: The drawer to compile
+    :param function: The drawer's function, which can only be inlined if it's a formula
+    :param derivative: The drawer's derivative, for Newton drawers
+    :return: The drawer
+    """
+    spec = get_spec(drawer, function, derivative)
+    if spec is not None:
+        row_function = build_row_function(spec)
+        if row_function is not None:
+            drawer.row_function = partial(row_function_call, drawer, row_function, spec)
+    return drawer
+
+
+def row_function_call(drawer: LineDrawer, row_function: Callable, spec: Tuple, points: List[complex]) -> List[float]:
+    if drawer.record_iterations:
+        row_function = build_row_function(spec, True)
+        if row_function is None:
+            return list(drawer.calculate_recorded(points))
+    # Newton drawers carry their last value on from one point to the next
+    values, last, count, *counts = row_function(points, getattr(drawer, 'last_value', 0j))
+    if hasattr(drawer, 'last_value'):
+        drawer.last_value = last
+    drawer.iterated += count
+    if counts:
+        drawer.point_iterations.extend(counts[0])
+    return values
@@ -1,87 +1,276 @@
 from calculators.linedrawer import *
+from calculators.vectorised import *
+from calculators.perturbation import *
+from calculators.newton import NewtonBasinDrawer, RootTable, find_roots, array_function
+from calculators.formula import Formula, as_function
+from calculators.compiled import compile_drawer
+from calculators.symmetry import Symmetry, power_symmetry, formula_symmetry
+from copy import copy
 
 
 class LineFactory:
+    # Whether the fractal's interior regions have no holes, so they can be found by
+    # only drawing the borders of rectangles (see render.subdivision)
+    supports_subdivision = False
+    # Whether drawers that work point by point get a generated loop for the whole row,
+    # where one can be made (see calculators.compiled)
+    compile_loops = True
+
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
         pass
 
+    def compile(self, drawer: LineDrawer, function=None, derivative=None) -> LineDrawer:
+        return compile_drawer(drawer, function, derivative) if self.compile_loops else drawer
+
+    def get_symmetry(self) -> Symmetry:
+        """
+        How the fractal's output repeats itself, so renders can draw only part of it
+        (see render.symmetry)
+        """
+        return Symmetry()
+
+    def get_iterations(self) -> int:
+        """
+        The maximum number of iterations each point is drawn with
+        """
+        if not hasattr(self, 'iterations'):
+            raise ValueError('{} has no iteration limit'.format(type(self).__name__))
+        return self.iterations
+
+    def with_iterations(self, iterations: int) -> 'LineFactory':
+        """
+        A copy of the factory that draws with a different maximum number of iterations
+        """
+        self.get_iterations()
+        factory = copy(self)
+        factory.iterations = iterations
+        return factory
+
 
 class MandelFactory(LineFactory):
-    def __init__(self, escape: float, iterations: int, power: complex):
+    supports_subdivision = True
+
+    def __init__(self, escape: float, iterations: int, power: complex, vectorise: bool = True):
         super(MandelFactory, self).__init__()
         self.escapeval = escape
         self.iterations = iterations
         self.power = power
+        # Only integer powers are calculated exactly the same way on arrays (see vectorises_power)
+        self.vectorise = vectorise and vectorises_power(power)
+
+    def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
+        if self.vectorise:
+            return VectorisedMandelbrotDrawer(start, end, steps, self.iterations, self.power, self.escapeval)
+        return self.compile(SafeMandelbrotDrawer(start, end, steps, self.iterations, self.power, self.escapeval))
+
+    def get_symmetry(self) -> Symmetry:
+        # The polar inversion of Mandel-drops keeps both symmetries too
+        return power_symmetry(self.power)
+
+
+class DeepMandelFactory(LineFactory):
+
+    """
+    A power 2 Mandelbrot factory for deep zooms, using perturbation (see
+    PerturbationMandelbrotDrawer). The centre is given as strings (or Decimals) so
+    none of its digits are lost, and the region drawn is then given as offsets from
+    the centre - e.g. [-2e-50 + 1.125e-50j, 2e-50 - 1.125e-50j]. The offsets are
+    doubles, so zooms can go as deep as about 1e-300.
+
+    The centre's orbit is calculated once, here, in enough precision for every
+    digit of the centre to count.
+    """
+
+    supports_subdivision = True
+
+    def __init__(self,
+                 centre_real: Union[str, Decimal],
+                 centre_imag: Union[str, Decimal],
+                 escape: float,
+                 iterations: int,
+                 precision: int = None,
+                 series_approximation: bool = True):
+        """
+        :param centre_real: The real part of the centre
+        :param centre_imag: The imaginary part of the centre
+        :param escape: The escape value
+        :param iterations: The maximum number of iterations
+        :param precision: The significant digits to calculate the centre's orbit with, defaults to the
+                          digits in the centre plus a margin
+        :param series_approximation: Whether to skip the iterations every point shares with the centre
+        """
+        super(DeepMandelFactory, self).__init__()
+        self.escapeval = escape
+        self.iterations = iterations
+        if precision is None:
+            precision = max(significant_digits(centre_real), significant_digits(centre_imag), 20) + 10
+        self.series_approximation = series_approximation
+        self.orbit = reference_orbit(centre_real, centre_imag, iterations, escape, precision)
 
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return SafeMandelbrotDrawer(start, end, steps, self.iterations, self.power, self.escapeval)
+        return PerturbationMandelbrotDrawer(start, end, steps, self.iterations, self.escapeval, self.orbit,
+                                            self.series_approximation)
+
+    def get_symmetry(self) -> Symmetry:
+        # The offsets are mirrored about the centre, which is only a mirror of the set if it's on the real axis
+        return Symmetry(mirror=bool(np.all(self.orbit.imag == 0.0)))
 
 
 class MandelDropFactory(MandelFactory):
+    # The polar inversion turns the outside of the set into a bounded blob around the origin
+    supports_subdivision = False
+
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return MandelDropDrawer(start, end, steps, self.iterations, self.power, self.escapeval)
+        if self.vectorise:
+            return VectorisedMandelDropDrawer(start, end, steps, self.iterations, self.power, self.escapeval)
+        return self.compile(MandelDropDrawer(start, end, steps, self.iterations, self.power, self.escapeval))
 
 
 class ShipFactory(MandelFactory):
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return ShipDrawer(start, end, steps, self.iterations, self.power, self.escapeval)
+        if self.vectorise:
+            return VectorisedShipDrawer(start, end, steps, self.iterations, self.power, self.escapeval)
+        return self.compile(ShipDrawer(start, end, steps, self.iterations, self.power, self.escapeval))
+
+    def get_symmetry(self) -> Symmetry:
+        return Symmetry()
 
 
 class NewtonFactory(LineFactory):
+
+    """
+    The function and its derivative can be lambdas of z, or formula strings (see
+    Formula). If the function is a formula, the derivative can be left out and is
+    worked out from it
+    """
+
     def __init__(self,
                  iterations: int,
                  tolerance: float,
                  constant: complex,
-                 mainfunction: Callable[[complex], complex],
-                 derivative: Callable[[complex], complex]):
+                 mainfunction: Union[Callable[[complex], complex], str],
+                 derivative: Union[Callable[[complex], complex], str] = None):
         super(NewtonFactory, self).__init__()
         self.iterations = iterations
         self.tolerance = tolerance
         self.constant = constant
-        self.function = mainfunction
-        self.derivative = derivative
+        self.function = Formula(mainfunction, ('z',)) if isinstance(mainfunction, str) else mainfunction
+        if derivative is None:
+            if not isinstance(self.function, Formula):
+                raise ValueError('The derivative can only be left out when the function is a formula')
+            derivative = self.function.derivative()
+        self.derivative = Formula(derivative, ('z',)) if isinstance(derivative, str) else derivative
 
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return NewtonDrawer(start,
-                            end,
-                            steps,
-                            self.iterations,
-                            self.tolerance,
-                            self.constant,
-                            self.function,
-                            self.derivative)
+        return self.compile(NewtonDrawer(start,
+                                         end,
+                                         steps,
+                                         self.iterations,
+                                         self.tolerance,
+                                         self.constant,
+                                         as_function(self.function),
+                                         as_function(self.derivative)),
+                            self.function, self.derivative)
+
+    def get_symmetry(self) -> Symmetry:
+        # Only mirror symmetry - each point starts from the last point's total, and a half turn
+        # would reverse the order of the points in a row
+        mirror = complex(self.constant).imag == 0.0 and formula_symmetry(self.function).mirror \
+            and formula_symmetry(self.derivative).mirror
+        return Symmetry(mirror=mirror)
 
 
 class NewtonStalkFactory(NewtonFactory):
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return NewtonStalkDrawer(start,
-                                 end,
-                                 steps,
-                                 self.iterations,
-                                 self.tolerance,
-                                 self.constant,
-                                 self.function,
-                                 self.derivative)
+        return self.compile(NewtonStalkDrawer(start,
+                                              end,
+                                              steps,
+                                              self.iterations,
+                                              self.tolerance,
+                                              self.constant,
+                                              as_function(self.function),
+                                              as_function(self.derivative)),
+                            self.function, self.derivative)
+
+
+class NewtonBasinFactory(NewtonFactory):
+
+    """
+    Newton fractals drawn by which root each point converges to, as well as how
+    quickly (see NewtonBasinDrawer), a whole tile at a time. The roots are found once,
+    here, by running the method from a grid of points over the square of root_radius
+    about the origin, and the table is sent to the workers with the factory - a root
+    only found outside it is drawn as one extra basin.
+    """
+
+    def __init__(self,
+                 iterations: int,
+                 tolerance: float,
+                 constant: complex,
+                 mainfunction: Union[Callable[[complex], complex], str],
+                 derivative: Union[Callable[[complex], complex], str] = None,
+                 root_radius: float = 4.0,
+                 root_probes: int = 64):
+        """
+        :param root_radius: Half the width of the square the roots are looked for in
+        :param root_probes: The number of starting points along each side of that square
+        """
+        super(NewtonBasinFactory, self).__init__(iterations, tolerance, constant, mainfunction, derivative)
+        self.roots = find_roots(array_function(self.function), array_function(self.derivative), constant, tolerance,
+                                iterations, root_radius, root_probes)
+
+    def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
+        return NewtonBasinDrawer(start, end, steps, self.iterations, self.tolerance, self.constant, self.function,
+                                 self.derivative, self.roots)
+
+    def get_symmetry(self) -> Symmetry:
+        # A reflected point converges to the reflected root, which has a different basin number
+        return Symmetry()
 
 
 class MandelLambdaFactory(MandelFactory):
+
+    """
+    The function can be a lambda of z and c, or a formula string in z and c (see Formula)
+    """
+
     def __init__(self,
                  escape: float,
                  iterations: int,
                  power: complex,
-                 main_function: Callable[[complex, complex], complex]):
-        super(MandelLambdaFactory, self).__init__(escape, iterations, power)
+                 main_function: Union[Callable[[complex, complex], complex], str],
+                 vectorise: bool = True):
+        super(MandelLambdaFactory, self).__init__(escape, iterations, power, vectorise)
+        if isinstance(main_function, str):
+            main_function = Formula(main_function, ('z', 'c'))
         self.function = main_function
+        # Only lambdas that give the same answer on numpy arrays can use the vectorised drawer
+        self.vectorise = vectorise and can_vectorise(main_function)
+        # Points in the main cardioid and period-2 bulb are known to be interior, but only for z**2 + c
+        self.bulb_check = isinstance(main_function, Formula) and main_function.is_mandelbrot()
 
     def get_drawer(self, start: complex, end: complex, steps: int):
-        return MandelLambdaDrawer(start, end, steps, self.iterations, self.power, self.escapeval, self.function)
+        if self.vectorise:
+            drawer = VectorisedMandelLambdaDrawer(start, end, steps, self.iterations, self.power, self.escapeval,
+                                                  as_function(self.function))
+            drawer.bulb_check = self.bulb_check
+            return drawer
+        drawer = MandelLambdaDrawer(start, end, steps, self.iterations, self.power, self.escapeval,
+                                    as_function(self.function))
+        drawer.bulb_check = self.bulb_check
+        return self.compile(drawer, self.function)
+
+    def get_symmetry(self) -> Symmetry:
+        return formula_symmetry(self.function)
 
 
 class PickoverFactory(MandelLambdaFactory):
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return PickoverDrawer(start, end, steps, self.iterations, self.power, self.escapeval, self.function)
+        return self.compile(PickoverDrawer(start, end, steps, self.iterations, self.power, self.escapeval,
+                                           as_function(self.function)), self.function)
 
 
 class PickoverFactory2(MandelLambdaFactory):
     def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
-        return PickoverDrawer2(start, end, steps, self.iterations, self.power, self.escapeval, self.function)
+        return self.compile(PickoverDrawer2(start, end, steps, self.iterations, self.power, self.escapeval,
+                                            as_function(self.function)), self.function)
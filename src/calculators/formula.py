@@ -0,0 +1,308 @@
+from typing import Tuple, Callable, Union
+import ast
+import cmath
+import numpy as np
+
+# The functions and constants a formula can use, all from cmath
+formula_functions = ('exp', 'log', 'sqrt', 'sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh')
+formula_constants = ('pi', 'e')
+
+# The ways of writing the power 2 Mandelbrot set's z**2 + c that python calculates the same
+mandelbrot_trees = {ast.dump(ast.parse(source, mode='eval').body)
+                    for source in ('z**2 + c', 'c + z**2', 'z*z + c', 'c + z*z')}
+
+
+class Formula:
+
+    """
+    A fractal's function given as a formula string, e.g. 'z**3 + 0.4+0.002275j'. A
+    formula is plain arithmetic on its variables (+, -, *, /, **), numbers (including
+    complex ones), the cmath functions in formula_functions, pi and e, and
+    .conjugate(). Anything else is rejected when the formula is created.
+
+    A formula is called just like the equivalent lambda, which it is compiled to the
+    first time it's called in each process. Only the string is pickled, so a factory
+    built from formulas can be sent anywhere with the standard pickle. Formulas can
+    also be differentiated, for Newton fractals.
+    """
+
+    def __init__(self, source: str, variables: Tuple[str, ...] = ('z', 'c')):
+        """
+        :param source: The formula
+        :param variables: The names of the function's arguments, in order
+        """
+        self.source = source.strip()
+        self.variables = tuple(variables)
+        self.tree = self.parse()
+        self.function = None
+        self.vector_function = None
+
+    def parse(self) -> ast.expr:
+        try:
+            tree = ast.parse(self.source, mode='eval').body
+        except SyntaxError as e:
+            raise ValueError('Formula {!r} is not valid - {}'.format(self.source, e.msg))
+        for node in ast.walk(tree):
+            self.check_node(node)
+        return tree
+
+    def check_node(self, node: ast.AST):
+        allowed = (ast.BinOp, ast.UnaryOp, ast.Constant, ast.Name, ast.Call, ast.Attribute, ast.Load,
+                   ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd)
+        if not isinstance(node, allowed):
+            raise ValueError('Formula {!r} can\'t contain {}'.format(self.source, type(node).__name__))
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float, complex)):
+            raise ValueError('Formula {!r} can only contain numbers, not {!r}'.format(self.source, node.value))
+        if isinstance(node, ast.Name) and node.id not in self.variables + formula_functions + formula_constants:
+            raise ValueError('Formula {!r} has an unknown name {}'.format(self.source, node.id))
+        if isinstance(node, ast.Attribute) and node.attr != 'conjugate':
+            raise ValueError('Formula {!r} can only use .conjugate(), not .{}'.format(self.source, node.attr))
+        if isinstance(node, ast.Call):
+            if node.keywords or (isinstance(node.func, ast.Attribute) and node.args):
+                raise ValueError('Formula {!r} has a call with the wrong arguments'.format(self.source))
+            if isinstance(node.func, ast.Name) and (node.func.id not in formula_functions or len(node.args) != 1):
+                raise ValueError('Formula {!r} can\'t call {}'.format(self.source, node.func.id))
+
+    def get_function(self) -> Callable:
+        """
+        Get the formula as a compiled function, taking the variables in order
+        """
+        if self.function is None:
+            namespace = {name: getattr(cmath, name) for name in formula_functions + formula_constants}
+            self.function = eval('lambda {}: {}'.format(', '.join(self.variables), self.source), namespace)
+        return self.function
+
+    def get_vector_function(self) -> Callable:
+        """
+        Get the formula as a compiled function of whole numpy arrays, with numpy's
+        versions of the functions. These can differ from cmath's in the last place
+        """
+        if self.vector_function is None:
+            namespace = {name: getattr(np, name) for name in formula_functions + formula_constants}
+            self.vector_function = eval('lambda {}: {}'.format(', '.join(self.variables), self.source), namespace)
+        return self.vector_function
+
+    def __call__(self, *args):
+        return self.get_function()(*args)
+
+    def derivative(self, variable: str = None) -> 'Formula':
+        """
+        Differentiate the formula, by default with respect to its first variable
+
+        :param variable: The variable to differentiate with respect to
+        :return: The derivative, as a formula with the same variables
+        """
+        if variable is None:
+            variable = self.variables[0]
+        return Formula(ast.unparse(differentiate(self.tree, variable)), self.variables)
+
+    def is_real(self) -> bool:
+        """
+        Whether every number in the formula is real, so conjugating all of its variables
+        conjugates its result, f(conj(z), conj(c)) = conj(f(z, c))
+        """
+        return all(complex(node.value).imag == 0.0 for node in ast.walk(self.tree) if isinstance(node, ast.Constant))
+
+    def get_parity(self) -> int:
+        """
+        How the formula's result changes when all of its variables are negated - 1 if it
+        stays the same (even), -1 if it's negated too (odd), 0 if it is always 0 and None
+        if neither
+        """
+        return parity(self.tree)
+
+    def is_mandelbrot(self) -> bool:
+        """
+        Whether the formula is the power 2 Mandelbrot set's, z**2 + c, so what's known
+        about that set can be used to draw it
+        """
+        return self.variables == ('z', 'c') and ast.dump(self.tree) in mandelbrot_trees
+
+    def __getstate__(self):
+        return {'source': self.source, 'variables': self.variables}
+
+    def __setstate__(self, state):
+        self.source = state['source']
+        self.variables = state['variables']
+        self.tree = self.parse()
+        self.function = None
+        self.vector_function = None
+
+    def __repr__(self):
+        return 'Formula({!r}, {!r})'.format(self.source, self.variables)
+
+
+def as_function(function: Union[Callable, Formula]) -> Callable:
+    """
+    The compiled function for a formula, or the function itself for anything else
+    """
+    return function.get_function() if isinstance(function, Formula) else function
+
+
+def is_number(node: ast.expr, value=None) -> bool:
+    return isinstance(node, ast.Constant) and (value is None or node.value == value)
+
+
+def has_variable(node: ast.expr, variable: str) -> bool:
+    return any(isinstance(x, ast.Name) and x.id == variable for x in ast.walk(node))
+
+
+def number(value) -> ast.expr:
+    return ast.Constant(value)
+
+
+def fold(node: ast.expr) -> ast.expr:
+    # Work out any arithmetic on numbers alone
+    if not any(isinstance(x, (ast.Name, ast.Call)) for x in ast.walk(node)):
+        return number(eval(compile(ast.fix_missing_locations(ast.Expression(body=node)), '<formula>', 'eval')))
+    return node
+
+
+def add(a: ast.expr, b: ast.expr) -> ast.expr:
+    if is_number(a, 0):
+        return b
+    if is_number(b, 0):
+        return a
+    return fold(ast.BinOp(a, ast.Add(), b))
+
+
+def subtract(a: ast.expr, b: ast.expr) -> ast.expr:
+    if is_number(b, 0):
+        return a
+    if is_number(a, 0):
+        return negate(b)
+    return fold(ast.BinOp(a, ast.Sub(), b))
+
+
+def multiply(a: ast.expr, b: ast.expr) -> ast.expr:
+    if is_number(a, 0) or is_number(b, 0):
+        return number(0)
+    if is_number(a, 1):
+        return b
+    if is_number(b, 1):
+        return a
+    return fold(ast.BinOp(a, ast.Mult(), b))
+
+
+def divide(a: ast.expr, b: ast.expr) -> ast.expr:
+    if is_number(a, 0):
+        return number(0)
+    if is_number(b, 1):
+        return a
+    return fold(ast.BinOp(a, ast.Div(), b))
+
+
+def power(a: ast.expr, b: ast.expr) -> ast.expr:
+    if is_number(b, 0):
+        return number(1)
+    if is_number(b, 1):
+        return a
+    return fold(ast.BinOp(a, ast.Pow(), b))
+
+
+def negate(a: ast.expr) -> ast.expr:
+    return fold(ast.UnaryOp(ast.USub(), a))
+
+
+def call(name: str, a: ast.expr) -> ast.expr:
+    return ast.Call(ast.Name(name, ast.Load()), [a], [])
+
+
+# The functions which give the same result for a negated argument, and those which negate their result
+even_functions = ('cos', 'cosh')
+odd_functions = ('sin', 'tan', 'sinh', 'tanh')
+
+
+def combine(a: int, b: int) -> int:
+    # The parity of a sum of two parts
+    if a == 0 or b == 0:
+        return b if a == 0 else a
+    return a if a == b else None
+
+
+def parity(node: ast.expr) -> int:
+    """
+    The parity of a checked formula's syntax tree in its variables, as Formula.get_parity
+    """
+    if isinstance(node, ast.Constant):
+        return 0 if node.value == 0 else 1
+    if isinstance(node, ast.Name):
+        return 1 if node.id in formula_constants else -1
+    if isinstance(node, ast.UnaryOp):
+        return parity(node.operand)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        # conj(-z) = -conj(z)
+        return parity(node.func.value)
+
+    if isinstance(node, ast.BinOp):
+        a, b = parity(node.left), parity(node.right)
+        if isinstance(node.op, (ast.Add, ast.Sub)):
+            return None if a is None or b is None else combine(a, b)
+        if isinstance(node.op, ast.Mult):
+            return None if a is None or b is None else a * b
+        if isinstance(node.op, ast.Div):
+            return None if a is None or not b else a * b
+        if a == 1 and b == 1:
+            return 1
+        if a is not None and is_number(node.right) and complex(node.right.value) == int(node.right.value.real):
+            # Integer powers of an odd part are odd or even with the power
+            return a ** abs(int(node.right.value.real)) if a else None
+        return None
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        a = parity(node.args[0])
+        if a == 1:
+            return 1
+        if node.func.id in even_functions and a is not None:
+            return 1
+        if node.func.id in odd_functions:
+            return a
+        return None
+
+    return None
+
+
+def differentiate(node: ast.expr, variable: str) -> ast.expr:
+    """
+    Differentiate a checked formula's syntax tree with respect to a variable
+    """
+    if not has_variable(node, variable):
+        return number(0)
+    if isinstance(node, ast.Name):
+        return number(1)
+    if isinstance(node, ast.UnaryOp):
+        inner = differentiate(node.operand, variable)
+        return negate(inner) if isinstance(node.op, ast.USub) else inner
+
+    if isinstance(node, ast.BinOp):
+        a, b = node.left, node.right
+        da, db = differentiate(a, variable), differentiate(b, variable)
+        if isinstance(node.op, ast.Add):
+            return add(da, db)
+        if isinstance(node.op, ast.Sub):
+            return subtract(da, db)
+        if isinstance(node.op, ast.Mult):
+            return add(multiply(da, b), multiply(a, db))
+        if isinstance(node.op, ast.Div):
+            return divide(subtract(multiply(da, b), multiply(a, db)), power(b, number(2)))
+        if not has_variable(b, variable):
+            # n * a^(n - 1) * a'
+            return multiply(multiply(b, power(a, subtract(b, number(1)))), da)
+        # a^b * (b' * log(a) + b * a' / a)
+        return multiply(node, add(multiply(db, call('log', a)), divide(multiply(b, da), a)))
+
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+        a = node.args[0]
+        da = differentiate(a, variable)
+        outer = {'exp': lambda: call('exp', a),
+                 'log': lambda: divide(number(1), a),
+                 'sqrt': lambda: divide(number(1), multiply(number(2), call('sqrt', a))),
+                 'sin': lambda: call('cos', a),
+                 'cos': lambda: negate(call('sin', a)),
+                 'tan': lambda: divide(number(1), power(call('cos', a), number(2))),
+                 'sinh': lambda: call('cosh', a),
+                 'cosh': lambda: call('sinh', a),
+                 'tanh': lambda: divide(number(1), power(call('cosh', a), number(2)))}[node.func.id]()
+        return multiply(outer, da)
+
+    raise ValueError('{} has no derivative with respect to {}'.format(ast.unparse(node), variable))
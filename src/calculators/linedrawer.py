@@ -1,5 +1,14 @@
-from typing import List, Callable
+from typing import List, Callable, Iterable
 from cmath import log10, rect, phase
+import numpy as np
+
+
+def get_step(start: float, end: float, count: int) -> float:
+    """
+    The distance from one pixel to the next of count pixels from start to end - the
+    first and last on start and end, or a lone pixel on start, with no step at all
+    """
+    return (end - start) / (count - 1) if count > 1 else 0.0
 
 
 class LineDrawer:
@@ -9,31 +18,67 @@ class LineDrawer:
     and creates the points along it
     """
 
+    # Whether to keep how many iterations each point took in point_iterations, as it's calculated
+    record_iterations = False
+
     def __init__(self, start_point: complex, end_point: complex, steps: int):
         self.start_point = start_point
         self.end_point = end_point
         self.steps = steps
         self.points = []
-        self.outpoints = []
-
-    def create_range(self):
+        self.outpoints = np.zeros(0)
+        # Iterations that were never calculated point by point, e.g. skipped by a series approximation
+        self.skipped = 0
+        # Iterations actually calculated, over every point drawn
+        self.iterated = 0
+        # A generated function that calculates a whole row of points at once, if the drawer has one
+        self.row_function = None
+        # The iterations each point took, in the order they were calculated, when record_iterations is set
+        self.point_iterations = []
+
+    def create_range(self, first: int = 0, count: int = None):
+        """
+        Create the points along the line. A sub-section of the line can be created by
+        giving the index of the first point and the number of points wanted, which
+        gives exactly the same points as creating the whole line and slicing it
+
+        :param first: The index of the first point to create
+        :param count: The number of points to create, defaults to the rest of the line
+        """
+        if count is None:
+            count = self.steps - first
+        self.create_points(range(first, first + count, 1))
+
+    def create_points(self, int_points: Iterable[int]):
+        """
+        Create the points at the given indices along the line - e.g. every fourth one -
+        which are exactly the same points as those indices of the whole line
+
+        :param int_points: The indices of the points to create
+        """
         # print("Input points are - {}, {}".format(self.start_point, self.end_point))
         if self.start_point.real != self.end_point.real:
             # print("step basis - {}".format(self.end_point.real - self.start_point.real))
-            re_step = (self.end_point.real - self.start_point.real) / (self.steps - 1)
+            re_step = get_step(self.start_point.real, self.end_point.real, self.steps)
         else:
             re_step = 0 + 0j
 
         if self.start_point.imag != self.end_point.imag:
-            im_step = (self.end_point.imag - self.start_point.imag) / (self.steps - 1)
+            im_step = get_step(self.start_point.imag, self.end_point.imag, self.steps)
         else:
             im_step = 0 + 0j
 
         # print("Step values are - {}, {}".format(re_step, im_step))
 
-        int_points = range(0, self.steps, 1)
+        self.set_points([(x*re_step + self.start_point.real) + (x*im_step + self.start_point.imag)*1j
+                         for x in int_points])
 
-        self.points = [(x*re_step + self.start_point.real) + (x*im_step + self.start_point.imag)*1j for x in int_points]
+    def set_points(self, points: List[complex]):
+        """
+        Use the given points rather than ones along the line - e.g. samples within a
+        pixel - mapped just as the line's own points would be
+        """
+        self.points = list(points)
         self.map_points()
 
     def map_points(self):
@@ -42,11 +87,34 @@ class LineDrawer:
     def get_points(self) -> List[complex]:
         return self.points
 
-    def get_output(self) -> List[float]:
+    def get_output(self) -> np.ndarray:
         return self.outpoints
 
     def draw(self):
-        self.outpoints = [self.calculate_point(x) for x in self.points]
+        # Held as a float64 array rather than a list of python floats - 8 bytes a point
+        self.outpoints = np.fromiter(self.calculate_row(self.points), dtype=np.float64, count=len(self.points))
+
+    def calculate_row(self, points: List[complex]) -> Iterable[float]:
+        """
+        Calculate the output for a list of (already mapped) points, with the generated
+        row function if the drawer has one (see calculators.compiled), otherwise point by point
+        """
+        if self.row_function is not None:
+            return self.row_function(points)
+        if self.record_iterations:
+            return self.calculate_recorded(points)
+        return (self.calculate_point(x) for x in points)
+
+    def calculate_recorded(self, points: List[complex]) -> Iterable[float]:
+        """
+        Calculate the points one by one, keeping the iterations each one took from how
+        far it moved the drawer's count on
+        """
+        for point in points:
+            before = self.iterated
+            value = self.calculate_point(point)
+            self.point_iterations.append(self.iterated - before)
+            yield value
 
     def calculate_point(self, pointval: complex) -> int:
         return 0
@@ -71,6 +139,7 @@ class IterativeDrawer(LineDrawer):
         while self.apply_condition(iters) and iters < self.iterations:
             self.total = self.apply_alg(self.total, point_val)
             iters += 1
+        self.iterated += iters
         return self.calc_returnval(iters, point_val)
 
     def calc_returnval(self, iterations: float, point_val: complex) -> float:
@@ -89,7 +158,30 @@ class IterativeDrawer(LineDrawer):
         return 0 + 0j
 
 
+def in_main_bulbs(point_val: complex) -> bool:
+    """
+    Check if a point is inside the main cardioid or the period-2 bulb of the power 2
+    Mandelbrot set, where every point is interior
+    """
+    x = point_val.real
+    y2 = point_val.imag * point_val.imag
+    q = (x - 0.25) * (x - 0.25) + y2
+    return q * (q + (x - 0.25)) < 0.25 * y2 or (x + 1.0) * (x + 1.0) + y2 < 0.0625
+
+
 class PowerAndEscapeDrawer(IterativeDrawer):
+
+    """
+    An iterative drawer that escapes when the total gets too large. Orbits that
+    settle into a cycle never escape, so the total is checked against a saved value
+    (Brent's method - the saved value is replaced at every power of two iterations)
+    and the point is treated as interior as soon as it repeats
+    """
+
+    # Drawers whose loop doesn't end by escaping should turn this off
+    cycle_detection = True
+    cycle_tolerance = 1e-13
+
     def __init__(self,
                  start_point: complex,
                  end_point: complex,
@@ -101,6 +193,26 @@ class PowerAndEscapeDrawer(IterativeDrawer):
         self.escape = escape
         self.power = power
 
+    def calculate_point(self, point_val: complex) -> float:
+        if not self.cycle_detection:
+            return super(PowerAndEscapeDrawer, self).calculate_point(point_val)
+        self.total = 0 + 0j
+        self.init_point(point_val)
+        iters = 0
+        saved = self.total
+        next_save = 1
+        while self.apply_condition(iters) and iters < self.iterations:
+            self.total = self.apply_alg(self.total, point_val)
+            iters += 1
+            if abs(self.total - saved) < self.cycle_tolerance:
+                self.iterated += iters
+                return self.calc_returnval(self.iterations, point_val)
+            if iters == next_save:
+                saved = self.total
+                next_save *= 2
+        self.iterated += iters
+        return self.calc_returnval(iters, point_val)
+
     def apply_condition(self, iters: int) -> bool:
         return abs(self.total) <= self.escape
 
@@ -145,11 +257,18 @@ class SafeMandelbrotDrawer(MandelbrotDrawer):
 
     """
     A Mandelbrot drawer creates mandelbrot style fractals with arbitrary (complex)
-    powers but that is safe for negative powers at the origin point
+    powers but that is safe for negative powers at the origin point. Power 2 sets
+    skip straight to interior for points in the main cardioid and period-2 bulb
     """
+
+    # Only valid while apply_alg really is z**2 + c
+    bulb_check = True
+
     def calculate_point(self, point_val: complex) -> float:
         if point_val == 0.0 + 0.0j:
             return 0.0
+        if self.bulb_check and self.power == 2 and in_main_bulbs(point_val):
+            return 0.0
         return super(SafeMandelbrotDrawer, self).calculate_point(point_val)
 
 
@@ -202,6 +321,10 @@ class NewtonDrawer(IterativeDrawer):
 
 
 class NewtonStalkDrawer(LogDrawer):
+
+    # Stops when the total stops moving rather than escaping, so a repeat is the normal finish
+    cycle_detection = False
+
     def __init__(self,
                  start_point: complex,
                  end_point: complex,
@@ -240,6 +363,11 @@ class MandelDropDrawer(PolarInverterDrawer, MandelbrotDrawer):
 
 
 class MandelLambdaDrawer(SafeMandelbrotDrawer):
+
+    # The lambda could be anything, even with a power of 2 - the factory turns this on
+    # for formulas it knows are z**2 + c
+    bulb_check = False
+
     def __init__(self,
                  start: complex,
                  end: complex,
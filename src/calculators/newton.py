@@ -0,0 +1,217 @@
+from typing import Callable, Union, Tuple
+import numpy as np
+
+from calculators.linedrawer import *
+from calculators.vectorised import VectorisedDrawer, PythonArithmeticArray, can_vectorise
+from calculators.formula import Formula
+
+# A point that has converged within this many times the tolerance of a root is taken to be converging to it
+root_match_scale = 100.0
+
+
+def array_function(function: Union[Callable[[complex], complex], Formula]) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    A version of a function of z that takes whole numpy arrays - numpy's own for a
+    formula, the lambda itself if it gives the same answers on arrays (see
+    can_vectorise), and otherwise the lambda called point by point
+    """
+    if isinstance(function, Formula):
+        return function.get_vector_function()
+    if can_vectorise(lambda z, c: function(z)):
+        return lambda z: np.asarray(function(z.view(PythonArithmeticArray)))
+    return np.vectorize(function, otypes=[complex])
+
+
+def newton_iterate(points: np.ndarray,
+                   function: Callable[[np.ndarray], np.ndarray],
+                   derivative: Callable[[np.ndarray], np.ndarray],
+                   constant: complex,
+                   tolerance: float,
+                   iterations: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    Run Newton's method from every point at once, z -> z - constant * f(z) / f'(z),
+    until each point moves less than the tolerance (in both parts) in an iteration.
+    Points are dropped from the working set as they converge, so the cost of each
+    iteration is proportional to the points still moving.
+
+    A point whose derivative is zero, or whose total stops being finite, stops without
+    converging, as does one still moving after the maximum iterations.
+
+    :param points: A 1D complex array of starting points
+    :param function: The array version of f
+    :param derivative: The array version of f'
+    :param constant: The constant the step is multiplied by, 1 for the plain method
+    :param tolerance: How little a point has to move to have converged
+    :param iterations: The maximum number of iterations
+    :return: The total each point finished on, the iterations it took, whether it converged, and the
+             iterations calculated in all
+    """
+    finals = points.copy()
+    iters = np.zeros(points.shape, dtype=np.int32)
+    converged = np.zeros(points.shape, dtype=bool)
+    live = np.arange(points.size)
+    z = points.copy()
+    n = 0
+    iterated = 0
+
+    with np.errstate(all='ignore'):
+        while live.size and n < iterations:
+            iterated += live.size
+            slope = derivative(z)
+            stuck = slope == 0.0
+            moved = np.where(stuck, z, z - constant * function(z) / np.where(stuck, 1.0, slope))
+            n += 1
+            still = (np.abs(moved.real - z.real) > tolerance) | (np.abs(moved.imag - z.imag) > tolerance)
+            finite = np.isfinite(moved)
+            still &= finite & ~stuck
+            if not still.all():
+                done = ~still
+                finals[live[done]] = moved[done]
+                iters[live[done]] = n
+                converged[live[done]] = (finite & ~stuck)[done]
+                live = live[still]
+                moved = moved[still]
+            z = moved
+        finals[live] = z
+        iters[live] = n
+    return finals, iters, converged, iterated
+
+
+class RootTable:
+
+    """
+    The distinct roots a Newton fractal's points converge to, in a fixed order, so
+    every tile of a render - whichever process draws it - numbers the basins the
+    same way
+    """
+
+    def __init__(self, roots: np.ndarray, tolerance: float):
+        """
+        :param roots: The roots
+        :param tolerance: How close a point has to finish to a root to be taken as converging to it
+        """
+        self.roots = np.asarray(roots, dtype=complex)
+        self.tolerance = tolerance
+
+    def match(self, values: np.ndarray) -> np.ndarray:
+        """
+        Find the root each value is at
+
+        :param values: A 1D complex array of converged totals
+        :return: The index of each value's root, as int16, or the number of roots for a value not at any of them
+        """
+        indices = np.full(values.shape, len(self.roots), dtype=np.int16)
+        if len(self.roots) and values.size:
+            distances = np.abs(values[:, np.newaxis] - self.roots[np.newaxis, :])
+            nearest = np.argmin(distances, axis=1)
+            close = distances[np.arange(values.size), nearest] <= self.tolerance
+            indices[close] = nearest[close]
+        return indices
+
+    def __len__(self):
+        return len(self.roots)
+
+    def __repr__(self):
+        return 'RootTable({})'.format(', '.join('{:.6g}'.format(root) for root in self.roots))
+
+
+def find_roots(function: Callable[[np.ndarray], np.ndarray],
+               derivative: Callable[[np.ndarray], np.ndarray],
+               constant: complex,
+               tolerance: float,
+               iterations: int,
+               radius: float,
+               probes: int) -> RootTable:
+    """
+    Find the roots of a function by running Newton's method from a grid of points
+    over the square of the given radius about the origin, and merging the totals they
+    converge to. The roots are sorted by their real then imaginary parts
+
+    :param radius: Half the width of the square of starting points
+    :param probes: The number of starting points along each side of the square
+    """
+    line = np.linspace(-radius, radius, probes)
+    points = (line[np.newaxis, :] + 1j * line[:, np.newaxis]).ravel()
+    finals, _, converged, _ = newton_iterate(points, function, derivative, constant, tolerance, iterations)
+
+    match_tolerance = tolerance * root_match_scale
+    roots = []
+    for value in finals[converged]:
+        if not roots or np.min(np.abs(np.array(roots) - value)) > match_tolerance:
+            roots.append(value)
+    roots.sort(key=lambda root: (round(root.real / match_tolerance), round(root.imag / match_tolerance)))
+    return RootTable(np.array(roots, dtype=complex), match_tolerance)
+
+
+def basin_values(basins: np.ndarray, iters: np.ndarray, iterations: int) -> np.ndarray:
+    """
+    Pack basins and iteration counts into raw output - the basin number counting from
+    1 plus the fraction of the maximum iterations the point took, or 0 for a point that
+    didn't converge
+    """
+    return np.where(basins >= 0, basins + 1.0 + iters / (iterations + 1.0), 0.0)
+
+
+def split_basins(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Unpack the raw output of NewtonBasinDrawer
+
+    :return: The basin of each point as int16 (-1 where it didn't converge), and the fraction of the
+             maximum iterations it took
+    """
+    values = np.asarray(values, dtype=np.float64)
+    whole = np.floor(values)
+    return (whole - 1).astype(np.int16), values - whole
+
+
+class NewtonBasinDrawer(VectorisedDrawer, LineDrawer):
+
+    """
+    A Newton fractal drawer that iterates whole tiles as arrays (see newton_iterate),
+    and records which root each point converges to as well as how quickly, from the
+    factory's table of roots. Colour with BasinColourRanger to show the basins.
+
+    Unlike NewtonDrawer each point is iterated on its own, so it can differ from it at
+    a few points that converge on the first iteration.
+    """
+
+    def __init__(self,
+                 start_point: complex,
+                 end_point: complex,
+                 steps: int,
+                 iterations: int,
+                 tolerance: float,
+                 constant: complex,
+                 main_function: Union[Callable[[complex], complex], Formula],
+                 derivative: Union[Callable[[complex], complex], Formula],
+                 roots: RootTable):
+        super(NewtonBasinDrawer, self).__init__(start_point, end_point, steps)
+        self.iterations = iterations
+        self.tolerance = tolerance
+        self.constant = constant
+        self.function = main_function
+        self.derivative = derivative
+        self.roots = roots
+
+    def calculate_basins(self, points: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the basin of every point, and how many iterations it took to get there
+
+        :param points: The points, of any shape
+        :return: The index of each point's root in the root table as int16 (the number of roots for an
+                 unknown root, -1 if it didn't converge), and its iterations as int32, both the shape of points
+        """
+        flat_points = np.asarray(points, dtype=complex).ravel()
+        finals, iters, converged, iterated = newton_iterate(flat_points, array_function(self.function),
+                                                            array_function(self.derivative), self.constant,
+                                                            self.tolerance, self.iterations)
+        self.iterated += iterated
+        if self.record_iterations:
+            self.point_iterations.extend(iters.tolist())
+        basins = np.full(flat_points.shape, -1, dtype=np.int16)
+        basins[converged] = self.roots.match(finals[converged])
+        return basins.reshape(np.shape(points)), iters.reshape(np.shape(points))
+
+    def calculate_points(self, points: np.ndarray) -> np.ndarray:
+        basins, iters = self.calculate_basins(points)
+        return basin_values(basins, iters, self.iterations)
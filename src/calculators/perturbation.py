@@ -0,0 +1,208 @@
+from typing import List, Union, Tuple
+from decimal import Decimal, localcontext
+import numpy as np
+
+from calculators.linedrawer import *
+from calculators.vectorised import VectorisedDrawer
+
+
+def significant_digits(value: Union[str, Decimal]) -> int:
+    return len(Decimal(value).as_tuple().digits)
+
+
+def reference_orbit(centre_real: Union[str, Decimal],
+                    centre_imag: Union[str, Decimal],
+                    iterations: int,
+                    escape: float,
+                    precision: int) -> np.ndarray:
+    """
+    Iterate the power 2 Mandelbrot set at the centre in arbitrary precision, keeping
+    each total rounded to a complex double. The orbit starts from 0, so element n is
+    the total after n iterations, and stops at the first total past the escape value
+    (or after iterations + 1 totals if it never escapes)
+
+    :param centre_real: The real part of the centre, as a string or Decimal to keep every digit
+    :param centre_imag: The imaginary part of the centre
+    :param iterations: The maximum number of iterations
+    :param escape: The escape value
+    :param precision: The number of significant digits to iterate with
+    :return: A complex128 array of the totals
+    """
+    orbit = [0j]
+    with localcontext() as context:
+        context.prec = precision
+        c_real = Decimal(centre_real)
+        c_imag = Decimal(centre_imag)
+        z_real = Decimal(0)
+        z_imag = Decimal(0)
+        escape_squared = Decimal(escape) * Decimal(escape)
+        for _ in range(iterations + 1):
+            z_real, z_imag = z_real * z_real - z_imag * z_imag + c_real, 2 * z_real * z_imag + c_imag
+            orbit.append(complex(float(z_real), float(z_imag)))
+            if z_real * z_real + z_imag * z_imag > escape_squared:
+                break
+    return np.array(orbit, dtype=complex)
+
+
+class PerturbationMandelbrotDrawer(VectorisedDrawer, LogDrawer):
+
+    """
+    A power 2 Mandelbrot drawer for zooms past the precision of a double. Its points
+    are offsets from a centre point, whose orbit has been calculated in arbitrary
+    precision (see reference_orbit). Each point is iterated as a double precision
+    difference from that reference orbit, which stays accurate however small the
+    offsets are:
+
+        d(n+1) = 2 * Z(n) * d(n) + d(n)^2 + dc
+
+    The difference stops being accurate (a glitch) when the point's total gets
+    smaller than the difference itself - the reference has then moved away from the
+    point, and the rest of the point's orbit would be lost in rounding. The same
+    happens when the reference escapes before the point does. Either way the point
+    is rebased - its total becomes the new difference from the start of the
+    reference orbit (which is 0), and it carries on from there.
+
+    Near the reference, every point follows it closely for many iterations, so the
+    difference is well approximated by a polynomial in the point's offset:
+
+        d(n) ~= A(n) * dc + B(n) * dc^2 + C(n) * dc^3
+
+    whose coefficients only need to be iterated once for all of the points. Every
+    point starts from that, skipping the iterations up to the last one where the
+    polynomial is still accurate (see get_skip).
+    """
+
+    # Orbits are only known as differences, which a fixed tolerance can't be compared with
+    cycle_detection = False
+    # The largest relative error allowed in the series approximation
+    series_tolerance = 1e-12
+
+    def __init__(self,
+                 start_point: complex,
+                 end_point: complex,
+                 steps: int,
+                 iterations: int,
+                 escape: float,
+                 orbit: np.ndarray,
+                 series_approximation: bool = True):
+        super(PerturbationMandelbrotDrawer, self).__init__(start_point, end_point, steps, iterations, 2, escape)
+        self.orbit = orbit
+        self.series_approximation = series_approximation
+
+    def get_skip(self, points: np.ndarray) -> Tuple[int, complex, complex, complex]:
+        """
+        Find how many iterations all of the points can skip, and the coefficients of the
+        series approximation to start them from. The series is stopped at the first
+        iteration where any of the following would fail:
+
+        * the cubic term is below the tolerance, relative to the linear term, at the
+          furthest point from the centre
+        * the series matches the differences of the corners of the points' bounding
+          box, iterated in full, to within the tolerance
+        * no point can have escaped or need rebasing, given the largest the difference
+          can be
+
+        :param points: The offsets from the centre to skip for
+        :return: The iterations to skip, and the coefficients A, B and C after them
+        """
+        orbit = self.orbit
+        last = len(orbit) - 1
+        tolerance = self.series_tolerance
+        radius = float(np.abs(points).max())
+        corners = [complex(x, y)
+                   for x in (points.real.min(), points.real.max())
+                   for y in (points.imag.min(), points.imag.max())]
+
+        def fits(position: int, bound: float) -> bool:
+            reference = abs(orbit[position])
+            return reference + bound <= self.escape and reference >= 2.0 * bound
+
+        a, b, c = 1 + 0j, 0j, 0j
+        deltas = list(corners)
+        skip = 0
+        if not fits(1, radius):
+            return skip, a, b, c
+
+        while skip < self.iterations and skip + 1 < last:
+            reference = orbit[skip + 1]
+            next_a = 2.0 * reference * a + 1.0
+            next_b = 2.0 * reference * b + a * a
+            next_c = 2.0 * reference * c + 2.0 * a * b
+            next_deltas = [2.0 * reference * d + d * d + dc for d, dc in zip(deltas, corners)]
+
+            if abs(next_c) * radius ** 3 > tolerance * abs(next_a) * radius:
+                break
+            if any(abs(next_a * dc + next_b * dc * dc + next_c * dc * dc * dc - d) > tolerance * abs(d)
+                   for d, dc in zip(next_deltas, corners)):
+                break
+            if not fits(skip + 2, abs(next_a) * radius + abs(next_b) * radius ** 2 + abs(next_c) * radius ** 3):
+                break
+
+            a, b, c = next_a, next_b, next_c
+            deltas = next_deltas
+            skip += 1
+        return skip, a, b, c
+
+    def calculate_point(self, point_val: complex) -> float:
+        return float(self.calculate_points(np.array([point_val], dtype=complex))[0])
+
+    def calculate_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculate the output value for an array of offsets from the centre, of any shape
+
+        :param points: The offsets to iterate
+        :return: A float64 array of the same shape as points
+        """
+        orbit = self.orbit
+        last = len(orbit) - 1
+        flat_points = points.ravel()
+        totals = np.zeros(flat_points.shape, dtype=complex)
+        iters = np.zeros(flat_points.shape, dtype=np.int64)
+
+        with np.errstate(all='ignore'):
+            # The first total is the point itself, one iteration into the reference, but
+            # the series approximation can start every point further on
+            n = 0
+            deltas = flat_points.copy()
+            if self.series_approximation and flat_points.size:
+                n, a, b, c = self.get_skip(flat_points)
+                deltas = ((c * flat_points + b) * flat_points + a) * flat_points
+                self.skipped += n * flat_points.size
+            position = np.full(flat_points.shape, n + 1, dtype=np.int64)
+            z = orbit[position] + deltas
+            live = np.flatnonzero(np.abs(z) <= self.escape)
+            dc = flat_points[live]
+            deltas = deltas[live]
+            position = position[live]
+            z = z[live]
+            while True:
+                rebase = (np.abs(z) < np.abs(deltas)) | (position == last)
+                deltas[rebase] = z[rebase]
+                position[rebase] = 0
+
+                if not live.size or n == self.iterations:
+                    break
+                self.iterated += live.size
+                reference = orbit[position]
+                deltas = 2.0 * reference * deltas + deltas * deltas + dc
+                position += 1
+                z = orbit[position] + deltas
+                n += 1
+
+                still = np.abs(z) <= self.escape
+                if not still.all():
+                    done = ~still
+                    totals[live[done]] = z[done]
+                    iters[live[done]] = n
+                    live = live[still]
+                    dc = dc[still]
+                    deltas = deltas[still]
+                    position = position[still]
+                    z = z[still]
+            iters[live] = n
+
+            values = self.calc_returnval_vector(iters, totals, flat_points)
+        if self.record_iterations:
+            # Counting any iterations skipped by the series approximation
+            self.point_iterations.extend(iters.tolist())
+        return values.reshape(points.shape)
@@ -0,0 +1,84 @@
+import cmath
+from calculators import factories
+from calculators.factories import LineFactory, LineDrawer
+from calculators.symmetry import Symmetry
+
+
+class FunctionSpec:
+
+    """
+    A function given as the source of a lambda, e.g. 'lambda z, c: z ** 2 + c', so it
+    can be sent anywhere as a string and rebuilt there. The source is evaluated with
+    the cmath functions available, so should only come from somewhere trusted
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+
+    def build(self):
+        return eval(self.source, dict(vars(cmath)))
+
+    def __repr__(self):
+        return 'FunctionSpec({!r})'.format(self.source)
+
+
+class FactorySpec(LineFactory):
+
+    """
+    A factory given by its class name and arguments, with any functions given as
+    FunctionSpecs. Unlike the factories themselves, a spec can always be pickled by
+    the standard library (lambdas can't be), so it can be sent to other processes
+    and other machines, which build their own copy of the factory from it.
+
+    A spec can be used anywhere a factory can - the factory is built the first time
+    it is needed.
+    """
+
+    def __init__(self, name: str, *args, **kwargs):
+        """
+        :param name: The name of the factory class in calculators.factories, e.g. 'MandelLambdaFactory'
+        :param args: The factory's arguments, with FunctionSpecs in place of functions
+        :param kwargs: The factory's keyword arguments
+        """
+        super(FactorySpec, self).__init__()
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.factory = None
+
+    def build(self) -> LineFactory:
+        factory_type = getattr(factories, self.name, None)
+        if not (isinstance(factory_type, type) and issubclass(factory_type, LineFactory)):
+            raise ValueError('{} is not a factory'.format(self.name))
+        args = [x.build() if isinstance(x, FunctionSpec) else x for x in self.args]
+        kwargs = {k: x.build() if isinstance(x, FunctionSpec) else x for k, x in self.kwargs.items()}
+        return factory_type(*args, **kwargs)
+
+    def get_factory(self) -> LineFactory:
+        if self.factory is None:
+            self.factory = self.build()
+        return self.factory
+
+    @property
+    def supports_subdivision(self) -> bool:
+        return self.get_factory().supports_subdivision
+
+    def get_drawer(self, start: complex, end: complex, steps: int) -> LineDrawer:
+        return self.get_factory().get_drawer(start, end, steps)
+
+    def get_symmetry(self) -> Symmetry:
+        return self.get_factory().get_symmetry()
+
+    def get_iterations(self) -> int:
+        return self.get_factory().get_iterations()
+
+    def with_iterations(self, iterations: int) -> LineFactory:
+        return self.get_factory().with_iterations(iterations)
+
+    def __getstate__(self):
+        # Only the spec is sent, the factory is built again wherever it ends up
+        return {'name': self.name, 'args': self.args, 'kwargs': self.kwargs, 'factory': None}
+
+    def __repr__(self):
+        return 'FactorySpec({})'.format(', '.join([repr(self.name)] + [repr(x) for x in self.args] +
+                                                  ['{}={!r}'.format(k, x) for k, x in self.kwargs.items()]))
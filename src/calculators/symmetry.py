@@ -0,0 +1,58 @@
+from typing import Callable, Union
+
+from calculators.formula import Formula, has_variable
+
+
+class Symmetry:
+
+    """
+    The ways a fractal's raw output repeats itself. A mirror symmetric fractal gives
+    the same output at a point's conjugate, so is its own reflection in the real axis.
+    A rotationally symmetric one gives the same output at a point's negative, so is
+    unchanged by a half turn about the origin. A fractal with both is also its own
+    reflection in the imaginary axis.
+
+    Only these two are used, as they're the only ones which map a grid of pixels onto
+    itself - the 3-fold symmetry of a cubic Julia set doesn't.
+    """
+
+    def __init__(self, mirror: bool = False, rotate: bool = False):
+        """
+        :param mirror: Whether the fractal is symmetric about the real axis
+        :param rotate: Whether the fractal is symmetric under a half turn about the origin
+        """
+        self.mirror = mirror
+        self.rotate = rotate
+
+    def __bool__(self):
+        return self.mirror or self.rotate
+
+    def __repr__(self):
+        return 'Symmetry(mirror={}, rotate={})'.format(self.mirror, self.rotate)
+
+
+def power_symmetry(power: complex) -> Symmetry:
+    """
+    The symmetry of z**power + c - mirror for any real power, and rotational for odd
+    integer powers too, as (-z)**power + -c = -(z**power + c)
+    """
+    power = complex(power)
+    real = power.imag == 0.0
+    odd = real and power.real == int(power.real) and int(power.real) % 2 != 0
+    return Symmetry(real, odd)
+
+
+def formula_symmetry(function: Union[Callable, Formula]) -> Symmetry:
+    """
+    The symmetry of a z/c function, found from its formula. Mirror if every number in
+    it is real. Rotational if it's odd in z and c together, as each point's orbit
+    starts from the point, so a negated point's orbit is the negated orbit. If it's
+    even instead, the negated point's second step is taken with the wrong sign of c -
+    unless c isn't in the formula, when the orbits are the same from the first step
+    on. Lambdas can't be looked inside, so have none
+    """
+    if not isinstance(function, Formula):
+        return Symmetry()
+    parity = function.get_parity()
+    uses_point = any(has_variable(function.tree, variable) for variable in function.variables[1:])
+    return Symmetry(function.is_real(), parity is not None and (parity != 1 or not uses_point))
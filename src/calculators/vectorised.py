@@ -0,0 +1,265 @@
+from typing import Callable
+from cmath import log10
+import numpy as np
+
+from calculators.linedrawer import *
+
+
+# Points used to check whether a user supplied function gives the same answers
+# on numpy arrays as it does on single python complex values
+probe_totals = np.array([0.3 + 0.2j, -0.5 + 0.7j, 1.1 - 0.4j, -0.9 - 1.3j])
+probe_points = np.array([-0.7 + 0.1j, 0.25 - 0.5j, 0.01 + 0.8j, -1.2 - 0.3j])
+
+
+
+def complex_product(a_real: np.ndarray, a_imag: np.ndarray,
+                    b_real: np.ndarray, b_imag: np.ndarray) -> (np.ndarray, np.ndarray):
+    return a_real * b_real - a_imag * b_imag, a_real * b_imag + a_imag * b_real
+
+
+def complex_quotient(a_real: np.ndarray, a_imag: np.ndarray,
+                     b_real: np.ndarray, b_imag: np.ndarray) -> (np.ndarray, np.ndarray):
+    # The same scaled division as cpython's c_quot
+    real_bigger = np.abs(b_real) >= np.abs(b_imag)
+    ratio = np.where(real_bigger, b_imag / b_real, b_real / b_imag)
+    denom = np.where(real_bigger, b_real + b_imag * ratio, b_real * ratio + b_imag)
+    return (np.where(real_bigger, a_real + a_imag * ratio, a_real * ratio + a_imag) / denom,
+            np.where(real_bigger, a_imag - a_real * ratio, a_imag * ratio - a_real) / denom)
+
+
+def to_complex(real: np.ndarray, imag: np.ndarray) -> np.ndarray:
+    # Build the array directly, real + 1j * imag turns infinite parts into nans
+    result = np.empty(np.shape(real), dtype=complex)
+    result.real = real
+    result.imag = imag
+    return result
+
+
+def vectorises_power(power: complex) -> bool:
+    """
+    Whether complex_power gives exactly the answers python would for a power. Only
+    integer powers do: python's fractional powers go through the C library's pow, atan2,
+    cos and sin, which numpy's own don't match to the last place - and over thousands of
+    iterations a last place difference is enough to change a point's escape count
+    """
+    power = complex(power)
+    return power.imag == 0.0 and power.real == int(power.real) and abs(power.real) <= 100
+
+
+def complex_power(totals: np.ndarray, power: complex) -> np.ndarray:
+    """
+    Raise an array of complex values to an integer power, using the same steps as
+    python's complex ** operator. numpy's own complex multiply and power round
+    differently, which is enough to change the escape count of points near the set
+    boundary
+    """
+    if not vectorises_power(power):
+        raise ValueError('Only integer powers can be vectorised, not {}'.format(power))
+    power = complex(power)
+    a_real, a_imag = totals.real, totals.imag
+    # Done by repeated squaring, as in cpython's c_powi
+    n = abs(int(power.real))
+    if n == 0:
+        return np.ones(totals.shape, dtype=complex)
+    r_real, r_imag = None, None
+    p_real, p_imag = a_real, a_imag
+    mask = 1
+    while n >= mask:
+        if n & mask:
+            if r_real is None:
+                r_real, r_imag = p_real, p_imag
+            else:
+                r_real, r_imag = complex_product(r_real, r_imag, p_real, p_imag)
+        mask <<= 1
+        if n >= mask:
+            p_real, p_imag = complex_product(p_real, p_imag, p_real, p_imag)
+    if power.real < 0:
+        r_real, r_imag = complex_quotient(1.0, 0.0, r_real, r_imag)
+    return to_complex(r_real, r_imag)
+
+
+class PythonArithmeticArray(np.ndarray):
+
+    """
+    A complex array view whose *, / and ** operators round the same way as python's
+    complex type, so user lambdas give the same answers on arrays as on single points
+    """
+
+    def __mul__(self, other):
+        a, b = np.asarray(self), np.asarray(other)
+        if not (np.iscomplexobj(a) and np.iscomplexobj(b)):
+            return np.multiply(a, b).view(PythonArithmeticArray)
+        return to_complex(*complex_product(a.real, a.imag, b.real, b.imag)).view(PythonArithmeticArray)
+
+    def __rmul__(self, other):
+        return self.__mul__(other)
+
+    def __truediv__(self, other):
+        a, b = np.asarray(self), np.asarray(other)
+        if not np.iscomplexobj(b):
+            return np.true_divide(a, b).view(PythonArithmeticArray)
+        return to_complex(*complex_quotient(a.real, a.imag, b.real, b.imag)).view(PythonArithmeticArray)
+
+    def __rtruediv__(self, other):
+        return PythonArithmeticArray.__truediv__(np.asarray(other, dtype=complex).view(PythonArithmeticArray), self)
+
+    def __pow__(self, power):
+        # Anything else would round differently to python, so the lambda isn't vectorised
+        if not isinstance(power, (int, float, complex)) or not vectorises_power(power):
+            raise TypeError('Only integer powers can be vectorised')
+        return complex_power(np.asarray(self), power).view(PythonArithmeticArray)
+
+
+def can_vectorise(function: Callable[[complex, complex], complex]) -> bool:
+    """
+    Work out if a z/c lambda can be applied to whole numpy arrays at once, by
+    checking its array output is exactly its per-point output on a few probe values
+    """
+    try:
+        with np.errstate(all='ignore'):
+            vector_result = function(probe_totals.view(PythonArithmeticArray), probe_points.view(PythonArithmeticArray))
+            if not isinstance(vector_result, np.ndarray) or vector_result.shape != probe_totals.shape:
+                return False
+            point_result = np.array([function(complex(z), complex(c)) for z, c in zip(probe_totals, probe_points)])
+        return bool(np.array_equal(vector_result, point_result, equal_nan=True))
+    except Exception:
+        return False
+
+
+class VectorisedDrawer:
+
+    """
+    A mixin for PowerAndEscapeDrawer style classes that iterates every point in
+    the range at once as a numpy complex array, rather than point by point.
+    Escaped points are dropped from the working set as they escape, so the cost
+    of each iteration is proportional to the points still being iterated.
+
+    Subclasses provide the array versions of the per-point hooks - apply_alg_vector,
+    apply_condition_vector and calc_returnval_vector.
+    """
+
+    def draw(self):
+        self.outpoints = self.calculate_points(np.asarray(self.points, dtype=complex))
+
+    def calculate_points(self, points: np.ndarray) -> np.ndarray:
+        """
+        Calculate the output value for an array of points of any shape
+
+        :param points: The (already mapped) points to iterate
+        :return: A float64 array of the same shape as points
+        """
+        flat_points = points.ravel()
+        totals = flat_points.copy()
+        iters = np.zeros(flat_points.shape, dtype=np.int64)
+        # Cycling points are given the maximum iterations, so the iterations they really took are kept apart
+        cycled_at = np.zeros(flat_points.shape, dtype=np.int64) if self.record_iterations else None
+
+        with np.errstate(all='ignore'):
+            live = np.flatnonzero(self.apply_condition_vector(totals, 0) & self.init_mask(flat_points))
+            z = totals[live]
+            c = flat_points[live]
+            saved = z
+            next_save = 1
+            n = 0
+            while live.size and n < self.iterations:
+                self.iterated += live.size
+                z = self.apply_alg_vector(z, c)
+                n += 1
+                still = self.apply_condition_vector(z, n)
+                if self.cycle_detection:
+                    # Points that have repeated an earlier total are interior, as in PowerAndEscapeDrawer
+                    cycled = np.abs(z - saved) < self.cycle_tolerance
+                    iters[live[cycled]] = self.iterations
+                    if cycled_at is not None:
+                        cycled_at[live[cycled]] = n
+                    still &= ~cycled
+                    done = ~(still | cycled)
+                else:
+                    done = ~still
+                if not still.all():
+                    totals[live[done]] = z[done]
+                    iters[live[done]] = n
+                    live = live[still]
+                    z = z[still]
+                    c = c[still]
+                    saved = saved[still]
+                if n == next_save:
+                    saved = z
+                    next_save *= 2
+            totals[live] = z
+            iters[live] = n
+
+            values = self.calc_returnval_vector(iters, totals, flat_points)
+        if cycled_at is not None:
+            self.point_iterations.extend(np.where(cycled_at > 0, cycled_at, iters).tolist())
+        return values.reshape(points.shape)
+
+    def init_mask(self, points: np.ndarray) -> np.ndarray:
+        return np.ones(points.shape, dtype=bool)
+
+    def apply_condition_vector(self, totals: np.ndarray, iters: int) -> np.ndarray:
+        return np.abs(totals) <= self.escape
+
+    def apply_alg_vector(self, totals: np.ndarray, points: np.ndarray) -> np.ndarray:
+        return complex_power(totals, self.power) + points
+
+    def calc_returnval_vector(self, iters: np.ndarray, totals: np.ndarray, points: np.ndarray) -> np.ndarray:
+        """
+        The smooth mu of LogDrawer, calculated for all points at once
+        """
+        values = np.zeros(iters.shape, dtype=np.float64)
+        escaped = (iters != self.iterations) & (iters != 0)
+        n = iters[escaped]
+        logs = np.log10(np.log10(np.abs(totals[escaped])).astype(complex))
+        values[escaped] = np.abs((n + 1) - (logs / log10(self.power)))
+        return values
+
+
+class VectorisedMandelbrotDrawer(VectorisedDrawer, SafeMandelbrotDrawer):
+
+    """
+    A SafeMandelbrotDrawer that iterates whole rows at once
+    """
+
+    def init_mask(self, points: np.ndarray) -> np.ndarray:
+        # The origin is always returned as 0.0, which is also what an unstarted point gives
+        mask = points != 0.0 + 0.0j
+        if self.bulb_check and self.power == 2:
+            x = points.real
+            y2 = points.imag * points.imag
+            q = (x - 0.25) * (x - 0.25) + y2
+            mask &= ~((q * (q + (x - 0.25)) < 0.25 * y2) | ((x + 1.0) * (x + 1.0) + y2 < 0.0625))
+        return mask
+
+
+class VectorisedShipDrawer(VectorisedDrawer, ShipDrawer):
+
+    """
+    A burning ship drawer that iterates whole rows at once
+    """
+
+    def apply_alg_vector(self, totals: np.ndarray, points: np.ndarray) -> np.ndarray:
+        return complex_power(to_complex(np.abs(totals.real), np.abs(totals.imag)), self.power) + points
+
+
+class VectorisedMandelDropDrawer(VectorisedDrawer, MandelDropDrawer):
+
+    """
+    A Mandel-drop drawer that iterates whole rows at once
+    """
+
+    def apply_condition_vector(self, totals: np.ndarray, iters: int) -> np.ndarray:
+        if iters == 0:
+            return np.ones(totals.shape, dtype=bool)
+        return np.abs(totals) <= self.escape
+
+
+class VectorisedMandelLambdaDrawer(VectorisedMandelbrotDrawer, MandelLambdaDrawer):
+
+    """
+    A lambda drawer that iterates whole rows at once. The factory must have checked
+    the lambda with can_vectorise first
+    """
+
+    def apply_alg_vector(self, totals: np.ndarray, points: np.ndarray) -> np.ndarray:
+        return np.asarray(self.function(totals.view(PythonArithmeticArray), points.view(PythonArithmeticArray)))
@@ -1,6 +1,12 @@
-from typing import List, Tuple
+from typing import List, Tuple, Iterator
 from math import floor
+from collections import deque
 from multiprocessing import Pool
+import numpy as np
+
+from colours.scaling import *
+from render.shared import SharedGrid
+from render.session import RenderSession
 
 colour_red = (255, 0, 0)
 colour_green = (0, 255, 255)
@@ -50,12 +56,25 @@ class ColourRanger:
     Use various colour lists to create transition palettes
     Then allow a lookup on that palette for a given point
     value (in a range when also given a max)
+
+    Whole arrays of points are coloured with get_colours, which scales them all at
+    once and then looks the scaled proportions up in a table of lut_size colours
+    precomputed across the palette, rather than interpolating every point
     """
 
+    lut_size = 65536
+
     def __init__(self, colour_map: List[Tuple[int, int, int]]):
         self.segments = (len(colour_map) - 1)
         self.totalcolours = 255 * self.segments
         self.colour_map = colour_map
+        self.lut = None
+
+    def __getstate__(self):
+        # The table is quick to rebuild, so don't send it to the workers
+        state = self.__dict__.copy()
+        state['lut'] = None
+        return state
 
     # Given a float in the range 0.0-1.0, work out which colour it represents
     def get_colour_basic(self, proportion: float) -> (int, int, int):
@@ -75,13 +94,53 @@ class ColourRanger:
         ratio = point / point_max
         return self.get_colour_basic(ratio)
 
+    def get_colour_basic_vector(self, proportions: np.ndarray) -> np.ndarray:
+        """
+        The same interpolation as get_colour_basic, for an array of proportions in the
+        range 0.0-1.0 (inclusive), giving an n x 3 uint8 array
+        """
+        multi_segment_prop = proportions * self.segments
+        segment = np.minimum(np.floor(multi_segment_prop).astype(np.intp), self.segments - 1)
+        inner_prop = (multi_segment_prop - segment)[:, np.newaxis]
+
+        colour_map = np.array(self.colour_map, dtype=np.float64)
+        start = colour_map[segment]
+        end = colour_map[segment + 1]
+        return (start + inner_prop * (end - start)).astype(np.uint8)
+
+    def get_lut(self) -> np.ndarray:
+        if self.lut is None:
+            self.lut = self.get_colour_basic_vector(np.linspace(0.0, 1.0, self.lut_size))
+        return self.lut
+
+    def lookup(self, proportions: np.ndarray) -> np.ndarray:
+        """
+        Find the colours for an array of already scaled proportions in the lookup table
+        """
+        proportions = np.nan_to_num(np.clip(proportions, 0.0, 1.0), nan=0.0)
+        return self.get_lut()[np.rint(proportions * (self.lut_size - 1)).astype(np.intp)]
+
+    def scale_vector(self, ratios: np.ndarray) -> np.ndarray:
+        return ratios
+
+    def get_colours(self, points: np.ndarray, point_max: float, scaling: ColourScaling = None) -> np.ndarray:
+        """
+        Colour a 1D array of points, giving an n x 3 uint8 array of colours that are
+        within one of what get_colour gives for each point
+
+        :param points: The raw values to colour
+        :param point_max: The value at the top of the palette
+        :param scaling: How to turn the raw values into ratios, before this ranger's own scaling, default linear
+        """
+        points = np.asarray(points, dtype=np.float64)
+        ratios = scaling.get_ratios(points, point_max) if scaling is not None else points / point_max
+        return self.lookup(self.scale_vector(ratios))
+
     def get_colour_root(self, point: float, point_max: float) -> (int, int, int):
-        ratio = point / point_max
-        return self.get_colour_basic(ratio)
+        return self.get_colour_basic(RootScaling().get_ratio(point, point_max))
 
     def get_colour_log(self, point: float, point_max: float) -> (int, int, int):
-        ratio = point / point_max
-        return self.get_colour_basic(ratio)
+        return self.get_colour_basic(LogScaling().get_ratio(point, point_max))
 
 
 class ColourRangerWithAbsBlack(ColourRanger):
@@ -90,6 +149,11 @@ class ColourRangerWithAbsBlack(ColourRanger):
             return colour_black
         return super(ColourRangerWithAbsBlack, self).get_colour_basic(proportion)
 
+    def lookup(self, proportions: np.ndarray) -> np.ndarray:
+        colours = super(ColourRangerWithAbsBlack, self).lookup(proportions)
+        colours[proportions == 0.0] = colour_black
+        return colours
+
 
 class ColourRangerWithExponentScaling(ColourRangerWithAbsBlack):
     def __init__(self, colour_map: List[Tuple[int, int, int]], power: float):
@@ -100,29 +164,191 @@ class ColourRangerWithExponentScaling(ColourRangerWithAbsBlack):
         ratio = point / point_max
         return self.get_colour_basic(ratio ** self.power)
 
+    def scale_vector(self, ratios: np.ndarray) -> np.ndarray:
+        return ratios ** self.power
 
-def colourise_max_worker(data: List[float]) -> float:
-    return max(data)
+
+class BasinColourRanger(ColourRanger):
+
+    """
+    Colour the raw output of a NewtonBasinFactory, a colour from the colour map for
+    each basin in turn, darker the longer the point took to converge, and black where
+    it didn't. The basins and speeds are read straight from the raw values, so the max
+    and any scaling are ignored
+    """
+
+    def __init__(self, colour_map: List[Tuple[int, int, int]], power: float = 0.25):
+        """
+        :param colour_map: The colours of the basins, repeated if there are more basins than colours
+        :param power: The exponent the fraction of the maximum iterations is scaled by before darkening
+        """
+        super(BasinColourRanger, self).__init__(colour_map)
+        self.power = power
+
+    def get_colour(self, point: float, point_max: float) -> (int, int, int):
+        return tuple(int(x) for x in self.get_colours(np.array([point]), point_max)[0])
+
+    def get_colours(self, points: np.ndarray, point_max: float, scaling: ColourScaling = None) -> np.ndarray:
+        points = np.asarray(points, dtype=np.float64)
+        basins = np.floor(points)
+        brightness = 1.0 - np.clip(points - basins, 0.0, 1.0) ** self.power
+        colours = np.array(self.colour_map, dtype=np.float64)[(basins.astype(np.intp) - 1) % len(self.colour_map)]
+        colours = (colours * brightness[:, np.newaxis]).astype(np.uint8)
+        colours[points <= 0.0] = colour_black
+        return colours
+
+
+def colourise_band(task: Tuple['Colouriser', SharedGrid, SharedGrid, int, int]):
+    colouriser, raw, output, start, end = task
+    output.array[start:end] = colouriser.colourise_tile(raw.array[start:end])
+
+
+def scaling_band(task: Tuple[ColourScaling, SharedGrid, int, int]) -> ColourScaling:
+    # Tasks sent to a worker together share one unpickled template, so each band starts its own scaling
+    template, raw, start, end = task
+    scaling = template.empty()
+    scaling.add(raw.array[start:end])
+    return scaling
+
+
+def colourise_file_band(task: Tuple['Colouriser', str, int, int]) -> np.ndarray:
+    colouriser, filename, start, end = task
+    return colouriser.colourise_tile(np.load(filename, mmap_mode='r')[start:end])
+
+
+def scaling_file_band(task: Tuple[ColourScaling, str, int, int]) -> ColourScaling:
+    template, filename, start, end = task
+    scaling = template.empty()
+    scaling.add(np.load(filename, mmap_mode='r')[start:end])
+    return scaling
 
 
 class Colouriser:
 
     """
-    Take the raw data from the fractal generator, and apply colour maps to it
+    Take the raw data from the fractal generator, and apply colour maps to it.
+    Raw data is a float64 array, and the colours come back as a uint8 array with
+    three values (RGB) per point
     """
 
-    def __init__(self, ranger: ColourRanger, processors: int):
+    def __init__(self,
+                 ranger: ColourRanger,
+                 processors: int,
+                 session: RenderSession = None,
+                 scaling: ColourScaling = None):
+        """
+        :param ranger: The raw->colour pixel generator
+        :param processors: The number of processes to use, when there is no session
+        :param session: A render session whose pool should be used, rather than starting a new one
+        :param scaling: How raw values are scaled before the ranger sees them (log, root, histogram), default linear
+        """
         self.range = ranger
         self.processors = processors
+        self.session = session
+        self.scaling = scaling if scaling is not None else ColourScaling()
         self.total_max = 0
-
-    def colourise_worker(self, data: List[float]) -> List[int]:
-        return [x for point in data for x in self.range.get_colour(point, self.total_max)]
-
-    def colourise(self, raw_data: List[List[float]]) -> List[List[int]]:
-        pool = Pool(self.processors)
-        self.total_max = max(pool.map(colourise_max_worker, raw_data)) * fudge_factor
+        self.point_limit = 0
+
+    def set_max(self, raw_max: float):
+        """
+        Set the largest raw value expected, for when the data is coloured a row at a
+        time and the true max can't be found first. Anything larger is coloured as
+        if it were the max
+        """
+        if raw_max <= 0.0:
+            raw_max = 1.0
+        self.total_max = raw_max * fudge_factor
+        self.point_limit = raw_max
+
+    def colourise_worker(self, data: np.ndarray) -> np.ndarray:
+        if self.point_limit:
+            data = np.minimum(data, self.point_limit)
+        return self.range.get_colours(data, self.total_max, self.scaling).ravel()
+
+    def colourise_tile(self, raw_data: np.ndarray) -> np.ndarray:
+        """
+        Colour a 2D block of raw data in this process, using the max already set
+        """
+        output = np.empty((raw_data.shape[0], raw_data.shape[1] * 3), dtype=np.uint8)
+        for y, row in enumerate(raw_data):
+            output[y] = self.colourise_worker(row)
+        return output
+
+    def colourise(self, raw_data: np.ndarray, band_height: int = 16) -> np.ndarray:
+        self.total_max = float(np.max(raw_data)) * fudge_factor
+        if self.scaling.needs_data:
+            for start in range(0, raw_data.shape[0], band_height):
+                self.scaling.add(raw_data[start:start + band_height])
         # print('total max - {}'.format(self.total_max))
+        pool = self.get_pool()
         results = pool.map(self.colourise_worker, raw_data)
-        pool.close()
-        return results
+        self.release_pool(pool)
+        return np.array(results, dtype=np.uint8)
+
+    def colourise_shared(self, raw: SharedGrid, output: SharedGrid, band_height: int = 16):
+        """
+        Colour a shared grid of raw data into a shared height x width*3 uint8 grid. The
+        workers only receive the grids' names and the rows to colour, and write their
+        colours straight into the output
+        """
+        self.total_max = float(np.max(raw.array)) * fudge_factor
+        height = raw.shape[0]
+        pool = self.get_pool()
+        if self.scaling.needs_data:
+            # Each worker scales a band of rows, and the results are merged
+            empty = self.scaling.empty()
+            for band_scaling in pool.map(scaling_band, [(empty, raw, start, min(start + band_height, height))
+                                                        for start in range(0, height, band_height)]):
+                self.scaling.merge(band_scaling)
+        pool.map(colourise_band, [(self, raw, output, start, min(start + band_height, height))
+                                  for start in range(0, height, band_height)])
+        self.release_pool(pool)
+
+    def colourise_file(self,
+                       filename: str,
+                       band_height: int = 16,
+                       bands_in_flight: int = 8) -> Iterator[np.ndarray]:
+        """
+        Colour a raw .npy file, as written by draw_fractal, a band of rows at a time.
+        The file is memory-mapped, by this process to find the max and by the workers to
+        colour their bands, so only the bands being coloured are ever in memory
+
+        :param filename: The raw file to colour
+        :param band_height: The number of rows each worker colours at once
+        :param bands_in_flight: The number of bands to queue on the pool at once
+        :return: An iterator over the coloured rows, top to bottom
+        """
+        raw = np.load(filename, mmap_mode='r')
+        height = raw.shape[0]
+        starts = range(0, height, band_height)
+        self.total_max = max((float(np.max(raw[start:start + band_height])) for start in starts),
+                             default=0.0) * fudge_factor
+        pool = self.get_pool()
+        if self.scaling.needs_data:
+            empty = self.scaling.empty()
+            for band_scaling in pool.imap_unordered(scaling_file_band,
+                                                    [(empty, filename, start, min(start + band_height, height))
+                                                     for start in starts]):
+                self.scaling.merge(band_scaling)
+
+        waiting = deque(starts)
+        queued = deque()
+        try:
+            while waiting or queued:
+                while waiting and len(queued) < bands_in_flight:
+                    start = waiting.popleft()
+                    queued.append(pool.apply_async(colourise_file_band,
+                                                   ((self, filename, start, min(start + band_height, height)),)))
+                yield from queued.popleft().get()
+        finally:
+            self.release_pool(pool)
+
+    def get_pool(self):
+        if self.session is not None:
+            return self.session.get_pool()
+        return Pool(self.processors)
+
+    def release_pool(self, pool):
+        # A session's pool outlives the colouriser
+        if self.session is None:
+            pool.close()
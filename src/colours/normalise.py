@@ -1,9 +1,4 @@
-from typing import List
-from multiprocessing import Pool
-
-
-def normalise_max_worker(row: List[float]):
-    return max(row)
+import numpy as np
 
 
 class Normaliser:
@@ -19,28 +14,28 @@ class Normaliser:
     def normalise_point(self, point: float, max_value: float):
         return int((point * self.range) / max_value)
 
-    def normalise(self, points: List[int]) -> List[int]:
-        max_value = max(points)
+    def normalise(self, points: np.ndarray) -> np.ndarray:
+        max_value = np.max(points)
         if max_value == 0:
             max_value = 1
-        return [self.normalise_point(x, max_value) for x in points]
+        return self.normalise_array(np.asarray(points), max_value)
 
-    def normalise_nest_flatten(self, points: List[List[int]]) -> List[int]:
-        flat_list = [x for sublist in points for x in sublist]
-        return self.normalise(flat_list)
+    def normalise_nest_flatten(self, points: np.ndarray) -> np.ndarray:
+        return self.normalise(np.ravel(points))
 
-    def normalise_worker(self, row: List[float]) -> List[int]:
-        return [self.normalise_point(x, self.total_max) for x in row]
+    def normalise_array(self, points: np.ndarray, max_value: float) -> np.ndarray:
+        # Truncates the same way as normalise_point, for the non-negative raw data
+        dtype = np.uint8 if self.range <= 255 else np.uint16
+        return ((points * self.range) / max_value).astype(dtype)
 
-    def normalise_nest_no_flatten(self, points: List[List[float]], processes: int) -> List[List[int]]:
-        # print('Normalising data - {}'.format(points))
-        pool = Pool(processes)
-        # self.total_max = max([max(row) for row in points])
-        self.total_max = max(p.map(normalise_max_worker, points))
-        print('Max found - {}'.format(self.total_max))
+    def normalise_worker(self, row: np.ndarray) -> np.ndarray:
+        return self.normalise_array(row, self.total_max)
 
-        # output = [self.normalise_worker(total_max, row) for row in points]
-        output = pool.map(self.normalise_worker, points)
-        pool.close()
-        # print('Normalised data - {}'.format(output))
-        return output
+    def normalise_nest_no_flatten(self, points: np.ndarray, processes: int) -> np.ndarray:
+        # The whole grid is a single float64 array, so it is normalised in one numpy
+        # step rather than row by row on a pool
+        self.total_max = np.max(points)
+        if self.total_max == 0:
+            self.total_max = 1
+        print('Max found - {}'.format(self.total_max))
+        return self.normalise_worker(points)
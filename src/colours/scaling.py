@@ -0,0 +1,137 @@
+from math import log1p, ceil, log2
+import numpy as np
+
+
+class ColourScaling:
+
+    """
+    Turns raw values into ratios in the range 0.0-1.0 before they go to a ColourRanger,
+    which then applies its own scaling (e.g. exponent) and palette. The base class
+    is linear - the raw value over the max
+    """
+
+    # Whether the scaling has to see the data (via add) before it can be used
+    needs_data = False
+
+    def add(self, values: np.ndarray):
+        pass
+
+    def merge(self, other: 'ColourScaling'):
+        pass
+
+    def empty(self) -> 'ColourScaling':
+        """
+        Get a scaling with the same settings that hasn't seen any data, for workers to add to
+        """
+        return self
+
+    def get_ratio(self, point: float, point_max: float) -> float:
+        return point / point_max
+
+    def get_ratios(self, points: np.ndarray, point_max: float) -> np.ndarray:
+        return points / point_max
+
+
+class LogScaling(ColourScaling):
+
+    """
+    Log scaling, spreading out the low values (the bulk of most fractals) and
+    squashing the high ones
+    """
+
+    def get_ratio(self, point: float, point_max: float) -> float:
+        return log1p(point) / log1p(point_max)
+
+    def get_ratios(self, points: np.ndarray, point_max: float) -> np.ndarray:
+        return np.log1p(points) / log1p(point_max)
+
+
+class RootScaling(ColourScaling):
+    def __init__(self, root: float = 2.0):
+        self.root = root
+
+    def get_ratio(self, point: float, point_max: float) -> float:
+        return (point / point_max) ** (1.0 / self.root)
+
+    def get_ratios(self, points: np.ndarray, point_max: float) -> np.ndarray:
+        return (points / point_max) ** (1.0 / self.root)
+
+
+class HistogramScaling(ColourScaling):
+
+    """
+    Histogram equalisation - each value's ratio is the proportion of (non-zero) values
+    below it, so every colour in the palette covers the same number of pixels.
+
+    The histogram has a fixed number of equal width bins from 0 to a power of two
+    that covers every value seen so far, so it can be built in any number of pieces
+    without holding the data. When a larger value turns up, the upper bound doubles
+    and neighbouring bins are merged, which also lets histograms built by different
+    workers be merged together.
+    """
+
+    needs_data = True
+
+    def __init__(self, bins: int = 4096):
+        self.bins = bins
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.upper = 0.0
+        self.cdf = None
+
+    def empty(self) -> 'HistogramScaling':
+        return HistogramScaling(self.bins)
+
+    @staticmethod
+    def fold(counts: np.ndarray) -> np.ndarray:
+        # Merge neighbouring bins into the bottom half, for a range twice as wide
+        return np.concatenate([counts[0::2] + counts[1::2], np.zeros(len(counts) // 2, dtype=np.int64)])
+
+    def grow(self, upper: float):
+        # Double the range until it covers upper, halving the resolution each time
+        if self.upper == 0.0:
+            self.upper = 2.0 ** ceil(log2(upper))
+            return
+        while self.upper < upper:
+            self.counts = self.fold(self.counts)
+            self.upper *= 2.0
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        # Zeros are always black, so they don't take up any of the palette
+        values = values[np.isfinite(values) & (values > 0.0)]
+        if values.size == 0:
+            return
+        self.grow(values.max())
+        counts, _ = np.histogram(values, bins=self.bins, range=(0.0, self.upper))
+        self.counts += counts
+        self.cdf = None
+
+    def merge(self, other: 'HistogramScaling'):
+        if other.upper == 0.0:
+            return
+        self.grow(other.upper)
+        folded = other.counts
+        upper = other.upper
+        while upper < self.upper:
+            folded = self.fold(folded)
+            upper *= 2.0
+        self.counts = self.counts + folded
+        self.cdf = None
+
+    def get_cdf(self) -> np.ndarray:
+        if self.cdf is None:
+            total = self.counts.sum()
+            cumulative = np.concatenate([[0], np.cumsum(self.counts)])
+            self.cdf = cumulative / total if total else cumulative.astype(np.float64)
+        return self.cdf
+
+    def get_ratio(self, point: float, point_max: float) -> float:
+        return float(self.get_ratios(np.array([point]), point_max)[0])
+
+    def get_ratios(self, points: np.ndarray, point_max: float) -> np.ndarray:
+        if self.upper == 0.0:
+            return points / point_max
+        edges = np.linspace(0.0, self.upper, self.bins + 1)
+        ratios = np.interp(points, edges, self.get_cdf())
+        ratios[points <= 0.0] = 0.0
+        return ratios
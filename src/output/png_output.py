@@ -1,11 +1,13 @@
-from typing import List
+from typing import Iterable
+import numpy as np
 import png
 
 
 class PngWriter:
 
     """
-    Write out a PNG, either in greyscale or colour
+    Write out a PNG, either in greyscale or colour. Rows are uint8 arrays (or any
+    sequence of ints), either as a 2D array or an iterable of rows
     """
 
     def __init__(self, filename: str, width: int, height: int):
@@ -13,11 +15,12 @@ class PngWriter:
         self.width = width
         self.height = height
 
-    def add_greyscale(self, data_points: List[List[int]]):
+    def add_greyscale(self, data_points: Iterable[np.ndarray]):
         image_writer = png.Writer(width=self.width, height=self.height, greyscale=True, bitdepth=8)
         image_writer.write(self.image_file, data_points)
 
-    def add_colour(self, data_points: List[List[int]]):
+    def add_colour(self, data_points: Iterable[np.ndarray]):
+        # Rows can come from a generator, in which case each one is written as it arrives
         image_writer = png.Writer(width=self.width, height=self.height, greyscale=False)
         image_writer.write(self.image_file, data_points)
 
@@ -0,0 +1,85 @@
+from argparse import ArgumentParser
+from typing import Dict, List, Tuple, Iterator
+import numpy as np
+
+from output import png_output
+from colours import normalise
+from colours import colourise
+from colours.colourise import *
+from render.session import RenderSession
+
+scalings = {'linear': ColourScaling, 'log': LogScaling, 'root': RootScaling, 'histogram': HistogramScaling}
+
+
+def get_palettes() -> Dict[str, List[Tuple[int, int, int]]]:
+    # Every colour list in colourise, by name without the _list
+    return {name[:-len('_list')]: value for name, value in vars(colourise).items() if name.endswith('_list')}
+
+
+def grey_rows(raw: np.ndarray, greylevels: int, band_height: int = 256) -> Iterator[np.ndarray]:
+    norm = normalise.Normaliser(greylevels)
+    max_value = max((float(np.max(raw[start:start + band_height])) for start in range(0, raw.shape[0], band_height)),
+                    default=0.0)
+    if max_value == 0:
+        max_value = 1
+    for start in range(0, raw.shape[0], band_height):
+        yield from norm.normalise_array(raw[start:start + band_height], max_value)
+
+
+def recolour(raw_filename: str,
+             filename: str,
+             ranger: ColourRanger = None,
+             processes: int = None,
+             scaling: ColourScaling = None,
+             greylevels: int = None,
+             session: RenderSession = None):
+    """
+    Colour the raw output of an earlier render, as written by draw_fractal, into a new
+    image. The raw file is memory-mapped and coloured a band at a time, so it never has
+    to fit in memory
+
+    :param raw_filename: The raw .npy file to colour
+    :param filename: The name of the image to write out
+    :param ranger: The raw->colour pixel generator
+    :param processes: The number of processes to colour with, when there is no session
+    :param scaling: How raw values are scaled before colouring, default linear
+    :param greylevels: If given, write a greyscale image with this many levels instead of colouring
+    :param session: The render session whose pool to use
+    """
+    raw = np.load(raw_filename, mmap_mode='r')
+    height, width = raw.shape
+    writer = png_output.PngWriter(filename, width, height)
+    try:
+        if greylevels is not None:
+            writer.add_greyscale(grey_rows(raw, greylevels))
+        elif session is None:
+            with RenderSession(processes) as own_session:
+                writer.add_colour(Colouriser(ranger, processes, own_session, scaling).colourise_file(raw_filename))
+        else:
+            writer.add_colour(Colouriser(ranger, processes, session, scaling).colourise_file(raw_filename))
+    finally:
+        writer.close()
+
+
+def main():
+    palettes = get_palettes()
+    parser = ArgumentParser(description='Colour the raw output of an earlier render into a new PNG')
+    parser.add_argument('raw', help='the raw .npy file written by draw_fractal')
+    parser.add_argument('output', help='the PNG to write')
+    parser.add_argument('--palette', choices=sorted(palettes), default='many_transitions')
+    parser.add_argument('--power', type=float, default=0.25, help='the exponent to scale colours with')
+    parser.add_argument('--scaling', choices=sorted(scalings), default='linear')
+    parser.add_argument('--grey', type=int, metavar='LEVELS', help='write greyscale with this many levels instead')
+    parser.add_argument('--processes', type=int, help='defaults to the number of cpus')
+    args = parser.parse_args()
+
+    recolour(args.raw,
+             args.output,
+             ColourRangerWithExponentScaling(palettes[args.palette], args.power),
+             args.processes,
+             scalings[args.scaling](),
+             args.grey)
+
+
+if __name__ == "__main__":
+    main()
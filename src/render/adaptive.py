@@ -0,0 +1,95 @@
+from typing import List, Dict, Tuple
+import numpy as np
+
+from calculators.factories import LineFactory
+from render.scheduler import TileScheduler
+
+
+class IterationBudget:
+
+    """
+    Picks the maximum iterations for each tile of a render from a cheap preview of it,
+    drawn with the factory's own iterations. A preview pixel that never escaped (raw
+    0) next to one that did is on a boundary the iterations may be too low to resolve,
+    so the tiles around it are drawn with boost times the iterations. Every other tile
+    - open escaping regions, where no point gets near the limit anyway, and solid
+    interior, where every point pays the full limit - keeps the factory's iterations.
+
+    So a render can be given the iterations that suit most of it, with the extra spent
+    only where it changes the image, rather than the whole render needing the most any
+    part of it does. Compare the iterations in the scheduler's report with a render at
+    a fixed budget to see the difference.
+    """
+
+    def __init__(self, boost: float = 4.0, preview_scale: int = 8, spread: int = 1):
+        """
+        :param boost: How many times the factory's iterations boundary tiles are drawn with
+        :param preview_scale: How much smaller than the image the preview is
+        :param spread: How many preview pixels around a boundary pixel count as boundary too, so detail the
+                       preview is too coarse to see isn't missed
+        """
+        if boost < 1:
+            raise ValueError('Boost must be at least 1, got {}'.format(boost))
+        self.boost = boost
+        self.preview_scale = preview_scale
+        self.spread = spread
+        self.boosted = 0
+        self.tiles = 0
+
+    def find_boundary(self, preview: np.ndarray) -> np.ndarray:
+        """
+        Find the unresolved preview pixels next to escaping ones, and spread them out
+        """
+        escaped = preview > 0.0
+        boundary = ~escaped & dilate(escaped, 1)
+        return dilate(boundary, self.spread)
+
+    def plan(self,
+             pool,
+             factory: LineFactory,
+             region: List[complex],
+             scheduler: TileScheduler) -> Dict[Tuple[int, int], int]:
+        """
+        Draw the preview and work out the iterations for every tile that needs more
+        than the factory's
+
+        :param pool: The process pool to draw the preview on
+        :param factory: The line-drawer-generator for the fractal
+        :param region: The window onto the fractal we're interested in
+        :param scheduler: The scheduler the render will be drawn with, whose tiles to plan
+        :return: The iterations for each boosted tile, keyed by its top left pixel, as used by
+                 TileScheduler.tile_iterations
+        """
+        iterations = factory.get_iterations()
+        preview_width = max(2, scheduler.width // self.preview_scale)
+        preview_height = max(2, scheduler.height // self.preview_scale)
+        preview = TileScheduler(preview_width, preview_height).draw(pool, factory, region)
+
+        # Where each preview pixel falls in the full image, and so which tile it's in
+        rows, columns = np.nonzero(self.find_boundary(preview))
+        rows = np.rint(rows * ((scheduler.height - 1) / (preview_height - 1))).astype(int)
+        columns = np.rint(columns * ((scheduler.width - 1) / (preview_width - 1))).astype(int)
+        keys = set(zip((rows // scheduler.tile_height * scheduler.tile_height).tolist(),
+                       (columns // scheduler.tile_width * scheduler.tile_width).tolist()))
+
+        boosted = int(np.ceil(iterations * self.boost))
+        self.boosted = len(keys)
+        self.tiles = len(scheduler.get_tiles())
+        return {key: boosted for key in keys}
+
+    def report(self) -> str:
+        return '{} of {} tiles on a boundary, drawn with {}x the iterations'.format(self.boosted, self.tiles,
+                                                                                   self.boost)
+
+
+def dilate(mask: np.ndarray, distance: int) -> np.ndarray:
+    # Grow a mask by the given number of pixels in every direction, diagonals included
+    grown = mask.copy()
+    for _ in range(distance):
+        step = grown.copy()
+        step[1:, :] |= grown[:-1, :]
+        step[:-1, :] |= grown[1:, :]
+        step[:, 1:] |= step[:, :-1].copy()
+        step[:, :-1] |= step[:, 1:].copy()
+        grown = step
+    return grown
@@ -0,0 +1,204 @@
+from typing import List, Tuple, Iterator, Dict
+import numpy as np
+
+from calculators.factories import LineFactory
+from render.scheduler import TileScheduler
+
+
+def get_centre(region: List[complex]) -> complex:
+    return (region[0] + region[1]) / 2
+
+
+def get_size(region: List[complex]) -> Tuple[float, float]:
+    # Regions run from the top left corner to the bottom right
+    return region[1].real - region[0].real, region[0].imag - region[1].imag
+
+
+class ZoomPath:
+
+    """
+    The region shown by every frame of an animation, given by the regions of a few
+    key frames. Between two key frames the size changes geometrically, so the zoom
+    runs at a steady rate, and the centre moves so that the point being zoomed
+    towards stays still on screen.
+    """
+
+    def __init__(self, keyframes: List[Tuple[int, List[complex]]]):
+        """
+        :param keyframes: The frame number and region of each key frame, the first usually at frame 0
+        """
+        self.keyframes = sorted(keyframes, key=lambda keyframe: keyframe[0])
+        if not self.keyframes:
+            raise ValueError('A zoom path needs at least one key frame')
+        if len({frame for frame, _ in self.keyframes}) != len(self.keyframes):
+            raise ValueError('Each frame can only have one key frame')
+
+    def get_frames(self) -> range:
+        return range(self.keyframes[0][0], self.keyframes[-1][0] + 1)
+
+    def get_region(self, frame: int) -> List[complex]:
+        """
+        The region shown by the given frame
+        """
+        if frame <= self.keyframes[0][0]:
+            return list(self.keyframes[0][1])
+        if frame >= self.keyframes[-1][0]:
+            return list(self.keyframes[-1][1])
+
+        index = next(i for i, (key_frame, _) in enumerate(self.keyframes) if key_frame > frame)
+        (start_frame, start), (end_frame, end) = self.keyframes[index - 1], self.keyframes[index]
+        t = (frame - start_frame) / (end_frame - start_frame)
+
+        (start_width, start_height), (end_width, end_height) = get_size(start), get_size(end)
+        width = start_width * (end_width / start_width) ** t
+        height = start_height * (end_height / start_height) ** t
+        ratio = end_width / start_width
+        if abs(ratio - 1.0) < 1e-12:
+            # A pan, rather than a zoom
+            progress = t
+        else:
+            progress = (1.0 - width / start_width) / (1.0 - ratio)
+        centre = get_centre(start) + (get_centre(end) - get_centre(start)) * progress
+        return [centre - width / 2 + height / 2 * 1j, centre + width / 2 - height / 2 * 1j]
+
+
+class KeyImage:
+
+    """
+    The raw output for an oversized render of a region, that frames within the region
+    are resampled from
+    """
+
+    def __init__(self, region: List[complex], raw: np.ndarray):
+        self.region = region
+        self.raw = raw
+
+    def covers(self, region: List[complex], width: int) -> bool:
+        """
+        Whether a frame of the given region and width can be resampled from this image
+        without stretching it - the region has to be inside this one, and its pixels no
+        closer together than this image's
+        """
+        key_width, key_height = get_size(self.region)
+        margin = key_width * 1e-9
+        inside = region[0].real >= self.region[0].real - margin and region[1].real <= self.region[1].real + margin \
+            and region[0].imag <= self.region[0].imag + margin and region[1].imag >= self.region[1].imag - margin
+        spacing = get_size(region)[0] / (width - 1)
+        key_spacing = key_width / (self.raw.shape[1] - 1)
+        return inside and spacing >= key_spacing * (1.0 - 1e-9)
+
+    def resample(self, region: List[complex], width: int, height: int) -> np.ndarray:
+        """
+        Resample the part of this image within the region to a width x height frame.
+        Values are interpolated between the nearest four pixels, other than next to
+        the interior (raw 0), where the nearest pixel is used so interior edges stay sharp
+        """
+        key_width, key_height = get_size(self.region)
+        frame_width, frame_height = get_size(region)
+        rows = (self.region[0].imag - (region[0].imag - np.arange(height) * (frame_height / (height - 1)))) \
+            / key_height * (self.raw.shape[0] - 1)
+        columns = (region[0].real + np.arange(width) * (frame_width / (width - 1)) - self.region[0].real) \
+            / key_width * (self.raw.shape[1] - 1)
+        rows = snap(rows, self.raw.shape[0])
+        columns = snap(columns, self.raw.shape[1])
+
+        top, left = np.floor(rows).astype(int), np.floor(columns).astype(int)
+        bottom, right = np.minimum(top + 1, self.raw.shape[0] - 1), np.minimum(left + 1, self.raw.shape[1] - 1)
+        down, across = (rows - top)[:, np.newaxis], (columns - left)[np.newaxis, :]
+        top, bottom = top[:, np.newaxis], bottom[:, np.newaxis]
+
+        corners = [self.raw[top, left], self.raw[top, right], self.raw[bottom, left], self.raw[bottom, right]]
+        blended = (corners[0] * (1 - across) + corners[1] * across) * (1 - down) \
+            + (corners[2] * (1 - across) + corners[3] * across) * down
+        nearest = self.raw[np.where(down < 0.5, top, bottom), np.where(across < 0.5, left, right)]
+        interior = np.minimum.reduce(corners) == 0.0
+        return np.where(interior, nearest, blended)
+
+
+def snap(positions: np.ndarray, size: int) -> np.ndarray:
+    # Positions within rounding of a pixel are taken as that pixel, so a frame that lines up with the
+    # key image's pixels is an exact copy of them
+    rounded = np.round(positions)
+    positions = np.where(np.abs(positions - rounded) < 1e-6, rounded, positions)
+    return np.clip(positions, 0, size - 1)
+
+
+class ZoomAnimator:
+
+    """
+    Draws the raw output of every frame of a zoom. Rather than drawing every frame from
+    scratch, a key image oversample times the frame resolution is drawn for a frame,
+    and the frames after it are resampled from that until they have zoomed in far
+    enough to need more detail (oversample times), or have left its region. At an
+    oversample of 2, a steady zoom draws one image of 4 times the pixels per doubling
+    of the zoom, rather than every frame in full.
+
+    Key images are sized so a frame of the same region lines up exactly with every
+    oversample'th pixel, and each is drawn with its tiles ordered by the last one's
+    timings.
+    """
+
+    def __init__(self,
+                 factory: LineFactory,
+                 width: int,
+                 height: int,
+                 path: ZoomPath,
+                 oversample: int = 2,
+                 subdivide: bool = False,
+                 tile_width: int = 64,
+                 tile_height: int = 64):
+        """
+        :param factory: The line-drawer-generator for the fractal
+        :param width: The frame width
+        :param height: The frame height
+        :param path: The region of each frame
+        :param oversample: How many times the frame resolution key images are drawn at, 1 draws every frame
+        :param subdivide: Whether to skip solid regions with rectangle subdivision, where the factory allows it
+        :param tile_width: The width of each tile of a key image
+        :param tile_height: The height of each tile of a key image
+        """
+        if oversample < 1:
+            raise ValueError('Oversample must be at least 1, got {}'.format(oversample))
+        self.factory = factory
+        self.width = width
+        self.height = height
+        self.path = path
+        self.oversample = oversample
+        self.subdivide = subdivide
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.key = None
+        self.timings = {}
+        self.keys_drawn = 0
+        self.calculated = 0
+
+    def draw_key(self, pool, region: List[complex]) -> KeyImage:
+        scheduler = TileScheduler((self.width - 1) * self.oversample + 1,
+                                  (self.height - 1) * self.oversample + 1,
+                                  self.tile_width,
+                                  self.tile_height,
+                                  self.timings,
+                                  self.subdivide)
+        raw = scheduler.draw(pool, self.factory, region)
+        self.timings = scheduler.timings
+        self.keys_drawn += 1
+        self.calculated += scheduler.calculated
+        return KeyImage(region, raw)
+
+    def frames(self, pool) -> Iterator[Tuple[int, np.ndarray]]:
+        """
+        Draw every frame of the path in turn
+
+        :param pool: The process pool to draw key images on
+        :return: An iterator over each frame number and its height x width float64 raw output
+        """
+        for frame in self.path.get_frames():
+            region = self.path.get_region(frame)
+            if self.key is None or not self.key.covers(region, self.width):
+                self.key = self.draw_key(pool, region)
+            yield frame, self.key.resample(region, self.width, self.height)
+
+    def report(self) -> str:
+        frames = len(self.path.get_frames())
+        return '{} frames from {} key images, {} pixels calculated ({:.1f} per frame pixel)'.format(
+            frames, self.keys_drawn, self.calculated, self.calculated / float(frames * self.width * self.height))
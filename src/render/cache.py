@@ -0,0 +1,132 @@
+from typing import List, Optional
+from hashlib import sha256
+from types import CodeType, FunctionType, ModuleType
+import os
+import numpy as np
+
+
+def describe(value, functions: tuple = ()) -> str:
+    """
+    Describe a value by its contents rather than its identity, so the same parameters
+    give the same description in any process. Functions (e.g. the lambdas given to
+    MandelLambdaFactory) are described by their compiled code, any values they close
+    over and the values of the globals they read, and arrays by their contents
+
+    :param value: The value to describe
+    :param functions: The functions already being described, which a recursive one refers back to
+    """
+    if isinstance(value, CodeType):
+        return 'code({}, {}, {})'.format(value.co_code.hex(), describe(value.co_consts, functions), value.co_names)
+    if isinstance(value, FunctionType):
+        if any(value is function for function in functions):
+            return 'function({})'.format(value.__qualname__)
+        functions += (value,)
+        closure = [cell.cell_contents for cell in value.__closure__ or ()]
+        # Names the code reads that aren't globals are builtins or attributes
+        used = {name: value.__globals__[name] for name in value.__code__.co_names
+                if name in value.__globals__ and not isinstance(value.__globals__[name], ModuleType)}
+        return 'function({}, {}, {}, {})'.format(describe(value.__code__, functions),
+                                                 describe(value.__defaults__, functions),
+                                                 describe(closure, functions), describe(used, functions))
+    if isinstance(value, np.ndarray):
+        return 'array({}, {}, {})'.format(value.dtype.str, value.shape, sha256(value.tobytes()).hexdigest())
+    if isinstance(value, (list, tuple)):
+        return '({})'.format(', '.join(describe(x, functions) for x in value))
+    if isinstance(value, dict):
+        return '{{{}}}'.format(', '.join('{}: {}'.format(k, describe(value[k], functions)) for k in sorted(value)))
+    if hasattr(value, '__dict__') and not isinstance(value, type):
+        # An object's pickled state is what identifies it, without anything built from it
+        get_state = getattr(type(value), '__getstate__', None)
+        state = value.__getstate__() if get_state not in (None, getattr(object, '__getstate__', None)) else vars(value)
+        return '{}{}'.format(type(value).__qualname__, describe(state, functions))
+    return repr(value)
+
+
+class RenderCache:
+
+    """
+    Keeps the raw output of renders on disk, so the same fractal over the same region
+    at the same resolution is only drawn once, however many times it is re-coloured.
+
+    Each render is stored as a .npy file named by a hash of the factory's type and
+    parameters (including the iteration count and any functions), the region and the
+    resolution, and whichever of rectangle subdivision, an iteration budget, symmetry
+    and supersampling were used. They are loaded memory-mapped, so only the pages that
+    are read come off the disk. When the files take up more than max_bytes, the least
+    recently used are deleted - apart from the one just saved, however large.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 1 << 30):
+        """
+        :param directory: The directory to keep the renders in, created if needed
+        :param max_bytes: The most disk space to use
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def get_key(factory, region: List[complex], width: int, height: int, subdivide: bool = False, budget=None,
+                symmetric: bool = False, supersample=None) -> str:
+        # Rectangle subdivision can give slightly different output, so is part of the key where it's used
+        subdivide = subdivide and factory.supports_subdivision
+        parts = [factory, region, width, height, subdivide]
+        if budget is not None:
+            # As is an adaptive iteration budget, by its settings
+            parts.append({'boost': budget.boost, 'preview_scale': budget.preview_scale, 'spread': budget.spread})
+        if symmetric:
+            # And copying pixels from their reflections
+            parts.append('symmetric')
+        if supersample is not None:
+            # And supersampling, which changes every edge pixel
+            parts.append({'samples': supersample.samples, 'threshold': supersample.threshold, 'seed': supersample.seed})
+        return sha256(describe(parts).encode('utf-8')).hexdigest()
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, key + '.npy')
+
+    def load(self, key: str) -> Optional[np.ndarray]:
+        """
+        Get a cached render, memory-mapped read only, or None if it isn't cached
+        """
+        path = self.get_path(key)
+        try:
+            grid = np.load(path, mmap_mode='r')
+        except (FileNotFoundError, ValueError):
+            return None
+        # Using a render makes it the most recently used
+        os.utime(path)
+        return grid
+
+    def save(self, key: str, grid: np.ndarray):
+        """
+        Cache a render, then delete the least recently used renders until the cache fits
+        """
+        path = self.get_path(key)
+        # Written under another name first, so a reader never sees half a file
+        partial = path + '.partial'
+        with open(partial, 'wb') as f:
+            np.save(f, grid)
+        os.replace(partial, path)
+        self.evict(key)
+
+    def evict(self, keep: str):
+        """
+        Delete the least recently used renders until the cache fits
+
+        :param keep: The key of the render just saved, which is kept even if it's bigger than the cache on its own
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npy'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep + '.npy':
+                # Picked out by name, as saves in the same tick of a coarse clock can share its mtime
+                continue
+            os.remove(os.path.join(self.directory, name))
+            total -= size
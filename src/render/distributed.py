@@ -0,0 +1,270 @@
+from typing import List, Dict, Tuple, Optional
+from multiprocessing.managers import BaseManager
+from collections import deque
+from threading import Lock, Event
+from time import monotonic, sleep, perf_counter
+import numpy as np
+
+from calculators.factories import LineFactory
+from render.scheduler import Tile, TileTask, TileScheduler, draw_tile
+from render.shared import SharedGrid
+from render.statistics import TileStatistics
+
+
+class TileBoard:
+
+    """
+    The coordinator's record of which tiles of a render are waiting, which have been
+    handed out (and when) and which are done. Workers call it through a manager proxy,
+    each from its own thread, so every method holds the lock.
+
+    A tile that has been out for longer than the lease is assumed to belong to a
+    worker that has gone, and is handed out again to the next worker that asks. If
+    the first worker does send it back after all, whichever copy arrives first is used.
+
+    The board lives in a manager process of its own (see BoardServer), and writes the
+    tiles into the coordinator's shared grid.
+    """
+
+    def __init__(self,
+                 tiles: List[Tile],
+                 job: Tuple[LineFactory, List[complex], int, int, bool, bool],
+                 output: SharedGrid,
+                 lease_seconds: float):
+        self.waiting = deque(tiles)
+        self.leases = {}
+        self.job = job
+        self.output = output
+        self.lease_seconds = lease_seconds
+        self.remaining = len(tiles)
+        self.timings = {}
+        self.calculated = 0
+        self.skipped = 0
+        self.iterated = 0
+        self.reissued = 0
+        # Each tile's own statistics, when the render is instrumented
+        self.statistics = []
+        self.lock = Lock()
+        self.done = Event()
+        if not tiles:
+            self.done.set()
+
+    def get_job(self) -> Tuple[LineFactory, List[complex], int, int, bool, bool]:
+        """
+        The factory (or spec), region, width, height, whether to subdivide and whether to
+        record statistics
+        """
+        return self.job
+
+    def get_tile(self) -> Optional[Tile]:
+        """
+        Get the next tile to draw, or None if there is nothing to hand out right now
+        """
+        with self.lock:
+            now = monotonic()
+            if self.waiting:
+                tile = self.waiting.popleft()
+            else:
+                expired = [lease for lease in self.leases.values() if lease[1] <= now]
+                if not expired:
+                    return None
+                tile = min(expired, key=lambda lease: lease[1])[0]
+                self.reissued += 1
+            self.leases[tile.key()] = (tile, now + self.lease_seconds)
+            return tile
+
+    def put_tile(self,
+                 tile: Tile,
+                 rows: np.ndarray,
+                 seconds: float,
+                 calculated: int,
+                 skipped: int,
+                 iterated: int,
+                 statistics: TileStatistics = None):
+        with self.lock:
+            if tile.key() in self.timings:
+                return
+            self.leases.pop(tile.key(), None)
+            self.output.array[tile.row:tile.row + tile.height, tile.column:tile.column + tile.width] = rows
+            self.timings[tile.key()] = seconds
+            self.calculated += calculated
+            self.skipped += skipped
+            self.iterated += iterated
+            if statistics is not None:
+                self.statistics.append((tile, seconds, statistics))
+            self.remaining -= 1
+            if self.remaining == 0:
+                self.done.set()
+
+    def is_finished(self) -> bool:
+        return self.done.is_set()
+
+    def wait(self):
+        """
+        Block until every tile has been returned
+        """
+        self.done.wait()
+
+    def get_results(self) -> Tuple[Dict[Tuple[int, int], float], int, int, int, int, List]:
+        """
+        The timings, pixels calculated, iterations skipped and calculated, tiles handed
+        out again and each tile's statistics (if recorded)
+        """
+        with self.lock:
+            return self.timings, self.calculated, self.skipped, self.iterated, self.reissued, self.statistics
+
+
+# The board the manager process is serving, made in that process by open_board
+served_board = None
+
+
+def open_board(tiles: List[Tile],
+               job: Tuple[LineFactory, List[complex], int, int, bool, bool],
+               output: SharedGrid,
+               lease_seconds: float):
+    global served_board
+    served_board = TileBoard(tiles, job, output, lease_seconds)
+
+
+def get_served_board() -> TileBoard:
+    return served_board
+
+
+class BoardManager(BaseManager):
+    pass
+
+
+BoardManager.register('get_board')
+
+
+class BoardServer(BaseManager):
+    # Started in its own process for each render, so shutting it down stops everything it was serving
+    pass
+
+
+BoardServer.register('get_board', callable=get_served_board)
+
+
+def work(address: Tuple[str, int], authkey: bytes, poll_seconds: float = 0.5) -> int:
+    """
+    Draw tiles for a coordinator until its render is finished
+
+    :param address: The coordinator's host and port
+    :param authkey: The key the coordinator was started with
+    :param poll_seconds: How long to wait before asking again when there are no tiles to hand out
+    :return: The number of tiles drawn
+    """
+    manager = BoardManager(tuple(address), authkey)
+    manager.connect()
+    board = manager.get_board()
+    factory, region, width, height, subdivide, statistics = board.get_job()
+    drawn = 0
+    try:
+        while not board.is_finished():
+            tile = board.get_tile()
+            if tile is None:
+                sleep(poll_seconds)
+                continue
+            board.put_tile(*draw_tile(TileTask(factory, tile, region, width, height, subdivide,
+                                               statistics=statistics)))
+            drawn += 1
+    except (EOFError, ConnectionError):
+        # The coordinator stops listening as soon as the render is finished
+        pass
+    return drawn
+
+
+class DistributedScheduler(TileScheduler):
+
+    """
+    A tile scheduler that hands its tiles out over the network, rather than to a local
+    pool. For each render the coordinator (wherever draw is called) starts a process
+    listening on the given address, and any number of worker processes on any number
+    of hosts connect to it (see work, or worker.py) and draw tiles until the render is
+    finished. Workers can join or leave at any point - tiles held by a worker that has
+    gone are handed out again once their lease runs out.
+
+    The factory is sent to the workers with the standard pickle, so a factory built
+    with lambdas has to be given as a FactorySpec, or built with formula strings instead.
+    """
+
+    def __init__(self,
+                 width: int,
+                 height: int,
+                 authkey: bytes,
+                 address: Tuple[str, int] = ('', 0),
+                 lease_seconds: float = 120.0,
+                 local_workers: int = 0,
+                 tile_width: int = 64,
+                 tile_height: int = 64,
+                 previous_timings: Dict[Tuple[int, int], float] = None,
+                 subdivide: bool = False):
+        """
+        :param width: The image width
+        :param height: The image height
+        :param authkey: The key workers must give to connect
+        :param address: The host and port to listen on, port 0 picks a free port
+        :param lease_seconds: How long a worker has to return a tile before it is handed to another
+        :param local_workers: The number of workers to run on the pool passed to draw, alongside remote ones
+        :param tile_width: The width of each tile
+        :param tile_height: The height of each tile
+        :param previous_timings: The timings of an earlier render to order the tiles by
+        :param subdivide: Whether to skip solid regions with rectangle subdivision, where the factory allows it
+        """
+        super(DistributedScheduler, self).__init__(width, height, tile_width, tile_height, previous_timings, subdivide)
+        self.authkey = authkey
+        self.address = address
+        self.lease_seconds = lease_seconds
+        self.local_workers = local_workers
+        self.reissued = 0
+
+    def draw(self, pool, factory: LineFactory, region: List[complex], output: SharedGrid = None) -> np.ndarray:
+        """
+        Serve every tile of the region to the workers, and put them back together as they
+        are returned. Blocks until every tile has been drawn
+
+        :param pool: The local process pool to run local_workers on, if any
+        :param factory: The line-drawer-generator for the fractal, which must be picklable
+        :param region: The window onto the fractal we're interested in
+        :param output: A height x width float64 shared grid to write the tiles into
+        :return: The raw output for the whole image, as a height x width float64 array
+        """
+        own_output = output is None
+        if own_output:
+            output = SharedGrid((self.height, self.width), np.float64)
+        job = (factory, region, self.width, self.height, self.subdivide, self.statistics is not None)
+
+        # The board is served from a process of its own, which shutdown stops along with its listener
+        server = BoardServer(self.address, self.authkey)
+        server.start(open_board, (self.get_tiles(), job, output, self.lease_seconds))
+        start_time = perf_counter()
+        try:
+            print('Serving tiles on {}:{}'.format(*server.address))
+            board = server.get_board()
+            if pool is not None:
+                for _ in range(self.local_workers):
+                    pool.apply_async(work, (server.address, self.authkey))
+            board.wait()
+            self.timings, self.calculated, self.skipped, self.iterated, self.reissued, tile_statistics = \
+                board.get_results()
+        finally:
+            server.shutdown()
+
+        if own_output:
+            grid = output.array.copy()
+            output.release()
+        else:
+            grid = output.array
+        if self.statistics is not None:
+            for tile, seconds, statistics in tile_statistics:
+                self.statistics.add(tile, seconds, statistics)
+            self.statistics.add_wall_time(perf_counter() - start_time)
+        if self.symmetry is not None:
+            self.symmetry.fill(grid)
+        return grid
+
+    def report(self) -> str:
+        report = super(DistributedScheduler, self).report()
+        if self.reissued:
+            report += ', {} tiles handed out again after their worker went quiet'.format(self.reissued)
+        return report
@@ -0,0 +1,475 @@
+from typing import List, Dict, Tuple, Callable, Iterator, Optional
+from time import perf_counter
+from collections import deque
+import dill
+import numpy as np
+
+from calculators.factories import *
+from colours.colourise import Colouriser
+from render.subdivision import RectangleSubdivider
+from render.shared import SharedGrid
+from render.statistics import TileStatistics, RenderStatistics
+
+
+class Tile:
+
+    """
+    A rectangle of pixels in the output image, given by its top left corner and size,
+    and optionally the maximum iterations to draw it with in place of the factory's
+    """
+
+    def __init__(self, row: int, column: int, height: int, width: int, iterations: int = None):
+        self.row = row
+        self.column = column
+        self.height = height
+        self.width = width
+        self.iterations = iterations
+
+    def key(self) -> Tuple[int, int]:
+        return self.row, self.column
+
+    def __repr__(self):
+        if self.iterations is not None:
+            return 'Tile({}, {}, {}, {}, {})'.format(self.row, self.column, self.height, self.width, self.iterations)
+        return 'Tile({}, {}, {}, {})'.format(self.row, self.column, self.height, self.width)
+
+
+class TileTask:
+
+    """
+    Everything a worker needs to draw one tile - the factory, the tile, the region and
+    image size it is part of, whether to use rectangle subdivision, optionally a
+    colouriser to colour the rows with, and optionally a shared grid to write the
+    output into rather than returning it.
+
+    A task can also draw only the pixels on a coarser grid - every stride'th pixel
+    across and down - leaving out any already drawn on the even coarser grid of an
+    earlier pass (see TileScheduler.draw_progressive), and can record statistics about
+    the tile as it's drawn (see RenderStatistics)
+    """
+
+    def __init__(self,
+                 factory: LineFactory,
+                 tile: Tile,
+                 region: List[complex],
+                 width: int,
+                 height: int,
+                 subdivide: bool = False,
+                 colouriser: Colouriser = None,
+                 output: SharedGrid = None,
+                 stride: int = 1,
+                 done_stride: int = None,
+                 statistics: bool = False):
+        self.factory = factory
+        self.tile = tile
+        self.region = region
+        self.width = width
+        self.height = height
+        self.subdivide = subdivide
+        self.colouriser = colouriser
+        self.output = output
+        self.stride = stride
+        self.done_stride = done_stride
+        self.statistics = statistics
+
+    def get_row_starts(self) -> List[complex]:
+        # hold IM constant (a line from +imag to -imag), only creating this tile's rows
+        vertical = LineDrawer(self.region[0], self.region[0].real + self.region[1].imag*1j, self.height)
+        vertical.create_range(self.tile.row, self.tile.height)
+        return vertical.get_points()
+
+    def is_refinement(self) -> bool:
+        return self.stride != 1 or self.done_stride is not None
+
+    def get_mask(self) -> np.ndarray:
+        """
+        Which of the tile's pixels the task draws - those on its grid that weren't on
+        the grid of the earlier pass
+        """
+        rows = np.arange(self.tile.row, self.tile.row + self.tile.height)[:, np.newaxis]
+        columns = np.arange(self.tile.column, self.tile.column + self.tile.width)[np.newaxis, :]
+        mask = (rows % self.stride == 0) & (columns % self.stride == 0)
+        if self.done_stride is not None:
+            mask &= ~((rows % self.done_stride == 0) & (columns % self.done_stride == 0))
+        return mask
+
+
+def get_evaluator(drawer: LineDrawer) -> Callable[[List[complex]], List[float]]:
+    """
+    Get a function that calculates the output for any list of (already mapped) points
+    using the given drawer's fractal
+    """
+    if isinstance(drawer, VectorisedDrawer):
+        return lambda points: drawer.calculate_points(np.array(points, dtype=complex)).tolist()
+    return lambda points: list(drawer.calculate_row(points))
+
+
+def draw_tile(task: TileTask) -> Tuple[Tile, np.ndarray, float, int, int, int, Optional[TileStatistics]]:
+    """
+    Draw a single tile, returning the tile, its 2D float64 array of output (or uint8
+    RGB rows if the task has a colouriser), the time it took, the number of pixels
+    actually calculated, the number of iterations skipped (by series approximation),
+    the number of iterations calculated, and the tile's statistics if the task asks for
+    them (or None). If the task has a shared output grid the rows are written into that
+    instead, and None is returned in their place
+    """
+    tile, rows, seconds, calculated, skipped, iterated, iterations = calculate_tile(task)
+    statistics = None
+    if task.statistics:
+        limit = tile.iterations if tile.iterations is not None else get_limit(task.factory)
+        statistics = TileStatistics.measure(rows, iterations, limit, task.get_mask() if task.is_refinement() else None)
+        statistics.skipped = skipped
+    if task.colouriser is not None:
+        rows = task.colouriser.colourise_tile(rows)
+    if task.output is not None:
+        planes = rows.shape[1] // tile.width
+        task.output.array[tile.row:tile.row + tile.height,
+                          tile.column * planes:(tile.column + tile.width) * planes] = rows
+        rows = None
+    if statistics is not None:
+        # What the pool pickles either way, without the statistics themselves
+        statistics.bytes_in = pickled_size(task)
+        statistics.bytes_out = pickled_size((tile, rows, seconds, calculated, skipped, iterated, None))
+    return tile, rows, seconds, calculated, skipped, iterated, statistics
+
+
+def get_limit(factory: LineFactory) -> Optional[int]:
+    # The factory's maximum iterations, for any kind of factory or spec, or None if it has none
+    try:
+        return factory.get_iterations()
+    except ValueError:
+        return None
+
+
+def pickled_size(value) -> int:
+    """
+    The size of a value pickled with dill, as the pool sends it, or 0 if it can't be
+    pickled at all - e.g. when the pool isn't there to send it
+    """
+    try:
+        return len(dill.dumps(value))
+    except Exception:
+        return 0
+
+
+def calculate_tile(task: TileTask) -> Tuple[Tile, np.ndarray, float, int, int, int, Optional[np.ndarray]]:
+    """
+    Draw a single tile's raw output, returning the same as draw_tile but with the
+    iterations each pixel took in place of the statistics, when the task records them
+    """
+    start_time = perf_counter()
+    tile = task.tile
+    factory = task.factory if tile.iterations is None else task.factory.with_iterations(tile.iterations)
+    drawers = [factory.get_drawer(x, task.region[1].real + x.imag * 1j, task.width) for x in task.get_row_starts()]
+    iterations = np.zeros((tile.height, tile.width), dtype=np.int64) if task.statistics else None
+    if iterations is not None:
+        for drawer in drawers:
+            drawer.record_iterations = True
+
+    if task.is_refinement():
+        # Only this pass's pixels are drawn, into the tile as the earlier passes left it
+        mask = task.get_mask()
+        if task.output is not None:
+            rows = task.output.array[tile.row:tile.row + tile.height, tile.column:tile.column + tile.width].copy()
+        else:
+            rows = np.zeros((tile.height, tile.width), dtype=np.float64)
+        points = []
+        for drawer, row_mask in zip(drawers, mask):
+            if row_mask.any():
+                drawer.create_points((tile.column + np.flatnonzero(row_mask)).tolist())
+                points.extend(drawer.get_points())
+        if points:
+            rows[mask] = get_evaluator(drawers[0])(points)
+            if iterations is not None:
+                iterations[mask] = drawers[0].point_iterations
+        return tile, rows, perf_counter() - start_time, len(points), drawers[0].skipped, drawers[0].iterated, \
+            iterations
+
+    for drawer in drawers:
+        drawer.create_range(tile.column, tile.width)
+
+    if task.subdivide and factory.supports_subdivision:
+        subdivider = RectangleSubdivider(get_evaluator(drawers[0]), record_order=iterations is not None)
+        rows = np.array(subdivider.draw([drawer.get_points() for drawer in drawers]), dtype=np.float64)
+        if iterations is not None and subdivider.order:
+            cells = np.array(subdivider.order)
+            iterations[cells[:, 0], cells[:, 1]] = drawers[0].point_iterations
+        return tile, rows, perf_counter() - start_time, subdivider.calculated, drawers[0].skipped, \
+            drawers[0].iterated, iterations
+
+    if all(isinstance(drawer, VectorisedDrawer) for drawer in drawers):
+        # Iterate the whole tile as one array rather than a row at a time
+        points = np.array([drawer.get_points() for drawer in drawers], dtype=complex)
+        rows = drawers[0].calculate_points(points)
+        if iterations is not None:
+            iterations[:] = np.reshape(drawers[0].point_iterations, iterations.shape)
+    else:
+        rows = np.empty((tile.height, tile.width), dtype=np.float64)
+        for y, drawer in enumerate(drawers):
+            drawer.draw()
+            rows[y] = drawer.get_output()
+            if iterations is not None:
+                iterations[y] = drawer.point_iterations
+
+    return tile, rows, perf_counter() - start_time, tile.width * tile.height, sum(d.skipped for d in drawers), \
+        sum(d.iterated for d in drawers), iterations
+
+
+def fill_from_stride(grid: np.ndarray, stride: int) -> np.ndarray:
+    """
+    Fill in every pixel of a grid that has only been drawn every stride'th pixel
+    across and down, from the drawn pixel above and to the left of it
+    """
+    rows = np.arange(grid.shape[0]) // stride * stride
+    columns = np.arange(grid.shape[1]) // stride * stride
+    return grid[rows[:, np.newaxis], columns[np.newaxis, :]]
+
+
+class TileScheduler:
+
+    """
+    Split an image into 2D tiles and hand them out to a pool one at a time, most
+    expensive first, so no worker is left idle at the end of a render while another
+    finishes a long run of interior rows.
+
+    Without any timings to go on, tiles nearest the centre of the image go first, as
+    that's where the interior of most of the sets sits. Given the timings from an
+    earlier render of a similar region, the slowest tiles from that go first.
+
+    Each tile can be given its own maximum iterations in tile_iterations, keyed by its
+    top left pixel (see IterationBudget), otherwise the factory's is used.
+
+    Given a symmetry plan (see SymmetryPlan), only the tiles with pixels that aren't
+    copies of others are drawn, and the copies are filled in after.
+
+    Given statistics (see RenderStatistics), the workers measure every tile they draw
+    and the measurements are added to them.
+    """
+
+    def __init__(self,
+                 width: int,
+                 height: int,
+                 tile_width: int = 64,
+                 tile_height: int = 64,
+                 previous_timings: Dict[Tuple[int, int], float] = None,
+                 subdivide: bool = False):
+        """
+        :param width: The image width
+        :param height: The image height
+        :param tile_width: The width of each tile
+        :param tile_height: The height of each tile
+        :param previous_timings: The timings of an earlier render to order the tiles by
+        :param subdivide: Whether to skip solid regions with rectangle subdivision, where the factory allows it
+        """
+        self.width = width
+        self.height = height
+        self.tile_width = tile_width
+        self.tile_height = tile_height
+        self.previous_timings = previous_timings
+        self.subdivide = subdivide
+        self.timings = {}
+        self.calculated = 0
+        self.skipped = 0
+        self.iterated = 0
+        self.tile_iterations = {}
+        self.symmetry = None
+        self.statistics = None
+
+    def get_tiles(self) -> List[Tile]:
+        """
+        Create all of the tiles covering the image, in the order they should be drawn
+        """
+        tiles = [Tile(row, column, min(self.tile_height, self.height - row), min(self.tile_width, self.width - column),
+                      self.tile_iterations.get((row, column)))
+                 for row in range(0, self.height, self.tile_height)
+                 for column in range(0, self.width, self.tile_width)]
+        if self.symmetry is not None:
+            tiles = [tile for tile in tiles if self.symmetry.needs_tile(tile)]
+
+        if self.previous_timings:
+            tiles.sort(key=lambda t: self.previous_timings.get(t.key(), 0.0), reverse=True)
+        else:
+            centre_row = self.height / 2.0
+            centre_column = self.width / 2.0
+            tiles.sort(key=lambda t: (t.row + t.height / 2.0 - centre_row) ** 2
+                       + (t.column + t.width / 2.0 - centre_column) ** 2)
+        return tiles
+
+    def get_tasks(self,
+                  factory: LineFactory,
+                  region: List[complex],
+                  colouriser: Colouriser = None,
+                  output: SharedGrid = None,
+                  stride: int = 1,
+                  done_stride: int = None) -> List[TileTask]:
+        return [TileTask(factory, tile, region, self.width, self.height, self.subdivide, colouriser, output, stride,
+                         done_stride, self.statistics is not None)
+                for tile in self.get_tiles()]
+
+    def draw(self,
+             pool,
+             factory: LineFactory,
+             region: List[complex],
+             output: SharedGrid = None,
+             stride: int = 1,
+             done_stride: int = None) -> np.ndarray:
+        """
+        Draw every tile of the region on the pool, and put them back together
+
+        :param pool: The process pool to draw on
+        :param factory: The line-drawer-generator for the fractal
+        :param region: The window onto the fractal we're interested in
+        :param output: A height x width float64 shared grid for the workers to write into directly
+        :param stride: Only draw every stride'th pixel across and down
+        :param done_stride: The stride of an earlier pass whose pixels are already in the output, and aren't
+                            drawn again
+        :return: The raw output for the whole image, as a height x width float64 array
+        """
+        if done_stride is not None and output is None:
+            raise ValueError('A refinement pass needs the shared grid holding the earlier passes')
+        grid = output.array if output is not None else np.zeros((self.height, self.width), dtype=np.float64)
+        self.timings = {}
+        self.calculated = 0
+        self.skipped = 0
+        self.iterated = 0
+
+        start_time = perf_counter()
+        tasks = self.get_tasks(factory, region, output=output, stride=stride, done_stride=done_stride)
+        for tile, rows, seconds, calculated, skipped, iterated, statistics in pool.imap_unordered(draw_tile, tasks,
+                                                                                                  chunksize=1):
+            if rows is not None:
+                grid[tile.row:tile.row + tile.height, tile.column:tile.column + tile.width] = rows
+            self.timings[tile.key()] = seconds
+            self.calculated += calculated
+            self.skipped += skipped
+            self.iterated += iterated
+            if statistics is not None:
+                self.statistics.add(tile, seconds, statistics)
+        if self.statistics is not None:
+            self.statistics.add_wall_time(perf_counter() - start_time)
+
+        if self.symmetry is not None:
+            self.symmetry.fill(grid)
+        return grid
+
+    def draw_progressive(self,
+                         pool,
+                         factory: LineFactory,
+                         region: List[complex],
+                         output: SharedGrid,
+                         strides: List[int],
+                         on_pass: Callable[[int, np.ndarray], None] = None) -> np.ndarray:
+        """
+        Draw the region in passes, first every stride'th pixel across and down for each
+        of the strides in turn, then the full image. Every pass only draws the pixels
+        the earlier ones haven't, so the full image costs no more than drawing it in one
+        go. Each pass's tiles are ordered by how long they took in the pass before.
+
+        :param pool: The process pool to draw on
+        :param factory: The line-drawer-generator for the fractal
+        :param region: The window onto the fractal we're interested in
+        :param output: A height x width float64 shared grid to draw into
+        :param strides: The strides of the passes before the full one, each a multiple of the next -
+                        e.g. [4, 2] draws 1/16 of the pixels, then 1/4, then all of them
+        :param on_pass: Called after each pass but the last with its stride and a height x width preview
+                        of the image so far, each pixel filled in from the nearest one drawn
+        :return: The raw output for the whole image, as a height x width float64 array
+        """
+        strides = list(strides) + [1]
+        if any(stride < 1 or stride % finer != 0 or stride == finer for stride, finer in zip(strides, strides[1:])):
+            raise ValueError('Each stride must be a multiple of the next, got {}'.format(strides[:-1]))
+
+        previous_timings = self.previous_timings
+        timings = {}
+        calculated = skipped = iterated = 0
+        done_stride = None
+        try:
+            for stride in strides:
+                self.draw(pool, factory, region, output, stride, done_stride)
+                for key, seconds in self.timings.items():
+                    timings[key] = timings.get(key, 0.0) + seconds
+                calculated += self.calculated
+                skipped += self.skipped
+                iterated += self.iterated
+                if on_pass is not None and stride != 1:
+                    preview = fill_from_stride(output.array, stride)
+                    on_pass(stride, preview if self.symmetry is None else self.symmetry.fill(preview))
+                self.previous_timings = self.timings
+                done_stride = stride
+        finally:
+            self.previous_timings = previous_timings
+
+        self.timings = timings
+        self.calculated = calculated
+        self.skipped = skipped
+        self.iterated = iterated
+        return output.array
+
+    def stream(self,
+               pool,
+               factory: LineFactory,
+               region: List[complex],
+               colouriser: Colouriser = None,
+               bands_in_flight: int = 4) -> Iterator[np.ndarray]:
+        """
+        Draw the region a band of tiles at a time, yielding the rows in order as each
+        band completes. Only bands_in_flight bands are queued on the pool at once, so
+        memory use is proportional to a few bands of rows rather than the whole image.
+        Within a band, the tiles are still handed out most expensive first.
+
+        :param pool: The process pool to draw on
+        :param factory: The line-drawer-generator for the fractal
+        :param region: The window onto the fractal we're interested in
+        :param colouriser: If given, the workers colour their rows with it before returning them
+        :param bands_in_flight: The number of bands to queue on the pool at once
+        :return: An iterator over every row of the image, top to bottom, as float64 arrays (or uint8 RGB
+                 arrays when coloured)
+        """
+        if self.symmetry is not None:
+            raise ValueError('Symmetric renders can\'t be streamed, the rows copied may come from any earlier band')
+        self.timings = {}
+        self.calculated = 0
+        self.skipped = 0
+        self.iterated = 0
+
+        start_time = perf_counter()
+        bands = {}
+        for task in self.get_tasks(factory, region, colouriser):
+            bands.setdefault(task.tile.row, []).append(task)
+        waiting = deque(bands[row] for row in sorted(bands))
+
+        queued = deque()
+        while waiting or queued:
+            while waiting and len(queued) < bands_in_flight:
+                queued.append([pool.apply_async(draw_tile, (task,)) for task in waiting.popleft()])
+
+            band = None
+            for result in queued.popleft():
+                tile, rows, seconds, calculated, skipped, iterated, statistics = result.get()
+                if band is None:
+                    # Coloured rows have three values per pixel
+                    planes = rows.shape[1] // tile.width
+                    band = np.empty((tile.height, self.width * planes), dtype=rows.dtype)
+                band[:, tile.column * planes:(tile.column + tile.width) * planes] = rows
+                self.timings[tile.key()] = seconds
+                self.calculated += calculated
+                self.skipped += skipped
+                self.iterated += iterated
+                if statistics is not None:
+                    self.statistics.add(tile, seconds, statistics)
+
+            yield from band
+        if self.statistics is not None:
+            self.statistics.add_wall_time(perf_counter() - start_time)
+
+    def report(self) -> str:
+        if not self.timings:
+            return 'No tiles drawn'
+        total = sum(self.timings.values())
+        slowest = max(self.timings, key=self.timings.get)
+        report = '{} tiles in {:.2f}s of worker time, mean {:.3f}s, slowest {} at {:.3f}s, {} of {} pixels calculated, ' \
+                 '{} iterations'.format(len(self.timings), total, total / len(self.timings), slowest,
+                                        self.timings[slowest], self.calculated, self.width * self.height, self.iterated)
+        if self.skipped:
+            report += ', {} iterations skipped by series approximation'.format(self.skipped)
+        return report
@@ -0,0 +1,57 @@
+from multiprocessing import cpu_count
+from multiprocessing_on_dill.pool import Pool
+
+
+class RenderSession:
+
+    """
+    Owns a single long lived process pool, shared by everything drawn and coloured
+    while the session is open, so a batch of images only starts its worker processes
+    once. Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, processes: int = None):
+        """
+        :param processes: The number of worker processes, defaults to the number of cpus
+        """
+        if not processes:
+            processes = cpu_count() or 4
+        self.processes = processes
+        self.pool = None
+
+    def get_pool(self) -> Pool:
+        # The pool is only started when first needed
+        if self.pool is None:
+            self.pool = Pool(self.processes)
+        return self.pool
+
+    def close(self):
+        """
+        Wait for any outstanding work to finish and stop the workers
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def terminate(self):
+        """
+        Stop the workers immediately, abandoning any outstanding work
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def __getstate__(self):
+        # Anything holding a session can still be sent to a worker, just without the pool
+        return {'processes': self.processes, 'pool': None}
+
+    def __enter__(self) -> 'RenderSession':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
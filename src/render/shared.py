@@ -0,0 +1,90 @@
+from typing import Tuple
+from collections import OrderedDict
+from multiprocessing.shared_memory import SharedMemory
+from multiprocessing import resource_tracker
+import os
+import sys
+import numpy as np
+
+# Worker processes keep the blocks they have attached to, so every task for the
+# same grid doesn't have to map it again. Only the most recent few are kept, as
+# a long lived pool will see a new grid for every image
+attached_blocks = OrderedDict()
+attached_limit = 4
+
+# The process that started its own resource tracker by attaching a block, rather than sharing its parent's
+own_tracker = None
+
+
+def attach_block(name: str) -> SharedMemory:
+    """
+    Attach to a block of shared memory created by another process, leaving only that
+    process to unlink it
+    """
+    global own_tracker
+    if name in attached_blocks:
+        attached_blocks.move_to_end(name)
+        return attached_blocks[name]
+
+    if sys.version_info >= (3, 13):
+        block = SharedMemory(name=name, track=False)
+    else:
+        # Attaching registers the block with the resource tracker as if this process had created it, and a
+        # tracker of its own would unlink it (or complain it leaked) when the worker exits. Workers spawned, or
+        # forked once the creator's tracker was running, share it, and it only holds the one registration
+        # that the creator's unlink removes
+        if getattr(resource_tracker._resource_tracker, '_fd', None) is None:
+            own_tracker = os.getpid()
+        block = SharedMemory(name=name)
+        if own_tracker == os.getpid():
+            resource_tracker.unregister(block._name, 'shared_memory')
+    attached_blocks[name] = block
+    while len(attached_blocks) > attached_limit:
+        _, old_block = attached_blocks.popitem(last=False)
+        try:
+            old_block.close()
+        except BufferError:
+            # Something still has a view of it, leave it to be closed at exit
+            pass
+    return block
+
+
+class SharedGrid:
+
+    """
+    A 2D numpy array held in shared memory, so pool workers can write their tiles
+    straight into the output rather than pickling them back to the parent.
+
+    Pickling a SharedGrid only sends its name, shape and type - the receiving
+    process attaches to the same block of memory. The process that created the
+    grid must call release() when done with it.
+    """
+
+    def __init__(self, shape: Tuple[int, int], dtype):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.memory = SharedMemory(create=True, size=max(1, int(np.prod(self.shape)) * self.dtype.itemsize))
+        self.name = self.memory.name
+        self.owner = True
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.memory.buf)
+
+    def __getstate__(self):
+        return {'name': self.name, 'shape': self.shape, 'dtype': self.dtype.str}
+
+    def __setstate__(self, state):
+        self.name = state['name']
+        self.shape = state['shape']
+        self.dtype = np.dtype(state['dtype'])
+        self.owner = False
+        self.memory = attach_block(self.name)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.memory.buf)
+
+    def release(self):
+        """
+        Free the shared memory, only valid in the process that created the grid.
+        Any arrays taken from it must not be used afterwards
+        """
+        self.array = None
+        if self.owner:
+            self.memory.close()
+            self.memory.unlink()
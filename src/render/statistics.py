@@ -0,0 +1,204 @@
+from typing import Dict, Optional
+import os
+import platform
+import numpy as np
+
+from colours.colourise import ColourRanger, colour_black, colour_dark_purple, colour_red, colour_orange, \
+    colour_yellow, colour_white
+from output import png_output
+
+# The heatmap's colours, from the fewest iterations to the most
+heat_list = [colour_black, colour_dark_purple, colour_red, colour_orange, colour_yellow, colour_white]
+
+
+class TileStatistics:
+
+    """
+    What a worker measured while drawing one tile, sent back alongside it when the
+    render is instrumented (see RenderStatistics)
+    """
+
+    def __init__(self,
+                 worker: str,
+                 iterations: np.ndarray,
+                 pixels: int,
+                 escaped: int,
+                 interior: int,
+                 capped: int):
+        """
+        :param worker: The host and process id of the worker that drew the tile
+        :param iterations: The iterations each of the tile's pixels took, 0 for those not calculated
+        :param pixels: The number of pixels drawn
+        :param escaped: The pixels drawn that finished with a value before the maximum iterations - escaped,
+                        or converged for a Newton fractal
+        :param interior: The pixels drawn that were found to be interior without reaching the maximum
+                         iterations - by cycle detection, the main bulb check, or filled in by subdivision
+        :param capped: The pixels drawn that reached the maximum iterations
+        """
+        self.worker = worker
+        self.iterations = iterations
+        self.pixels = pixels
+        self.escaped = escaped
+        self.interior = interior
+        self.capped = capped
+        # The size of the task as pickled to the worker, and of the result pickled back
+        self.bytes_in = 0
+        self.bytes_out = 0
+        # The iterations skipped by series approximation, which are included in the pixels' iterations
+        self.skipped = 0
+
+    @staticmethod
+    def measure(raw: np.ndarray, iterations: np.ndarray, limit: Optional[int], drawn: np.ndarray = None) \
+            -> 'TileStatistics':
+        """
+        Sort a tile's pixels into escaped, interior and capped
+
+        :param raw: The tile's raw output
+        :param iterations: The iterations each pixel took
+        :param limit: The maximum iterations the tile was drawn with, if it has one
+        :param drawn: Which of the tile's pixels were drawn this time, by default all of them
+        """
+        if drawn is None:
+            drawn = np.ones(raw.shape, dtype=bool)
+        finished = raw[drawn] != 0.0
+        capped = ~finished & (iterations[drawn] >= limit) if limit is not None else np.zeros(finished.shape, bool)
+        return TileStatistics('{}:{}'.format(platform.node(), os.getpid()), iterations.astype(np.int32),
+                              int(drawn.sum()), int(finished.sum()), int((~finished & ~capped).sum()),
+                              int(capped.sum()))
+
+
+class RenderStatistics:
+
+    """
+    Instrumentation for a render, to see where its time goes. Set one as a scheduler's
+    statistics and its workers also record the iterations every pixel takes, and send
+    back what they measured with each tile - which costs a little more time and an int32
+    per pixel, so it's off unless asked for. Without it the drawers only check a flag.
+
+    Collects the time and iterations of each tile, the iterations of each pixel (which
+    save_heatmap draws), how many of the pixels escaped, were found to be interior early
+    or ran to the maximum iterations, how busy each worker was over the render and how
+    many bytes of tasks and results were pickled between the processes.
+
+    Statistics add up over every draw they're set for, so the passes of a progressive
+    render are all counted. Pixels copied by symmetry, and those subdivision fills in,
+    take no iterations, and show as such in the heatmap. A pixel's iterations include
+    any skipped by series approximation (see PerturbationMandelbrotDrawer), which are
+    also counted on their own - the rest are the scheduler's iterations calculated.
+    """
+
+    def __init__(self, width: int, height: int, processes: int = None):
+        """
+        :param width: The image width
+        :param height: The image height
+        :param processes: The number of workers the render has, for their utilisation, by default those
+                          that drew a tile
+        """
+        self.width = width
+        self.height = height
+        self.processes = processes
+        self.iterations = np.zeros((height, width), dtype=np.int64)
+        self.tile_seconds = {}
+        self.tile_iterations = {}
+        self.worker_seconds = {}
+        self.wall_seconds = 0.0
+        self.pixels = 0
+        self.escaped = 0
+        self.interior = 0
+        self.capped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.skipped = 0
+
+    def add(self, tile, seconds: float, statistics: TileStatistics):
+        """
+        Add what a worker measured drawing a tile
+        """
+        self.iterations[tile.row:tile.row + tile.height, tile.column:tile.column + tile.width] += \
+            statistics.iterations
+        self.tile_seconds[tile.key()] = self.tile_seconds.get(tile.key(), 0.0) + seconds
+        self.tile_iterations[tile.key()] = self.tile_iterations.get(tile.key(), 0) + int(statistics.iterations.sum())
+        self.worker_seconds[statistics.worker] = self.worker_seconds.get(statistics.worker, 0.0) + seconds
+        self.pixels += statistics.pixels
+        self.escaped += statistics.escaped
+        self.interior += statistics.interior
+        self.capped += statistics.capped
+        self.bytes_in += statistics.bytes_in
+        self.bytes_out += statistics.bytes_out
+        self.skipped += statistics.skipped
+
+    def add_wall_time(self, seconds: float):
+        self.wall_seconds += seconds
+
+    def get_worker_utilisation(self) -> Dict[str, float]:
+        """
+        The fraction of the render's wall time each worker spent drawing tiles
+        """
+        if not self.wall_seconds:
+            return {}
+        return {worker: seconds / self.wall_seconds for worker, seconds in self.worker_seconds.items()}
+
+    def get_utilisation(self) -> float:
+        """
+        The fraction of the workers' time over the render spent drawing tiles
+        """
+        workers = self.processes or len(self.worker_seconds)
+        if not self.wall_seconds or not workers:
+            return 0.0
+        return sum(self.worker_seconds.values()) / (self.wall_seconds * workers)
+
+    def as_dict(self) -> Dict:
+        """
+        The statistics as plain values, e.g. to save as JSON
+        """
+        drawn = self.iterations[self.iterations > 0]
+        pixels = max(self.pixels, 1)
+        return {'width': self.width,
+                'height': self.height,
+                'tiles': len(self.tile_seconds),
+                'wall_seconds': self.wall_seconds,
+                'worker_seconds': sum(self.worker_seconds.values()),
+                'utilisation': self.get_utilisation(),
+                'worker_utilisation': self.get_worker_utilisation(),
+                'slowest_tile': max(self.tile_seconds.values(), default=0.0),
+                'iterations': int(self.iterations.sum()),
+                'skipped_iterations': self.skipped,
+                'calculated_iterations': int(self.iterations.sum()) - self.skipped,
+                'mean_iterations': float(self.iterations.mean()),
+                'median_iterations': float(np.median(drawn)) if drawn.size else 0.0,
+                'max_iterations': int(self.iterations.max()),
+                'pixels': self.pixels,
+                'escaped': self.escaped / pixels,
+                'interior': self.interior / pixels,
+                'capped': self.capped / pixels,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'tile_seconds': {'{},{}'.format(*key): seconds for key, seconds in self.tile_seconds.items()},
+                'tile_iterations': {'{},{}'.format(*key): count for key, count in self.tile_iterations.items()}}
+
+    def get_heatmap(self) -> np.ndarray:
+        """
+        Colour the iterations of each pixel on a log scale, from black for none to white
+        for the most of any pixel
+
+        :return: The heatmap as height rows of uint8 RGB values
+        """
+        top = np.log1p(max(int(self.iterations.max()), 1))
+        colours = ColourRanger(heat_list).lookup(np.log1p(self.iterations.ravel()) / top)
+        return colours.reshape(self.height, self.width * 3)
+
+    def save_heatmap(self, filename: str):
+        writer = png_output.PngWriter(filename, self.width, self.height)
+        writer.add_colour(self.get_heatmap())
+        writer.close()
+
+    def report(self) -> str:
+        stats = self.as_dict()
+        skipped = ' ({} skipped by series approximation)'.format(self.skipped) if self.skipped else ''
+        return '{} tiles, {:.2f}s of worker time over {:.2f}s ({:.0%} utilised), {} iterations{}, {:.1f} per pixel ' \
+               '(median {:.0f}, max {}), {:.1%} escaped, {:.1%} interior, {:.1%} at the maximum iterations, ' \
+               '{:,} bytes sent to workers and {:,} back'.format(
+                stats['tiles'], stats['worker_seconds'], stats['wall_seconds'], stats['utilisation'],
+                stats['iterations'], skipped, stats['mean_iterations'], stats['median_iterations'],
+                stats['max_iterations'], stats['escaped'], stats['interior'], stats['capped'], stats['bytes_in'],
+                stats['bytes_out'])
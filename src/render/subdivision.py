@@ -0,0 +1,107 @@
+from typing import List, Callable, Tuple
+
+
+class RectangleSubdivider:
+
+    """
+    Mariani-Silver style rendering of a grid of points. Only the border of a rectangle
+    is calculated - if every point on it has the same value (typically all interior, 0.0)
+    then the rectangle is filled with that value, otherwise it is split into four and
+    each quarter is tried in turn.
+
+    This only holds for sets without holes, so a lattice of points inside the rectangle
+    is also checked before filling, which stops thin filaments that cross the rectangle
+    without touching its border being lost.
+    """
+
+    def __init__(self,
+                 evaluate: Callable[[List[complex]], List[float]],
+                 min_size: int = 16,
+                 guard_spacing: int = 8,
+                 record_order: bool = False):
+        """
+        :param evaluate: Calculates the output values for a list of points
+        :param min_size: Rectangles narrower or shorter than this are calculated in full
+        :param guard_spacing: The spacing of the lattice of points checked inside a rectangle before filling it
+        :param record_order: Keep the (row, column) of each point in the order they were calculated
+        """
+        self.evaluate = evaluate
+        self.min_size = min_size
+        self.guard_spacing = guard_spacing
+        self.calculated = 0
+        self.order = [] if record_order else None
+
+    def draw(self, points: List[List[complex]]) -> List[List[float]]:
+        """
+        Calculate the output for a grid of points
+
+        :param points: Rows of (already mapped) points
+        :return: Rows of output values
+        """
+        height = len(points)
+        width = len(points[0]) if height else 0
+        values = [[None] * width for _ in range(height)]
+        if not width:
+            return values
+
+        # Each level of rectangles is handled together, so the borders (and then the guard
+        # points) of every rectangle in the level are calculated in a single batch
+        pending = [(0, 0, height - 1, width - 1)]
+        while pending:
+            borders = [self.get_border(*rectangle) for rectangle in pending]
+            self.calculate(points, values, [cell for border in borders for cell in border])
+
+            small = [r for r in pending if r[2] - r[0] < self.min_size or r[3] - r[1] < self.min_size]
+            self.calculate(points, values, [cell for r in small for cell in self.get_inside(*r)])
+
+            candidates = [(r, set(values[y][x] for y, x in border))
+                          for r, border in zip(pending, borders) if r not in small]
+            uniform = [(r, border_values) for r, border_values in candidates if len(border_values) == 1]
+            guards = [self.get_guard(*r) for r, _ in uniform]
+            self.calculate(points, values, [cell for guard in guards for cell in guard])
+
+            filled = set()
+            for (rectangle, border_values), guard in zip(uniform, guards):
+                if all(values[y][x] in border_values for y, x in guard):
+                    fill = border_values.pop()
+                    for y, x in self.get_inside(*rectangle):
+                        if values[y][x] is None:
+                            values[y][x] = fill
+                    filled.add(rectangle)
+
+            pending = [quarter for r, _ in candidates if r not in filled for quarter in self.split(*r)]
+        return values
+
+    @staticmethod
+    def get_border(top: int, left: int, bottom: int, right: int) -> List[Tuple[int, int]]:
+        return [(y, x) for x in range(left, right + 1) for y in (top, bottom)] + \
+               [(y, x) for y in range(top + 1, bottom) for x in (left, right)]
+
+    @staticmethod
+    def get_inside(top: int, left: int, bottom: int, right: int) -> List[Tuple[int, int]]:
+        return [(y, x) for y in range(top + 1, bottom) for x in range(left + 1, right)]
+
+    def get_guard(self, top: int, left: int, bottom: int, right: int) -> List[Tuple[int, int]]:
+        return [(y, x)
+                for y in range(top + self.guard_spacing, bottom, self.guard_spacing)
+                for x in range(left + self.guard_spacing, right, self.guard_spacing)]
+
+    @staticmethod
+    def split(top: int, left: int, bottom: int, right: int) -> List[Tuple[int, int, int, int]]:
+        # The quarters share their edges, which will already have been calculated
+        middle_row = (top + bottom) // 2
+        middle_column = (left + right) // 2
+        return [(top, left, middle_row, middle_column),
+                (top, middle_column, middle_row, right),
+                (middle_row, left, bottom, middle_column),
+                (middle_row, middle_column, bottom, right)]
+
+    def calculate(self, points: List[List[complex]], values: List[List[float]], cells: List[Tuple[int, int]]):
+        cells = [(y, x) for y, x in dict.fromkeys(cells) if values[y][x] is None]
+        if not cells:
+            return
+        for (y, x), value in zip(cells, self.evaluate([points[y][x] for y, x in cells])):
+            values[y][x] = value
+        self.calculated += len(cells)
+        if self.order is not None:
+            self.order.extend(cells)
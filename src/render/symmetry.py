@@ -0,0 +1,156 @@
+from typing import List, Optional
+import numpy as np
+
+from calculators.linedrawer import get_step
+from calculators.symmetry import Symmetry
+
+# How close, in pixels, the reflection of a pixel has to land to another pixel to be taken as it
+axis_tolerance = 1e-6
+
+
+def find_axis(start: float, step: float, count: int) -> Optional[int]:
+    """
+    Find where zero is along a line of pixels, as the index A for which pixel A - i is
+    at minus pixel i's position - so the axis is at pixel A / 2, which is between two
+    pixels when A is odd
+
+    :param start: The position of the first pixel
+    :param step: The distance from one pixel to the next
+    :param count: The number of pixels
+    :return: The index, or None if the pixels aren't placed symmetrically about zero, or no pixel's
+             reflection is another pixel
+    """
+    if count < 2 or step == 0.0:
+        return None
+    axis = -2.0 * start / step
+    rounded = round(axis)
+    if abs(axis - rounded) > axis_tolerance or not 0 < rounded < 2 * (count - 1):
+        return None
+    return int(rounded)
+
+
+def reflected(axis: int, count: int) -> np.ndarray:
+    # The pixels whose reflection is in the line and comes before them
+    indices = np.arange(count)
+    return (axis - indices >= 0) & (axis - indices < indices)
+
+
+class SymmetryPlan:
+
+    """
+    Which pixels of a render are copies of others, from the fractal's symmetry and
+    the region drawn. Only the tiles with a pixel that isn't a copy are drawn, and the
+    copies are filled in afterwards by reflecting the pixels drawn.
+
+    Only the part of the region whose reflection is also in it can be copied, and only
+    if the pixels line up with their reflections - which they do for any region
+    centred on the axis. A default view of a mirror symmetric set only draws its top
+    half (and the tiles straddling the axis), one of a set with both symmetries only
+    its top left quarter.
+
+    A pixel's reflection is calculated at the same point, negated or conjugated, which
+    usually gives exactly the same result. Near the boundary of the set, where the
+    output is chaotic, it can differ in the last place, so a few of the pixels copied
+    can differ slightly from drawing them.
+    """
+
+    def __init__(self, width: int, height: int, row_axis: int, column_axis: int = None, rotate: bool = False):
+        """
+        :param width: The image width
+        :param height: The image height
+        :param row_axis: Where the real axis is, as the index of find_axis for the rows
+        :param column_axis: Where the imaginary axis is, as the index of find_axis for the columns
+        :param rotate: Whether pixels are copied from their half turn about the origin, rather than
+                       reflected in the axes separately
+        """
+        self.width = width
+        self.height = height
+        self.row_axis = row_axis
+        self.column_axis = column_axis
+        self.rotate = rotate
+        self.copy_rows = reflected(row_axis, height)
+        if rotate:
+            # Pixels in the copied rows are only copies if their column's reflection is in the image too, and on the
+            # middle row itself (if there is one) only those after the middle
+            self.copy_columns = (column_axis - np.arange(width) >= 0) & (column_axis - np.arange(width) < width)
+            self.middle_columns = reflected(column_axis, width)
+        elif column_axis is not None:
+            self.copy_columns = reflected(column_axis, width)
+        else:
+            self.copy_columns = np.zeros(width, dtype=bool)
+
+    @staticmethod
+    def create(symmetry: Symmetry, region: List[complex], width: int, height: int) -> Optional['SymmetryPlan']:
+        """
+        Plan the copying for a render of the region with the given symmetry
+
+        :return: The plan, or None if no part of the image can be copied
+        """
+        row_axis = find_axis(region[0].imag, get_step(region[0].imag, region[1].imag, height), height)
+        column_axis = find_axis(region[0].real, get_step(region[0].real, region[1].real, width), width)
+        if symmetry.mirror and row_axis is not None:
+            return SymmetryPlan(width, height, row_axis, column_axis if symmetry.rotate else None)
+        if symmetry.rotate and row_axis is not None and column_axis is not None:
+            return SymmetryPlan(width, height, row_axis, column_axis, True)
+        return None
+
+    def get_middle_row(self) -> Optional[int]:
+        if self.row_axis % 2 or self.row_axis // 2 >= self.height:
+            return None
+        return self.row_axis // 2
+
+    def is_copy(self, row: int, column: int, height: int, width: int) -> np.ndarray:
+        """
+        Which pixels of a block of the image are copies
+        """
+        rows = self.copy_rows[row:row + height, np.newaxis]
+        columns = self.copy_columns[np.newaxis, column:column + width]
+        if not self.rotate:
+            # Reflections in each axis - the pixels in a copied row or a copied column
+            return rows | columns
+        copies = rows & columns
+        middle = self.get_middle_row()
+        if middle is not None and row <= middle < row + height:
+            copies[middle - row] = self.middle_columns[column:column + width]
+        return copies
+
+    def needs_tile(self, tile) -> bool:
+        """
+        Whether a tile has any pixel that has to be drawn
+        """
+        return not self.is_copy(tile.row, tile.column, tile.height, tile.width).all()
+
+    def fill(self, grid: np.ndarray) -> np.ndarray:
+        """
+        Copy every copied pixel from its reflection, in place
+
+        :param grid: The height x width raw output, with every pixel that isn't a copy drawn
+        :return: The grid
+        """
+        rows = np.flatnonzero(self.copy_rows)
+        if self.rotate:
+            columns = np.flatnonzero(self.copy_columns)
+            grid[np.ix_(rows, columns)] = grid[np.ix_(self.row_axis - rows, self.column_axis - columns)]
+            middle = self.get_middle_row()
+            if middle is not None:
+                columns = np.flatnonzero(self.middle_columns)
+                grid[middle, columns] = grid[middle, self.column_axis - columns]
+            return grid
+
+        # The columns first, so the rows copied after have their copied columns already
+        columns = np.flatnonzero(self.copy_columns)
+        if columns.size:
+            grid[:, columns] = grid[:, self.column_axis - columns]
+        grid[rows] = grid[self.row_axis - rows]
+        return grid
+
+    def report(self) -> str:
+        rows, columns = self.copy_rows.mean(), self.copy_columns.mean()
+        if self.rotate:
+            middle = 0.0 if self.get_middle_row() is None else self.middle_columns.mean()
+            drawn = 1.0 - rows * columns - middle / self.height
+            kind = 'rotated about the origin'
+        else:
+            drawn = (1.0 - rows) * (1.0 - columns)
+            kind = 'reflected in both axes' if self.copy_columns.any() else 'reflected in the real axis'
+        return '{:.0%} of the image needs drawing, the rest is {}'.format(drawn, kind)
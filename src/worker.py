@@ -0,0 +1,25 @@
+from argparse import ArgumentParser
+from multiprocessing import Process, cpu_count
+
+from render.distributed import work
+
+
+def main():
+    parser = ArgumentParser(description='Draw tiles for a distributed render until it is finished')
+    parser.add_argument('host', help='the coordinator\'s host')
+    parser.add_argument('port', type=int, help='the coordinator\'s port')
+    parser.add_argument('authkey', help='the key the coordinator was started with')
+    parser.add_argument('--processes', type=int, help='the number of workers to run, defaults to the number of cpus')
+    args = parser.parse_args()
+
+    processes = args.processes or cpu_count() or 4
+    workers = [Process(target=work, args=((args.host, args.port), args.authkey.encode('utf-8')))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+if __name__ == "__main__":
+    main()
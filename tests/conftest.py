@@ -0,0 +1,70 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from calculators import compiled
+from calculators.factories import LineFactory
+from render.scheduler import TileScheduler
+
+
+class SerialPool:
+
+    """
+    Stands in for a process pool, drawing every task in this process in turn, so
+    renders are quick to start and failures show their own tracebacks
+    """
+
+    def imap_unordered(self, function, tasks, chunksize=1):
+        return map(function, tasks)
+
+    def imap(self, function, tasks, chunksize=1):
+        return map(function, tasks)
+
+    def map(self, function, tasks, chunksize=1):
+        return list(map(function, tasks))
+
+
+def per_point(factory: LineFactory) -> LineFactory:
+    """
+    A copy of a factory that draws with its plain python drawer, a point at a time -
+    the baseline every other engine is checked against
+    """
+    factory = factory.with_iterations(factory.get_iterations())
+    factory.vectorise = False
+    factory.compile_loops = False
+    return factory
+
+
+def render(factory: LineFactory, region, width: int, height: int, **kwargs) -> np.ndarray:
+    """
+    Draw a region with a TileScheduler in this process, with any of the scheduler's
+    options as keyword arguments
+    """
+    return TileScheduler(width, height, **kwargs).draw(SerialPool(), factory, region)
+
+
+@pytest.fixture
+def pool():
+    return SerialPool()
+
+
+@pytest.fixture(autouse=True)
+def python_loops(monkeypatch):
+    # Generated loops are left as plain python, which rounds exactly as the per-point drawers do, even
+    # where numba is installed - tests that want numba ask for numba_loops
+    monkeypatch.setattr(compiled, 'use_numba', False)
+    compiled.build_row_function.cache_clear()
+    yield
+    compiled.build_row_function.cache_clear()
+
+
+@pytest.fixture
+def numba_loops(monkeypatch):
+    if compiled.numba is None:
+        pytest.skip('numba is not installed')
+    monkeypatch.setattr(compiled, 'use_numba', True)
+    compiled.build_row_function.cache_clear()
@@ -0,0 +1,44 @@
+import os
+
+import numpy as np
+
+from calculators.factories import MandelLambdaFactory
+from render.cache import RenderCache
+
+
+def test_render_just_saved_is_kept_when_mtimes_tie(tmp_path):
+    grid = np.zeros((16, 16))
+    size = os.path.getsize(save_one(tmp_path / 'size', grid))
+    cache = RenderCache(str(tmp_path / 'cache'), max_bytes=2 * size)
+    # As a coarse clock leaves three saves in the same tick, with the new one's name sorting first
+    for key in ('f1', 'f2', 'a0'):
+        np.save(cache.get_path(key), grid)
+        os.utime(cache.get_path(key), (1000000000, 1000000000))
+    cache.evict('a0')
+    assert sorted(os.listdir(cache.directory)) == ['a0.npy', 'f2.npy']
+
+
+def test_least_recently_used_go_first(tmp_path):
+    grid = np.zeros((16, 16))
+    size = os.path.getsize(save_one(tmp_path / 'size', grid))
+    cache = RenderCache(str(tmp_path / 'cache'), max_bytes=2 * size)
+    for when, key in enumerate(('old', 'used', 'newer')):
+        cache.save(key, grid)
+        os.utime(cache.get_path(key), (when, when))
+    cache.load('used')
+    cache.save('new', grid)
+    assert sorted(os.listdir(cache.directory)) == ['new.npy', 'used.npy']
+
+
+def test_key_changes_with_the_formula():
+    region = [-2.0 + 1.0j, 1.0 - 1.0j]
+    first = RenderCache.get_key(MandelLambdaFactory(8, 500, 2, 'z**2 + c'), region, 64, 36)
+    assert first == RenderCache.get_key(MandelLambdaFactory(8, 500, 2, 'z**2 + c'), region, 64, 36)
+    assert first != RenderCache.get_key(MandelLambdaFactory(8, 500, 2, 'z**2 - c'), region, 64, 36)
+    assert first != RenderCache.get_key(MandelLambdaFactory(8, 500, 2, 'z**2 + c'), region, 64, 37)
+
+
+def save_one(directory, grid: np.ndarray) -> str:
+    cache = RenderCache(str(directory))
+    cache.save('one', grid)
+    return cache.get_path('one')
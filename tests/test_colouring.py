@@ -0,0 +1,24 @@
+from application import demo_presets, draw_fractal
+from colours.scaling import HistogramScaling
+from render.session import RenderSession
+
+presets = {preset.name: preset for preset in demo_presets()}
+
+
+def draw(session: RenderSession, name: str, filename: str, scaling: HistogramScaling, **kwargs):
+    preset = presets[name]
+    draw_fractal(preset.factory, 2, 48, 27, preset.region, preset.ranger, filename, session=session, scaling=scaling,
+                 **kwargs)
+    with open(filename, 'rb') as image:
+        return image.read()
+
+
+def test_histogram_reused_across_images_only_sees_each_image(tmp_path):
+    with RenderSession(2) as session:
+        for kwargs in ({}, {'stream': True, 'preview_scale': 1}):
+            fresh = draw(session, 'julia3', str(tmp_path / 'fresh.png'), HistogramScaling(), **kwargs)
+            scaling = HistogramScaling()
+            draw(session, 'burning-ship', str(tmp_path / 'first.png'), scaling, **kwargs)
+            assert draw(session, 'julia3', str(tmp_path / 'second.png'), scaling, **kwargs) == fresh
+            # The caller's scaling is left as it was given
+            assert not scaling.counts.any()
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from conftest import per_point
+from application import demo_presets
+from calculators.compiled import build_row_function, exact_powers, generate_source, get_namespace, get_spec, \
+    python_power, square_band
+
+presets = [preset for preset in demo_presets() if get_spec(per_point(preset.factory).get_drawer(0j, 1 + 0j, 2),
+                                                               getattr(preset.factory, 'function', None),
+                                                               getattr(preset.factory, 'derivative', None))]
+
+
+def row_of(preset, steps: int = 200):
+    # A row across the middle of the region
+    middle = (preset.region[0].imag + preset.region[1].imag) / 2.0
+    drawer = per_point(preset.factory).get_drawer(preset.region[0].real + middle * 1j,
+                                                  preset.region[1].real + middle * 1j, steps)
+    drawer.create_range(0, steps)
+    return drawer
+
+
+def get_row_spec(preset, drawer):
+    return get_spec(drawer, getattr(preset.factory, 'function', None), getattr(preset.factory, 'derivative', None))
+
+
+@pytest.mark.parametrize('preset', presets, ids=lambda preset: preset.name)
+@pytest.mark.parametrize('vector', [False, True])
+def test_generated_source_matches_per_point(preset, vector):
+    # The numba version's source is run as plain python here, so its squared escape test is checked even
+    # where numba isn't installed. Its points are python complex numbers in an object array, as numpy's
+    # own complex scalars round differently
+    drawer = row_of(preset)
+    points = drawer.get_points()
+    namespace = get_namespace(get_row_spec(preset, drawer))
+    exec(generate_source(get_row_spec(preset, drawer), vector), namespace)
+    values, _, count = namespace['calculate'](np.array(points, dtype=object) if vector else points, 100000.0 + 0.0j)
+
+    drawer.draw()
+    assert np.array_equal(np.asarray(values), np.array(drawer.get_output()))
+    assert count == drawer.iterated
+
+
+@pytest.mark.parametrize('preset', presets, ids=lambda preset: preset.name)
+def test_numba_matches_per_point(preset, numba_loops):
+    # The same iterations for every point, only the smooth value's logs can round differently
+    drawer = row_of(preset, 400)
+    values, _, count = build_row_function(get_row_spec(preset, drawer))(drawer.get_points(), 100000.0 + 0.0j)
+    drawer.draw()
+    assert count == drawer.iterated
+    assert np.allclose(values, drawer.get_output(), rtol=1e-12, atol=1e-12)
+
+
+def test_python_power_matches_python():
+    points = np.random.default_rng(3).uniform(-3.0, 3.0, (2, 500)).view(complex).ravel().tolist()
+    for power in (-4, -1, 0, 2, 5, 7.0, 1.5, 0.5 + 1j, 101):
+        assert [python_power(point, power) for point in points] == [point ** power for point in points]
+
+
+@pytest.mark.parametrize('source', ['(1 - z**(5))/(z**2 - c)', '(z ** 3) + 0.4 + 0.002275j', 'z ** 2 ** 3'])
+def test_exact_powers_keeps_the_formula(source):
+    rewritten = exact_powers(source)
+    assert '**' not in rewritten
+    z, c = 0.3 - 0.2j, -0.5 + 0.1j
+    assert eval(rewritten, {'python_power': python_power, 'z': z, 'c': c}) == eval(source, {'z': z, 'c': c})
+
+
+@pytest.mark.parametrize('tolerance', [2.0, 4.0, 8.0, 1e-5, 1e-120, 1e120])
+def test_square_band_contains_the_rounding_of_the_square(tolerance):
+    low, high = square_band(tolerance)
+    assert low <= tolerance * tolerance <= high
+    # Magnitudes just either side of the tolerance square to within the band, where abs() decides
+    for magnitude in (np.nextafter(tolerance, 0.0), tolerance, np.nextafter(tolerance, np.inf)):
+        z = complex(magnitude * 0.6, magnitude * 0.8)
+        square = z.real * z.real + z.imag * z.imag
+        assert (square <= low) <= (abs(z) <= tolerance) and (abs(z) <= tolerance) <= (square <= high)
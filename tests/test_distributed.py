@@ -0,0 +1,85 @@
+import sys
+import threading
+from multiprocessing import Process
+from time import process_time, sleep
+
+import numpy as np
+
+from conftest import render
+from application import demo_presets
+from render.distributed import BoardManager, DistributedScheduler
+from render.session import RenderSession
+from render.shared import SharedGrid
+from render.statistics import RenderStatistics
+
+authkey = b'test'
+
+
+def drop_out(address, key: bytes):
+    # Take a tile and go, as a worker whose machine has gone away would
+    manager = BoardManager(tuple(address), key)
+    manager.connect()
+    assert manager.get_board().get_tile() is not None
+
+
+class ProcessPool:
+
+    """
+    Starts each local worker in a process of its own, the first of them one that drops
+    out, and waits for it to have taken its tile before the rest start
+    """
+
+    def __init__(self):
+        self.processes = []
+
+    def apply_async(self, function, args):
+        process = Process(target=function if self.processes else drop_out, args=args)
+        process.start()
+        if not self.processes:
+            process.join()
+        self.processes.append(process)
+
+    def join(self):
+        for process in self.processes:
+            process.join(30)
+        assert not any(process.is_alive() for process in self.processes)
+
+
+def test_workers_on_localhost_match_the_local_render():
+    preset = {preset.name: preset for preset in demo_presets()}['mandel']
+    width, height = 96, 54
+    threads, stdout = threading.active_count(), sys.stdout
+
+    scheduler = DistributedScheduler(width, height, authkey, ('127.0.0.1', 0), lease_seconds=0.5, local_workers=4,
+                                     tile_width=16, tile_height=16)
+    pool = ProcessPool()
+    grid = scheduler.draw(pool, preset.factory, preset.region)
+    pool.join()
+
+    assert np.array_equal(grid, render(preset.factory, preset.region, width, height))
+    assert scheduler.reissued >= 1
+    assert len(scheduler.timings) == len(scheduler.get_tiles())
+
+    # Nothing is left serving or spinning in this process once the render is done
+    assert threading.active_count() == threads
+    assert sys.stdout is stdout
+    start = process_time()
+    sleep(1.0)
+    assert process_time() - start < 0.2
+
+
+def test_local_workers_on_a_session_pool_with_statistics():
+    preset = {preset.name: preset for preset in demo_presets()}['julia3']
+    width, height = 64, 36
+    scheduler = DistributedScheduler(width, height, authkey, ('127.0.0.1', 0), local_workers=2, tile_width=16,
+                                     tile_height=16)
+    scheduler.statistics = RenderStatistics(width, height)
+    output = SharedGrid((height, width), np.float64)
+    try:
+        with RenderSession(2) as session:
+            scheduler.draw(session.get_pool(), preset.factory, preset.region, output)
+        assert np.array_equal(output.array, render(preset.factory, preset.region, width, height))
+    finally:
+        output.release()
+    assert scheduler.statistics.pixels == width * height
+    assert scheduler.statistics.iterations.sum() == scheduler.iterated
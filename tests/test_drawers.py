@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from conftest import per_point
+from calculators.factories import MandelLambdaFactory
+from calculators.formula import Formula
+from calculators.linedrawer import in_main_bulbs
+
+
+def draw_row(factory, start: complex, end: complex, steps: int):
+    drawer = factory.get_drawer(start, end, steps)
+    drawer.record_iterations = True
+    drawer.create_range(0, steps)
+    points = drawer.get_points()
+    drawer.draw()
+    return points, np.array(drawer.get_output()), np.array(drawer.point_iterations), drawer.iterated
+
+
+@pytest.mark.parametrize('source', ['z**2 + c', 'z ** 2 + c', '(z**2) + c', 'c + z**2', 'z*z + c'])
+def test_mandelbrot_formulas_are_recognised(source):
+    assert Formula(source).is_mandelbrot()
+    assert MandelLambdaFactory(8, 500, 2, source).bulb_check
+
+
+@pytest.mark.parametrize('source', ['z**2 + c + 1', 'z**3 + c', 'z**2 - c', 'z**2 + 0.3j', 'z.conjugate()**2 + c'])
+def test_other_formulas_are_not(source):
+    assert not Formula(source).is_mandelbrot()
+    assert not MandelLambdaFactory(8, 500, 2, source).bulb_check
+
+
+def test_lambdas_never_skip_the_bulbs():
+    assert not MandelLambdaFactory(8, 500, 2, lambda z, c: z ** 2 + c).bulb_check
+
+
+@pytest.mark.parametrize('engine', ['vectorised', 'compiled', 'per point'])
+def test_interior_points_skip_the_iterations(engine):
+    factory = MandelLambdaFactory(8, 500, 2, 'z ** 2 + c', vectorise=engine == 'vectorised')
+    if engine == 'per point':
+        factory = per_point(factory)
+    # Through the period-2 bulb and the main cardioid, and out past the cusp
+    start, end, steps = -1.9 + 0.05j, 0.5 + 0.05j, 97
+    points, values, iterations, iterated = draw_row(factory, start, end, steps)
+    inside = np.array([in_main_bulbs(point) for point in points])
+    assert inside.sum() > steps // 2
+    assert not iterations[inside].any()
+    assert iterated == iterations.sum()
+
+    # The same values as iterating them in full (up to the vectorised drawer's last place rounding
+    # of the smooth values), but with the bulbs' iterations saved
+    plain = per_point(MandelLambdaFactory(8, 500, 2, lambda z, c: z ** 2 + c))
+    _, full_values, full_iterations, full_iterated = draw_row(plain, start, end, steps)
+    assert not values[inside].any()
+    assert np.allclose(values, full_values, rtol=1e-12, atol=0.0)
+    assert (full_iterations[inside] > 0).all()
+    assert iterated < full_iterated
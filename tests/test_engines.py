@@ -0,0 +1,120 @@
+import cmath
+
+import numpy as np
+import pytest
+
+from conftest import per_point, render
+from application import demo_presets
+from calculators.factories import DeepMandelFactory, MandelFactory
+from calculators.vectorised import can_vectorise, complex_power, vectorises_power
+from render.scheduler import TileScheduler
+from render.shared import SharedGrid
+
+# Small enough for the per-point drawers to be quick, big enough for a few tiles
+width, height = 64, 36
+
+# The engines round their smooth values differently in the last place or two, but
+# never take a different number of iterations
+tolerance = 1e-12
+
+presets = {preset.name: preset for preset in demo_presets()}
+
+
+def draw_preset(name: str, factory=None, **kwargs) -> np.ndarray:
+    preset = presets[name]
+    size = preset.get_size(width, height)
+    return render(factory or preset.factory, preset.region, *size, tile_width=16, tile_height=16, **kwargs)
+
+
+@pytest.mark.parametrize('name', sorted(presets))
+def test_preset_matches_per_point(name):
+    baseline = draw_preset(name, per_point(presets[name].factory))
+    assert np.allclose(draw_preset(name), baseline, rtol=tolerance, atol=tolerance)
+
+
+@pytest.mark.parametrize('name', sorted(presets))
+def test_compiled_loop_matches_per_point(name):
+    factory = presets[name].factory.with_iterations(presets[name].factory.get_iterations())
+    factory.vectorise = False
+    assert np.array_equal(draw_preset(name, factory), draw_preset(name, per_point(factory)))
+
+
+@pytest.mark.parametrize('name', sorted(presets))
+def test_tile_size_does_not_change_the_image(name):
+    preset = presets[name]
+    size = preset.get_size(width, height)
+    small = render(preset.factory, preset.region, *size, tile_width=8, tile_height=8)
+    large = render(preset.factory, preset.region, *size, tile_width=64, tile_height=64)
+    if name == 'deep':
+        # The iterations series approximation skips are worked out for each tile
+        assert np.allclose(small, large, rtol=1e-9, atol=1e-9)
+    else:
+        assert np.array_equal(small, large)
+
+
+def test_fractional_power_matches_per_point_at_full_iterations():
+    # 5000 iterations is long enough for a last place difference in z ** 1.5 to change escape counts
+    preset = presets['glynn-tree']
+    size = preset.get_size(72, 72)
+    image = render(preset.factory, preset.region, *size, tile_width=32, tile_height=32)
+    assert np.array_equal(image, render(per_point(preset.factory), preset.region, *size))
+
+
+@pytest.mark.parametrize('power', [1.5, 0.5 + 1j, 2.0000001, 101])
+def test_non_integer_powers_are_not_vectorised(power):
+    assert not vectorises_power(power)
+    assert not MandelFactory(4, 100, power).vectorise
+    assert not can_vectorise(lambda z, c: z ** power + c)
+    with pytest.raises(ValueError):
+        complex_power(np.ones(3, dtype=complex), power)
+
+
+@pytest.mark.parametrize('power', [-4, -2, -1, 0, 1, 2, 3, 5, 6, 2.0])
+def test_integer_powers_match_python(power):
+    points = np.random.default_rng(power == 2.0).uniform(-2.0, 2.0, (2, 500)).view(complex).ravel()
+    expected = np.array([complex(point) ** power for point in points])
+    assert np.array_equal(complex_power(points, power), expected)
+    assert MandelFactory(4, 100, power).vectorise
+
+
+def test_lambdas_using_cmath_are_not_vectorised():
+    assert can_vectorise(lambda z, c: z * z + c)
+    assert not can_vectorise(lambda z, c: cmath.sin(z) + c)
+
+
+@pytest.mark.parametrize('name', ['mandel', 'julia3', 'burning-ship'])
+def test_subdivision_matches_per_point(name):
+    baseline = draw_preset(name, per_point(presets[name].factory))
+    assert np.allclose(draw_preset(name, subdivide=True), baseline, rtol=tolerance, atol=tolerance)
+
+
+@pytest.mark.parametrize('name', ['mandel', 'glynn-tree', 'newt-basins'])
+def test_progressive_matches_one_pass(name, pool):
+    preset = presets[name]
+    size = preset.get_size(width, height)
+    grid = SharedGrid((size[1], size[0]), np.float64)
+    try:
+        TileScheduler(*size, tile_width=16, tile_height=16).draw_progressive(pool, preset.factory, preset.region,
+                                                                               grid, [4, 2])
+        assert np.array_equal(grid.array, draw_preset(name))
+    finally:
+        grid.release()
+
+
+def test_series_approximation_matches_full_perturbation():
+    plain = DeepMandelFactory('0', '1', 8, 1000, series_approximation=False)
+    assert np.allclose(draw_preset('deep'), draw_preset('deep', plain), rtol=1e-9, atol=1e-9)
+
+
+def test_deep_zoom_matches_per_point_where_doubles_can_reach():
+    # A shallow zoom about a centre doubles can hold, so the plain drawer can draw it too
+    factory = DeepMandelFactory('-0.75', '0.1', 8, 500)
+    region = [-0.01 + 0.005625j, 0.01 - 0.005625j]
+    baseline = MandelFactory(8, 500, 2, vectorise=False)
+    baseline.compile_loops = False
+    absolute = [point + (-0.75 + 0.1j) for point in region]
+    # Neither is exact - the plain drawer rounds each point's own orbit, perturbation the offset
+    # from the centre's - so the odd pixel close to escaping on an iteration can go either way
+    different = ~np.isclose(render(factory, region, width, height), render(baseline, absolute, width, height),
+                            rtol=1e-6, atol=1e-6)
+    assert different.sum() <= width * height // 500
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+
+from conftest import per_point, render
+from application import demo_presets
+from calculators.factories import MandelFactory
+from render.scheduler import TileScheduler
+from render.supersample import Supersampler, sample_points
+
+presets = {preset.name: preset for preset in demo_presets()}
+region = [-2.0 + 1.0j, 1.0 - 1.0j]
+
+
+@pytest.mark.parametrize('name', ['mandel', 'drop', 'julia3', 'newt', 'deep'])
+@pytest.mark.parametrize('width, height', [(1, 40), (40, 1), (1, 1)])
+def test_one_pixel_renders_match_per_point(name, width, height):
+    preset = presets[name]
+    grid = render(preset.factory, preset.region, width, height)
+    assert grid.shape == (height, width)
+    assert np.allclose(grid, render(per_point(preset.factory), preset.region, width, height), rtol=1e-12, atol=0.0)
+
+
+def test_one_pixel_wide_render_is_the_first_column():
+    factory = per_point(MandelFactory(8, 200, 2))
+    assert np.array_equal(render(factory, region, 1, 40), render(factory, region, 30, 40)[:, :1])
+    assert np.array_equal(render(factory, region, 30, 1), render(factory, region, 30, 40)[:1])
+
+
+@pytest.mark.parametrize('width, height', [(1, 60), (60, 1)])
+def test_one_pixel_images_are_supersampled(pool, width, height):
+    factory = MandelFactory(8, 200, 2)
+    scheduler = TileScheduler(width, height)
+    grid = scheduler.draw(pool, factory, region)
+    before = grid.copy()
+    supersampler = Supersampler(samples=3, threshold=0.05)
+    refined = supersampler.refine(pool, factory, region, grid, scheduler)
+    assert supersampler.refined > 0
+    assert np.isfinite(refined).all()
+
+    # Each refined pixel is the average of its samples, which lie within it
+    edges = supersampler.find_edges(before)
+    rows, columns = np.nonzero(edges)
+    points = supersampler.get_samples(rows, columns, region, width, height, np.random.default_rng(0))
+    if width == 1:
+        assert (points.real == region[0].real).all()
+    else:
+        assert (points.imag == region[0].imag).all()
+    values, _ = sample_points((factory, region, width, points.ravel()))
+    assert np.allclose(refined[edges], values.reshape(points.shape).mean(axis=1), rtol=1e-12, atol=0.0)
+    assert np.array_equal(refined[~edges], before[~edges])
+
+
+def test_samples_are_drawn_by_the_region_not_the_points():
+    # A chunk of samples in a single pixel, or a lone sample, draws as any other would
+    factory = MandelFactory(8, 200, 2)
+    points = np.array([-0.75 + 0.1j, -0.75 + 0.1j, 0.3 + 0.5j])
+    together, _ = sample_points((factory, region, 60, points))
+    alone = [sample_points((factory, region, 60, points[index:index + 1]))[0][0] for index in range(points.size)]
+    assert np.array_equal(together, alone)
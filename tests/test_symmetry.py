@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from conftest import render
+from calculators.factories import MandelLambdaFactory
+from render.scheduler import TileScheduler
+from render.symmetry import SymmetryPlan
+
+region = [-2.0 + 1.5j, 2.0 - 1.5j]
+width, height = 64, 48
+
+
+def draw_symmetric(pool, factory) -> np.ndarray:
+    scheduler = TileScheduler(width, height, tile_width=16, tile_height=16)
+    scheduler.symmetry = SymmetryPlan.create(factory.get_symmetry(), region, width, height)
+    assert scheduler.symmetry is not None
+    return scheduler.draw(pool, factory, region)
+
+
+@pytest.mark.parametrize('source, mirror, rotate', [
+    ('z**2 + c', True, False),
+    ('z**2 + c*z', True, False),
+    ('z**3 + c', True, True),
+    ('z**3 - c**3', True, True),
+    ('z**4 + 0.559 - 0.0481j', False, True),
+    ('cos(z) + 0.3j', False, True),
+    ('z**2 + 0.3j*c', False, False),
+])
+def test_formula_symmetry(source, mirror, rotate):
+    symmetry = MandelLambdaFactory(4, 200, 2, source).get_symmetry()
+    assert (symmetry.mirror, symmetry.rotate) == (mirror, rotate)
+
+
+@pytest.mark.parametrize('source', ['z**2 + c', 'z**2 + c*z', 'z**3 + c', 'z**4 + 0.559 - 0.0481j'])
+def test_symmetric_render_matches_the_full_render(pool, source):
+    factory = MandelLambdaFactory(4, 200, 2, source)
+    full = render(factory, region, width, height)
+    symmetric = draw_symmetric(pool, factory)
+    reflection = full[::-1, ::-1] if factory.get_symmetry().rotate else full[::-1]
+
+    # A reflected point can round differently in the last place, which near the boundary can grow into a
+    # different value - but only for a few pixels, each of them a copy of the pixel it's the reflection of
+    different = ~np.isclose(symmetric, full, rtol=1e-9, atol=0.0)
+    assert different.sum() <= full.size // 500
+    assert np.array_equal(symmetric[different], reflection[different])
+
+
+def test_half_turn_of_an_even_formula_in_c_is_not_the_same():
+    # z**2 + c*z is even in z and c together, but its render isn't unchanged by a half turn
+    full = render(MandelLambdaFactory(4, 200, 2, 'z**2 + c*z'), region, width + 1, height + 1)
+    assert not np.allclose(full, full[::-1, ::-1], rtol=1e-9, atol=0.0)